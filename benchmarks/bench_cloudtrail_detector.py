@@ -0,0 +1,129 @@
+"""
+Benchmark the CloudTrail anomaly detector on a generated corpus of log files.
+
+    python benchmarks/bench_cloudtrail_detector.py --files 200 --records 1000
+    python benchmarks/bench_cloudtrail_detector.py --out fixtures/cloudtrail --keep
+
+Writes gzipped CloudTrail-format files (same layout and record shape AWS
+uses) with a few injected anomalies - a new region, a first-time StopLogging,
+a burst of calls - then streams them through the detector and reports
+records/s. Also runs the same corpus from the stub S3 to cover the s3:// path,
+then through the parallel sketch ingestion at each --workers count.
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(SRC))
+
+from detectors.cloudtrail_anomaly_detector import check_cloudtrail_anomalies
+from engine.cloudtrail_ingest import ingest
+from utils.aws_stub import StubS3Client, StubSession
+
+ACCOUNT = "123456789012"
+ACTIONS = [("s3.amazonaws.com", "GetObject"), ("s3.amazonaws.com", "ListBuckets"),
+           ("ec2.amazonaws.com", "DescribeInstances"), ("iam.amazonaws.com", "GetUser"),
+           ("sts.amazonaws.com", "GetCallerIdentity"), ("lambda.amazonaws.com", "Invoke")]
+
+
+def _record(rng, when, principal, region, source, name):
+    return {
+        "eventVersion": "1.08",
+        "userIdentity": {"type": "IAMUser", "principalId": f"AIDA{principal.upper()}",
+                         "arn": f"arn:aws:iam::{ACCOUNT}:user/{principal}", "accountId": ACCOUNT,
+                         "userName": principal},
+        "eventTime": when.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "eventSource": source, "eventName": name, "awsRegion": region,
+        "sourceIPAddress": f"203.0.113.{rng.randint(1, 254)}", "userAgent": "aws-cli/2.15.0",
+        "requestParameters": {"bucketName": "app-data"} if source.startswith("s3") else None,
+        "responseElements": None,
+        "requestID": f"{rng.getrandbits(64):016x}", "eventID": f"{rng.getrandbits(128):032x}",
+        "readOnly": True, "eventType": "AwsApiCall", "managementEvent": True,
+        "recipientAccountId": ACCOUNT,
+    }
+
+
+def synthetic_corpus(n_files, records_per_file, n_principals=50, seed=42):
+    """Yield (key, gzipped bytes) in CloudTrail's S3 key layout, oldest first."""
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    principals = [f"user-{i:03d}" for i in range(n_principals)]
+    for f in range(n_files):
+        file_start = start + timedelta(minutes=5 * f)
+        records = []
+        for r in range(records_per_file):
+            when = file_start + timedelta(seconds=300 * r / records_per_file)
+            source, name = rng.choice(ACTIONS)
+            records.append(_record(rng, when, rng.choice(principals), "us-east-1", source, name))
+        if f == n_files * 3 // 4:
+            # Injected anomalies, well after every principal has warmed up
+            records.append(_record(rng, file_start, principals[0], "ap-southeast-3", *ACTIONS[2]))
+            records.append(_record(rng, file_start, principals[1], "us-east-1",
+                                   "cloudtrail.amazonaws.com", "StopLogging"))
+            records.extend(_record(rng, file_start, principals[2], "us-east-1", *ACTIONS[0])
+                           for _ in range(500))
+        key = (f"AWSLogs/{ACCOUNT}/CloudTrail/us-east-1/{file_start:%Y/%m/%d}/"
+               f"{ACCOUNT}_CloudTrail_us-east-1_{file_start:%Y%m%dT%H%MZ}_{f:06d}.json.gz")
+        yield key, gzip.compress(json.dumps({"Records": records}).encode("utf-8"))
+
+
+def run(label, session, source, baseline_path):
+    stats = {}
+    findings = check_cloudtrail_anomalies(session, [source], baseline_path=baseline_path,
+                                          stats=stats, verbose=False)
+    types = sorted({f.type for f in findings})
+    print(f"{label:>6} {stats['files']:>6} {stats['records']:>9} {stats['seconds']:>8.2f} "
+          f"{stats['records_per_second']:>10.0f} {len(findings):>9}  {', '.join(types)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--records", type=int, default=1000, help="records per file")
+    parser.add_argument("--out", help="write the corpus here instead of a temp folder")
+    parser.add_argument("--keep", action="store_true", help="don't delete the corpus afterwards")
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, os.cpu_count() or 1}),
+                        help="process counts for the parallel ingestion run")
+    args = parser.parse_args()
+
+    work = Path(args.out or tempfile.mkdtemp(prefix="cloudtrail-bench-"))
+    corpus = work / "logs"
+    s3 = StubS3Client(buckets={"trail-bucket": {"objects": {}}})
+    size = 0
+    for key, data in synthetic_corpus(args.files, args.records):
+        path = corpus / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        s3.put_object(Bucket="trail-bucket", Key=key, Body=data)
+        size += len(data)
+    print(f"[i] {args.files} files, {size / 1e6:.1f} MB gzipped in {corpus}")
+
+    print(f"{'source':>6} {'files':>6} {'records':>9} {'seconds':>8} {'records/s':>10} {'findings':>9}  types")
+    run("local", None, str(corpus), work / "baseline_local.json")
+    run("s3", StubSession(s3=s3), "s3://trail-bucket/AWSLogs/", work / "baseline_s3.json")
+
+    print(f"\n[i] Parallel sketch ingestion ({os.cpu_count()} CPUs)")
+    print(f"{'workers':>7} {'records':>9} {'seconds':>8} {'records/s':>10} {'speedup':>8} {'distinct IPs':>13}")
+    base = None     # speedup is relative to the first (smallest) worker count
+    for w in sorted(args.workers):
+        summary, _, stats = ingest([str(corpus)], workers=w)
+        base = base or stats["seconds"]
+        speedup = base / stats["seconds"]
+        print(f"{w:>7} {stats['records']:>9} {stats['seconds']:>8.2f} {stats['records_per_second']:>10.0f} "
+              f"{speedup:>7.1f}x {summary.distinct_ips.count():>13}")
+
+    if not (args.out or args.keep):
+        shutil.rmtree(work)
+
+
+if __name__ == "__main__":
+    main()
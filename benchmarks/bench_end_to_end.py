@@ -0,0 +1,293 @@
+"""
+End-to-end load test: detectors -> findings log -> core loop -> remediation
+queue, against the local stub AWS, with saved baselines and regression flags.
+
+    python benchmarks/bench_end_to_end.py --buckets 5000 --users 2000 --findings 50000
+    python benchmarks/bench_end_to_end.py --users 20000 --no-mfa-ratio 0.4 --latency 0.005
+    python benchmarks/bench_end_to_end.py --save-baseline        # accept this run as the baseline
+
+No AWS credentials needed: S3 and IAM are utils.aws_stub clients built with
+the requested mix (public buckets, users without MFA, stale keys), and every
+state/config/report path the core writes is redirected into a temp folder,
+so the real state/ is never touched. --findings adds synthetic findings
+to the log and --reports adds legacy markdown reports (read by the core's
+--legacy-reports mode), to load the core with more than the detectors find.
+
+For each stage it reports wall time, stub API calls, peak memory and
+events/s. Times come from the --repeat runs, which run untraced; peak
+memory comes from one extra run under tracemalloc, whose tracing overhead
+would skew the times. Peak memory is what the stage allocated on top of
+what was live when it started, with the peak reset per stage, so a stage
+isn't charged for an earlier one's high-water mark (the process RSS peak
+only ever grows). tracemalloc sees Python allocations only.
+Results are compared with the baseline saved for the same scenario
+(benchmarks/baselines/end_to_end.json, written only with --save-baseline).
+A stage whose time or peak memory grew by more than --tolerance, or that
+made more API calls, is flagged and the exit status is 1. Baselines are
+per machine, so the folder is git-ignored: save one on the box that runs
+the comparison.
+"""
+import argparse
+import contextlib
+import io
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(SRC))
+
+from core import sentinel_core as core
+from detectors.iam_exposure_detector import check_iam_exposures
+from detectors.s3_public_access_detector import check_s3_public_access
+from responders.remediation_queue import RemediationQueue
+from utils.aws_stub import StubIAMClient, StubS3Client, StubSession
+from utils import inventory_cache
+from utils.findings import Finding, FindingsLog
+from utils.report_store import report_store
+from utils.storage import atomic_write_json, read_json
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baselines" / "end_to_end.json"
+SYNTHETIC_TYPES = [("S3_PUBLIC", "high"), ("IAM_NO_MFA", "high"), ("IAM_OLD_KEY", "medium"),
+                   ("CT_NEW_REGION", "medium"), ("CT_RATE_SPIKE", "high"), ("CT_NEW_ACTION", "low")]
+# Lower-is-better metrics compared against the baseline, with the smallest
+# absolute growth that counts (tiny stages are mostly timer noise)
+COMPARED = ("seconds", "api_calls", "peak_mb")
+NOISE_FLOOR = {"seconds": 0.01, "api_calls": 0, "peak_mb": 1.0}
+
+
+def synthetic_findings(n, seed=7):
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        event_type, severity = rng.choice(SYNTHETIC_TYPES)
+        resource_name = f"synthetic-{rng.randrange(max(1, n // 10)):06d}"
+        out.append(Finding(type=event_type, resource=resource_name, severity=severity,
+                           detector="load_test", id=f"{event_type}:{resource_name}:{i}"))
+    return out
+
+
+def write_legacy_reports(folder, n):
+    store = report_store(folder)
+    for i in range(n):
+        if i % 2:
+            store.write("s3_public_access_detector_report",
+                        f"# S3 report\n\nPublic bucket policy detected: synthetic-bucket-{i}\n")
+        else:
+            store.write("iam_exposure_report", f"# IAM report\n\nsynthetic-user-{i} has no MFA enabled.\n")
+
+
+@contextlib.contextmanager
+def sandboxed_core(work):
+    """Point every path the core reads or writes at `work`, restore afterwards."""
+    names = ("CONFIG_PATH", "STATE_PATH", "EVENTS_PATH", "LOCK_PATH", "REPORTS_DIR", "CORE_REPORTS_DIR",
+             "FINDINGS_PATH")
+    saved = {name: getattr(core, name) for name in names}
+    config = read_json(saved["CONFIG_PATH"], {})
+    config["metrics"] = {"textfile_dir": str(work / "metrics")}
+    atomic_write_json(work / "sentinel_config.json", config, indent=2)
+    core.CONFIG_PATH = work / "sentinel_config.json"
+    core.STATE_PATH = work / "sentinel_state.json"
+    core.EVENTS_PATH = work / "sentinel_events.db"
+    core.LOCK_PATH = work / "sentinel.lock"
+    core.REPORTS_DIR = core.CORE_REPORTS_DIR = work / "reports"
+    core.FINDINGS_PATH = work / "findings.jsonl"
+    core._EVENT_STORE = None
+    saved_cache = inventory_cache._CACHE
+    inventory_cache._CACHE = inventory_cache.InventoryCache()     # in memory, fresh for each run
+    try:
+        yield
+    finally:
+        inventory_cache._CACHE = saved_cache
+        if core._EVENT_STORE is not None:
+            core._EVENT_STORE.close()
+            core._EVENT_STORE = None
+        for name, value in saved.items():
+            setattr(core, name, value)
+
+
+@contextlib.contextmanager
+def traced_memory():
+    """tracemalloc on for one run, so every repeat starts from a clean trace."""
+    tracemalloc.start()
+    try:
+        yield
+    finally:
+        tracemalloc.stop()
+
+
+class Stages:
+    """
+    Times a sequence of stages and records API calls and events/s for each;
+    with `trace`, also their peak memory (tracemalloc must be running).
+    """
+
+    def __init__(self, clients, trace=False):
+        self.clients = clients
+        self.trace = trace
+        self.results = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        calls = sum(c.total_calls for c in self.clients)
+        row = self.results[name] = {"events": 0}
+        if self.trace:
+            tracemalloc.reset_peak()
+            live = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):     # detectors and the core are chatty
+            yield row
+        row["seconds"] = time.perf_counter() - started
+        row["api_calls"] = sum(c.total_calls for c in self.clients) - calls
+        if self.trace:
+            row["peak_mb"] = (tracemalloc.get_traced_memory()[1] - live) / (1024 * 1024)
+        row["events_per_second"] = row["events"] / row["seconds"] if row["seconds"] else 0.0
+
+
+def run_scenario(args, work, trace=False):
+    s3 = StubS3Client.synthetic(args.buckets, public_ratio=args.public_ratio, latency=args.latency)
+    iam = StubIAMClient.synthetic(args.users, no_mfa_ratio=args.no_mfa_ratio, old_key_ratio=args.old_key_ratio,
+                                  latency=args.latency, report_generation_polls=0)
+    session = StubSession(s3=s3, iam=iam)
+    stages = Stages([s3, iam], trace)
+
+    with sandboxed_core(work), traced_memory() if trace else contextlib.nullcontext():
+        log = FindingsLog(core.FINDINGS_PATH)
+
+        with stages.stage("s3_detector") as row:
+            s3_findings = check_s3_public_access(session, concurrency=args.concurrency, verbose=False)
+            row["events"] = len(s3_findings)
+        with stages.stage("iam_detector") as row:
+            iam_findings = check_iam_exposures(session, mode=args.iam_mode, verbose=False)
+            row["events"] = len(iam_findings)
+        extra = synthetic_findings(args.findings)
+        with stages.stage("findings_log") as row:
+            log.append(s3_findings + iam_findings + extra)
+            row["events"] = len(s3_findings) + len(iam_findings) + len(extra)
+        if args.reports:
+            write_legacy_reports(core.REPORTS_DIR, args.reports)
+        with stages.stage("core") as row:
+            core.main(legacy_reports=bool(args.reports))
+            state = read_json(core.STATE_PATH, {})
+            row["events"] = stages.results["findings_log"]["events"] + args.reports
+            row["counters"] = state.get("counters", {})
+        with stages.stage("responders") as row:
+            config = read_json(core.CONFIG_PATH, {})
+            settings = {"concurrency": args.concurrency,
+                        "rate_limits": {"s3": args.rate_limit, "iam": args.rate_limit}}
+            queue = RemediationQueue(session, config.get("policy", {}), settings)
+            queue.submit(s3_findings + iam_findings)
+            results = queue.run()
+            row["events"] = len(results)
+            row["failed"] = sum(1 for r in results if not r["ok"])
+
+    total = {"seconds": sum(r["seconds"] for r in stages.results.values()),
+             "api_calls": s3.total_calls + iam.total_calls,
+             "events": stages.results["findings_log"]["events"]}
+    if trace:
+        total["peak_mb"] = max(r["peak_mb"] for r in stages.results.values())
+    total["events_per_second"] = total["events"] / total["seconds"] if total["seconds"] else 0.0
+    stages.results["total"] = total
+    return stages.results
+
+
+def scenario_key(args):
+    return (f"buckets={args.buckets},public={args.public_ratio},users={args.users},"
+            f"nomfa={args.no_mfa_ratio},oldkey={args.old_key_ratio},findings={args.findings},"
+            f"reports={args.reports},latency={args.latency},concurrency={args.concurrency},"
+            f"iam={args.iam_mode}")
+
+
+def compare(results, baseline, tolerance):
+    """[(stage, metric, baseline, now)] for every metric that got worse."""
+    regressions = []
+    for stage, row in results.items():
+        base = baseline.get(stage)
+        if not base:
+            continue
+        for metric in COMPARED:
+            if metric not in base:
+                continue
+            slack = 0 if metric == "api_calls" else tolerance    # call counts must not grow at all
+            if row[metric] > base[metric] * (1 + slack) and row[metric] - base[metric] > NOISE_FLOOR[metric]:
+                regressions.append((stage, metric, base[metric], row[metric]))
+    return regressions
+
+
+def median_run(runs):
+    """Per stage, the run with the median wall time (metrics stay consistent within a run)."""
+    out = {}
+    for stage in runs[0]:
+        rows = sorted((r[stage] for r in runs), key=lambda row: row["seconds"])
+        out[stage] = rows[len(rows) // 2]
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--buckets", type=int, default=2000)
+    parser.add_argument("--public-ratio", type=float, default=0.1)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--no-mfa-ratio", type=float, default=0.2)
+    parser.add_argument("--old-key-ratio", type=float, default=0.2)
+    parser.add_argument("--findings", type=int, default=10000, help="extra synthetic findings for the core")
+    parser.add_argument("--reports", type=int, default=0, help="legacy markdown reports for the core")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per fake API call")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--iam-mode", choices=("report", "per_user"), default="report")
+    parser.add_argument("--rate-limit", type=float, default=1e6, help="responder calls/second per service")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per scenario; the median is kept")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown/memory growth (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    def run(trace=False):
+        work = Path(tempfile.mkdtemp(prefix="sentinel-load-"))
+        try:
+            return run_scenario(args, work, trace)
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+
+    results = median_run([run() for _ in range(max(1, args.repeat))])
+    traced = run(trace=True)    # memory only: tracing slows stages unevenly, so its times are dropped
+    for stage, row in results.items():
+        row["peak_mb"] = traced[stage]["peak_mb"]
+
+    key = scenario_key(args)
+    baselines = read_json(args.baseline, {})
+    baseline = baselines.get(key, {}).get("stages", {})
+
+    print(f"[i] {key}")
+    print(f"{'stage':>13} {'seconds':>8} {'api calls':>10} {'peak MB':>8} {'events':>8} {'events/s':>10} {'vs base':>8}")
+    for stage, row in results.items():
+        base = baseline.get(stage, {}).get("seconds")
+        delta = f"{(row['seconds'] / base - 1) * 100:+7.0f}%" if base else f"{'-':>8}"
+        print(f"{stage:>13} {row['seconds']:>8.3f} {row['api_calls']:>10} {row['peak_mb']:>8.1f} "
+              f"{row['events']:>8} {row['events_per_second']:>10.0f} {delta}")
+    counters = results["core"].get("counters", {})
+    print(f"[i] core counters: {', '.join(f'{k}={v}' for k, v in sorted(counters.items()))}")
+
+    regressions = compare(results, baseline, args.tolerance)
+    for stage, metric, before, now in regressions:
+        print(f"[!] REGRESSION {stage}.{metric}: {before:.3f} -> {now:.3f}")
+
+    if args.save_baseline:
+        baselines[key] = {"saved": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                          "stages": {s: {m: row[m] for m in COMPARED} for s, row in results.items()}}
+        Path(args.baseline).parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_json(args.baseline, baselines, indent=2)
+        print(f"[✓] Baseline saved to {args.baseline}")
+    elif not baseline:
+        print("[i] No baseline for this scenario yet; run again with --save-baseline to keep this one")
+    elif not regressions:
+        print(f"[✓] No regressions (tolerance {args.tolerance:.0%})")
+    return 1 if regressions and not args.save_baseline else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
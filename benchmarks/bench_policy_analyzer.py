@@ -0,0 +1,83 @@
+"""
+Benchmark the bucket-policy analyzer over synthetic policies.
+
+    python benchmarks/bench_policy_analyzer.py --policies 50000 --templates 200
+
+"unique" gives every policy its own statements (every one a cache miss, so it
+measures parse + compile + classify). "templated" stamps --templates documents
+onto many bucket names, the way buckets are usually created, so it mostly
+measures the cache.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(SRC))
+
+from utils.policy_analyzer import PolicyAnalyzer
+
+PRINCIPALS = ["*", {"AWS": "*"}, {"AWS": ["arn:aws:iam::111111111111:root", "*"]},
+              {"AWS": "arn:aws:iam::111111111111:root"}, {"Service": "cloudfront.amazonaws.com"}]
+ACTIONS = ["s3:GetObject", ["s3:GetObject", "s3:ListBucket"], "s3:PutObject", "s3:*", "s3:GetBucketLocation"]
+CONDITIONS = [None, None, {"StringEquals": {"aws:SourceVpc": "vpc-0abc"}},
+              {"StringEquals": {"aws:PrincipalOrgID": "o-example"}},
+              {"IpAddress": {"aws:SourceIp": ["203.0.113.0/24"]}},
+              {"StringEqualsIfExists": {"aws:SourceVpce": "vpce-0abc"}}]
+
+
+def synthetic_policy(rng, bucket, salt=""):
+    statements = []
+    for i in range(rng.randint(1, 4)):
+        s = {"Sid": f"S{i}{salt}", "Effect": rng.choice(("Allow", "Allow", "Deny")),
+             "Action": rng.choice(ACTIONS),
+             "Resource": [f"arn:aws:s3:::{bucket}", f"arn:aws:s3:::{bucket}/*"]}
+        if rng.random() < 0.1:
+            s["NotPrincipal"] = {"AWS": "arn:aws:iam::111111111111:root"}
+        else:
+            s["Principal"] = rng.choice(PRINCIPALS)
+        condition = rng.choice(CONDITIONS)
+        if condition:
+            s["Condition"] = condition
+        statements.append(s)
+    return json.dumps({"Version": "2012-10-17", "Statement": statements})
+
+
+def run(analyzer, docs):
+    analyzer.clear()
+    started = time.perf_counter()
+    exposed = 0
+    for bucket, text in docs:
+        exposed += bool(analyzer.public_exposures(text, bucket))
+    return time.perf_counter() - started, exposed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--policies", type=int, default=50000)
+    parser.add_argument("--templates", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    unique = [(f"bucket-{i}", synthetic_policy(rng, f"bucket-{i}", salt=f"-{i}")) for i in range(args.policies)]
+    # A template is a policy written for "tmpl-N", re-stamped with each bucket's name
+    templates = [synthetic_policy(rng, f"tmpl-{t}") for t in range(args.templates)]
+    templated = []
+    for i in range(args.policies):
+        t = i % args.templates
+        templated.append((f"bucket-{i}", templates[t].replace(f"tmpl-{t}", f"bucket-{i}")))
+
+    analyzer = PolicyAnalyzer(max_entries=max(4096, args.templates))
+    print(f"{'mode':>10} {'policies':>9} {'seconds':>8} {'us/policy':>10} {'exposed':>8} {'hits':>7}")
+    for mode, docs in (("unique", unique), ("templated", templated)):
+        elapsed, exposed = run(analyzer, docs)
+        print(f"{mode:>10} {len(docs):>9} {elapsed:>8.2f} {elapsed / len(docs) * 1e6:>10.1f} "
+              f"{exposed:>8} {analyzer.hits:>7}")
+
+
+if __name__ == "__main__":
+    main()
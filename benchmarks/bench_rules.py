@@ -0,0 +1,74 @@
+"""
+Benchmark the escalation rule engine with many rules.
+
+    python benchmarks/bench_rules.py --rules 500 --types 200 --cycles 1000
+
+Generates --rules rules over --types event-type counters (two-step ladders
+with de-escalation and cooldowns), then runs --cycles evaluations where a
+few counters change per cycle, the way a core cycle usually looks. "full"
+forces every rule to be evaluated each cycle for comparison.
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(SRC))
+
+from utils.rules import RuleSet
+
+
+def synthetic_rules(n_rules, n_types, rng):
+    specs = []
+    for i in range(0, n_rules, 2):
+        counter = f"T{rng.randrange(n_types):03d}_24h"
+        section = f"sec{i % 20}"
+        specs.append({"name": f"r{i}", "when": f"{counter} >= 5 or score.d{i % 7} >= 50",
+                      "set": {f"{section}.knob{i}": True}})
+        specs.append({"name": f"r{i + 1}", "after": f"r{i}", "when": f"{counter} >= 8",
+                      "set": {f"{section}.hard{i}": True},
+                      "revert_when": f"{counter} < 2", "cooldown_minutes": 30})
+    return specs[:n_rules]
+
+
+def run(rules, n_types, cycles, changes_per_cycle, full, rng):
+    config = {"policy": {}}
+    state = {"counters": {f"T{t:03d}_24h": 0 for t in range(n_types)},
+             "scores": {"total": {f"d{d}": 0.0 for d in range(7)}}}
+    now = 1_800_000_000.0
+    flips = 0
+    started = time.perf_counter()
+    for _ in range(cycles):
+        now += 60
+        for _ in range(changes_per_cycle):
+            name = f"T{rng.randrange(n_types):03d}_24h"
+            state["counters"][name] = max(0, state["counters"][name] + rng.choice((-3, -1, 1, 2, 3)))
+        if full:
+            state.get("rules", {}).pop("inputs", None)
+        flips += len(rules.evaluate(config, state, now))
+    return (time.perf_counter() - started) / cycles * 1e6, flips
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rules", type=int, default=500)
+    parser.add_argument("--types", type=int, default=200, help="distinct counters")
+    parser.add_argument("--cycles", type=int, default=1000)
+    parser.add_argument("--changes", type=int, default=5, help="counters that change per cycle")
+    args = parser.parse_args()
+
+    specs = synthetic_rules(args.rules, args.types, random.Random(1))
+    started = time.perf_counter()
+    rules = RuleSet(specs)
+    print(f"[i] Compiled {len(rules.rules)} rules in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    print(f"{'mode':>12} {'µs/cycle':>9} {'changes':>8}")
+    for label, full in (("incremental", False), ("full", True)):
+        us, flips = run(RuleSet(specs), args.types, args.cycles, args.changes, full, random.Random(2))
+        print(f"{label:>12} {us:>9.1f} {flips:>8}")
+
+
+if __name__ == "__main__":
+    main()
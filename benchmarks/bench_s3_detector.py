@@ -0,0 +1,47 @@
+"""
+Benchmark the S3 public access detector against the local stub S3.
+
+    python benchmarks/bench_s3_detector.py --buckets 2000 --latency 0.02 --concurrency 1 8 32
+
+No AWS credentials needed: every call goes to utils.aws_stub.StubS3Client,
+which sleeps `--latency` seconds per call to mimic the network round trip.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(SRC))
+
+from detectors.s3_public_access_detector import check_s3_public_access
+from utils.aws_stub import StubS3Client, StubSession
+from utils.inventory_cache import InventoryCache
+
+
+def run_once(n_buckets, latency, concurrency, throttle_rate):
+    s3 = StubS3Client.synthetic(n_buckets, latency=latency, throttle_rate=throttle_rate)
+    started = time.perf_counter()
+    # A fresh in-memory cache, so each run really lists and fetches every bucket
+    findings = check_s3_public_access(StubSession(s3=s3), concurrency=concurrency, verbose=False,
+                                      cache=InventoryCache(None))
+    elapsed = time.perf_counter() - started
+    return elapsed, s3.total_calls, len(findings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--buckets", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.01, help="seconds per fake API call")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of calls throttled")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    args = parser.parse_args()
+
+    print(f"{'concurrency':>11} {'seconds':>9} {'calls':>7} {'findings':>9} {'buckets/s':>10}")
+    for c in args.concurrency:
+        elapsed, calls, n = run_once(args.buckets, args.latency, c, args.throttle_rate)
+        print(f"{c:>11} {elapsed:>9.2f} {calls:>7} {n:>9} {args.buckets / elapsed:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
-import os, json, glob, time    # stdlib: filesystem, JSON, file-matching patterns, timestamps
-from datetime import datetime, timezone, timedelta
+import io, sys, json, time, uuid, argparse    # stdlib: in-memory text, JSON, timestamps, ids
+from datetime import datetime, timezone
 from pathlib import Path
 
 # Figure out repo root *relative to this file*:
@@ -7,10 +7,26 @@ from pathlib import Path
 # .parents[2] walks up two directories -> repo root
 ROOT = Path(__file__).resolve().parents[2]
 
+# Make src/ importable so we can share code with the detectors
+if str(ROOT / "src") not in sys.path:
+    sys.path.insert(0, str(ROOT / "src"))
+
+from utils.counters import SlidingWindowCounter
+from utils.event_store import EventStore
+from utils.findings import FindingsLog, FINDINGS_PATH
+from utils.metrics import METRICS, profile_run
+from utils.report_store import report_store
+from utils.risk import RiskScores
+from utils.rules import load_rules
+from utils.storage import FileLock, atomic_write_json
+
 # Where to read detector reports, read/write config, and writre core reports
 REPORTS_DIR = ROOT / "reports" / "sample_output"
 CONFIG_PATH  = ROOT / "configs" / "sentinel_config.json"
+RULES_PATH   = ROOT / "configs" / "sentinel_rules.json"
 STATE_PATH   = ROOT / "state" / "sentinel_state.json"
+EVENTS_PATH  = ROOT / "state" / "sentinel_events.db"
+LOCK_PATH    = ROOT / "state" / "sentinel.lock"
 CORE_REPORTS_DIR = REPORTS_DIR  # reuse same folder for core report for now
 
 # ---- helpers ---------------------------------------------------------------
@@ -31,25 +47,44 @@ def _load_json(p: Path, default):
     return default
 
 def _save_json(p: Path, data):
-    """Write JSON to path `p` (pretty, UTF-8) and ensure folder exists."""
-    p.parent.mkdir(parents=True, exist_ok=True)
-    with open(p, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+    """Write JSON to path `p` (pretty, UTF-8) atomically: temp file, fsync, rename."""
+    atomic_write_json(p, data, indent=2)
+
+def state_lock():
+    """
+    Exclusive lock for a whole load -> run_cycle -> save sequence, so two core
+    runs (cron + engine, an org sweep...) can't overwrite each other's state.
+    """
+    return FileLock(LOCK_PATH)
+
+def state_stamp():
+    """Changes whenever the state file is rewritten (used to notice other writers)."""
+    try:
+        st = STATE_PATH.stat()
+        return (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        return None
+
+_EVENT_STORE = None
+
+def event_store():
+    """The process-wide EventStore behind the dedup index and event history."""
+    global _EVENT_STORE
+    if _EVENT_STORE is None:
+        _EVENT_STORE = EventStore(EVENTS_PATH, dedup_ttl_seconds=RETENTION_HOURS * 3600)
+    return _EVENT_STORE
 
 def _list_recent_reports(patterns, within_hours=24):
     """
-    Given filename patterns (glob), return files in reports/ modified within N hours,
-    sorted by modification time (oldest -> newest).
+    Given report type patterns (glob), return reports written within N hours,
+    oldest -> newest. Served from the report store's index, not a directory scan.
     """
-    files = []
-    cutoff = time.time() - within_hours * 3600
-    for pat in patterns:
-        for fp in glob.glob(str(REPORTS_DIR / pat)):
-            if os.path.getmtime(fp) >= cutoff:
-                files.append(fp)
-    return sorted(files, key=os.path.getmtime)
+    return [str(p) for p in report_store(REPORTS_DIR).recent(patterns, within_hours)]
 
-# ---- parsers for our current detectors ------------------------------------
+# ---- legacy markdown parsers ----------------------------------------------
+# Detectors now append structured findings to the findings log (see main).
+# These are only used with --legacy-reports, e.g. for the hand-written demo
+# reports in docs/showcase_phase1_arl.md.
 
 def parse_s3_reports(paths):
     """
@@ -58,8 +93,11 @@ def parse_s3_reports(paths):
     """
     findings = []
     for p in paths:
-        with open(p, "r", encoding="utf-8", errors="ignore") as f:
-            txt = f.read()
+        try:
+            with open(p, "r", encoding="utf-8", errors="ignore") as f:
+                txt = f.read()
+        except FileNotFoundError:
+            continue    # deleted since it was listed
         if ("Public bucket policy detected" in txt
             or "Public Access Block not fully enabled" in txt):
             findings.append({"type": "S3_PUBLIC", "report": p})
@@ -72,83 +110,124 @@ def parse_iam_reports(paths):
     """
     findings = []
     for p in paths:
-        with open(p, "r", encoding="utf-8", errors="ignore") as f:
-            for line in f:
-                if "has no MFA enabled" in line:
-                    findings.append({"type": "IAM_NO_MFA", "report": p})
+        try:
+            with open(p, "r", encoding="utf-8", errors="ignore") as f:
+                for line in f:
+                    if "has no MFA enabled" in line:
+                        findings.append({"type": "IAM_NO_MFA", "report": p})
+        except FileNotFoundError:
+            continue    # deleted since it was listed
     return findings
 
 # ---- core logic ------------------------------------------------------------
 
-def rollup_events_into_state(state, new_events):
+# Sliding-window settings: per-minute buckets, 48h retention, 24h counters
+BUCKET_SECONDS   = 60
+RETENTION_HOURS  = 48
+WINDOW_HOURS     = 24
+
+def _parse_ts(ts):
+    """ISO timestamp -> epoch seconds (None if malformed)."""
+    try:
+        return datetime.fromisoformat(ts).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+def _match_event_store(state, store):
     """
-    Merge new events into state['events'] (with timestamps) and recompute 24h counters.
-    Also garbage-collect old events (>48h) to keep state small.
+    The event store belongs to one state file (same state["events_epoch"]).
+    A state without an epoch and without windows was just reset (deleted or
+    rewritten by hand, as in the showcase), and one with another epoch came
+    from elsewhere: either way the store's dedup rows aren't its history, so
+    they're cleared. A state from before epochs existed adopts the store.
     """
+    epoch = state.get("events_epoch")
+    if epoch is not None and epoch == store.epoch():
+        return
+    if epoch is None and "windows" in state:
+        state["events_epoch"] = store.epoch() or uuid.uuid4().hex
+        store.set_epoch(state["events_epoch"])
+    else:
+        state["events_epoch"] = uuid.uuid4().hex
+        store.set_epoch(state["events_epoch"], clear=True)
 
-    # De-duplicate: dont count the exact same type, report pair twice
-    seen = {(e["type"], e.get("report", "")) for e in state["events"]}
-    for e in new_events:
-        key = (e["type"], e.get("report", ""))
-        if key not in seen:
-            e["ts"] = _now_iso()              # stamp with current time
-            state["events"].append(e)
+def _load_windows(state, store, now):
+    """
+    Rebuild the window counter from state. Older state files are migrated
+    once: their plain 'events' list is counted and dropped from the state.
+    """
+    windows = SlidingWindowCounter.from_dict(
+        state.get("windows"), bucket_seconds=BUCKET_SECONDS,
+        retention_seconds=RETENTION_HOURS * 3600, windows=(WINDOW_HOURS * 3600,))
+    legacy = state.pop("events", None)
+    if legacy:
+        _count_events(windows, store, legacy, now)
+    return windows
+
+def _count_events(windows, store, events, now):
+    """Add each not-yet-seen event to the window counter. Returns the new ones as (event, ts)."""
+    added = []
+    for e in events:
+        ts = _parse_ts(e.get("ts")) if e.get("ts") else now   # findings carry their own detection time
+        if ts is None:
+            continue
+        ts = min(ts, now)
+        # De-duplicate: dont count the same finding (or the same type, report pair) twice
+        key = f'{e["type"]}|{e.get("id") or e.get("report", "")}'
+        if not store.add(key, e["type"], ts, now, e.get("resource"), e.get("severity"), e.get("detector")):
+            continue
+        windows.add(e["type"], ts)
+        added.append((e, ts))
+    return added
 
-    # Keep only the last 48h of events (larger than our 24h counters)
-    cutoff_dt = datetime.now(timezone.utc) - timedelta(hours=48)
-    def _keep(e):
-        try:
-            return datetime.fromisoformat(e["ts"]) >= cutoff_dt
-        except Exception:
-            # If anything is malformed keep it than it crash; next run can clean it.
-            return True
-    state["events"] = [e for e in state["events"] if _keep(e)]
+def rollup_events_into_state(state, new_events, now=None, store=None, scoring=None):
+    """
+    Count new events into per-type sliding windows and refresh the 24h counters
+    and the risk scores.
 
-    # Recompute the rolling 24h counters from events
+    Every event type gets a '<TYPE>_24h' counter. Inserts and window reads are
+    O(1), and state holds only fixed-size bucket rings; the dedup index and
+    event history live in the SQLite `store` (default: event_store()), which
+    only writes this run's rows. `now` (epoch seconds) defaults to the wall clock.
+    `scoring` is the config's scoring block (weights, half-life).
+
+    state['scores'] holds the decayed risk per policy domain (total and the
+    riskiest single entity); per-entity scores are kept in state['risk'].
+    """
+    now = time.time() if now is None else now
+    store = store if store is not None else event_store()     # an empty store is falsy
+    _match_event_store(state, store)
+    windows = _load_windows(state, store, now)
+    windows.advance(now)
+    counted = _count_events(windows, store, new_events, now)
+    store.prune(now)
+    METRICS.inc("sentinel_events_total", len(counted))
+
+    risk = RiskScores.from_dict(state.get("risk"), scoring).rescore(counted, now)
+    state["risk"] = risk.to_dict()
+    state["scores"] = {"total": risk.domain_totals(), "max": risk.domain_max(), "top": risk.top(10)}
+
+    window = WINDOW_HOURS * 3600
     counters = {"IAM_NO_MFA_24h": 0, "S3_PUBLIC_24h": 0}
-    cutoff_24 = datetime.now(timezone.utc) - timedelta(hours=24)
-    for e in state["events"]:
-        try:
-            ts = datetime.fromisoformat(e["ts"])
-        except Exception:
-            continue
-        if ts >= cutoff_24:
-            if e["type"] == "IAM_NO_MFA":
-                counters["IAM_NO_MFA_24h"] += 1
-            elif e["type"] == "S3_PUBLIC":
-                counters["S3_PUBLIC_24h"] += 1
+    for event_type in windows.types():
+        counters[f"{event_type}_{WINDOW_HOURS}h"] = windows.count(event_type, window)
 
+    state["windows"] = windows.to_dict()
     state["counters"] = counters
-    state["last_updated"] = _now_iso()
+    state["last_updated"] = datetime.fromtimestamp(now, timezone.utc).isoformat()
     return state
 
-def adapt_config(config, state):
+def adapt_config(config, state, now=None, rules=None):
     """
-    Compare counters vs thresholds and flip policy knobs if thresholds are exceeded.
+    Run the escalation rules (configs/sentinel_rules.json) against the counters
+    and risk scores, flipping policy knobs whose conditions are met (and
+    reverting de-escalation rules). Rules are compiled once per file version
+    and only the ones whose inputs changed are re-evaluated; see utils/rules.py.
     Returns the possibly-updated config and a list of human-readable 'changes'.
     """
-    changed = []
-
-    s3_th  = int(config["policy"]["s3"]["escalation_threshold_24h"])
-    iam_th = int(config["policy"]["iam"]["escalation_threshold_24h"])
-
-    # If too many S3 public issues in 24h, escalate from tag-only to auto-remediate
-    if state["counters"]["S3_PUBLIC_24h"] >= s3_th:
-        if not config["policy"]["s3"]["auto_remediate_public"]:
-            config["policy"]["s3"]["auto_remediate_public"] = True
-            config["policy"]["s3"]["auto_tag_only"] = False
-            changed.append("S3: escalated to auto_remediate_public=True")
-
-    # If too many IAM no-MFA in 24h... require MFA;
-    # and if it gets *really* bad, disable keys automatically.
-    if state["counters"]["IAM_NO_MFA_24h"] >= iam_th:
-        if not config["policy"]["iam"]["require_mfa"]:
-            config["policy"]["iam"]["require_mfa"] = True
-            changed.append("IAM: set require_mfa=True")
-        if (state["counters"]["IAM_NO_MFA_24h"] >= iam_th + 2
-            and not config["policy"]["iam"]["disable_keys_on_nomfa"]):
-            config["policy"]["iam"]["disable_keys_on_nomfa"] = True
-            changed.append("IAM: set disable_keys_on_nomfa=True")
+    now = time.time() if now is None else now
+    rules = rules or load_rules(RULES_PATH)
+    changed = rules.evaluate(config, state, now)
 
     # Stamp updated_at every time we evaluate (or you could do it only if its changed)
     config["updated_at"] = _now_iso()
@@ -160,14 +239,20 @@ def save_core_report(state, config, changes):
     a JSON snapshot of current policy, into reports/sample_output/.
     """
     ts = datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
-    path = CORE_REPORTS_DIR / f"sentinel_core_report_{ts}.md"
-    CORE_REPORTS_DIR.mkdir(parents=True, exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
+    with io.StringIO() as f:
         f.write("# Sentinel Core (Adaptive Response Loop) Report\n\n")
         f.write(f"Generated: {ts}\n\n")
         f.write("## 24h Counters\n")
         for k, v in state["counters"].items():
             f.write(f"- {k}: {v}\n")
+        scores = state.get("scores", {})
+        if scores.get("top"):
+            f.write("\n## Risk Scores\n")
+            for domain, total in scores["total"].items():
+                f.write(f"- {domain}: {total} (max entity {scores['max'][domain]})\n")
+            f.write("\nHighest-risk entities:\n")
+            for key, score in scores["top"]:
+                f.write(f"- {key}: {score}\n")
         f.write("\n## Changes Applied\n")
         if not changes:
             f.write("- None (no escalation)\n")
@@ -178,46 +263,103 @@ def save_core_report(state, config, changes):
         f.write("```json\n")
         f.write(json.dumps(config["policy"], indent=2))
         f.write("\n```\n")
+        path = report_store(CORE_REPORTS_DIR).write("sentinel_core_report", f.getvalue())
     print(f"[✓] Core report saved: {path}")
 
-def main():
-    # Load current config/state or sensible defaults if files don't exist yet
-    config = _load_json(CONFIG_PATH, {"version": 1, "updated_at": "", "policy": {"iam":{}, "s3":{}}})
-    state  = _load_json(STATE_PATH,  {"events": [], "counters": {"IAM_NO_MFA_24h":0, "S3_PUBLIC_24h":0}, "last_updated": ""})
-
-    # Look back 24h for files that *look like* existing detector reports
-    s3_paths  = _list_recent_reports(["*s3*report*.md", "*s3*_public*detector*.md"], within_hours=24)
-    iam_paths = _list_recent_reports(["iam_*report*.md"], within_hours=24)
+def read_new_findings(state, log=None):
+    """
+    Read only the findings appended since the last run, using the byte offset
+    saved in state['findings_offset']. Returns (findings, new_offset); the caller
+    stores the offset *with* the state so both are saved together.
+    """
+    log = log or FindingsLog(FINDINGS_PATH)
+    return log.read_from(state.get("findings_offset", 0))
 
-    # Parse those files into normalized "events"
-    s3_findings  = parse_s3_reports(s3_paths)
-    iam_findings = parse_iam_reports(iam_paths)
-    new_events = s3_findings + iam_findings
+def load_config_and_state():
+    """Load current config/state or sensible defaults if files don't exist yet."""
+    config = _load_json(CONFIG_PATH, {"version": 1, "updated_at": "", "policy": {"iam":{}, "s3":{}}})
+    state  = _load_json(STATE_PATH,  {"counters": {"IAM_NO_MFA_24h":0, "S3_PUBLIC_24h":0}, "last_updated": ""})
+    return config, state
 
-    print(f"[i] Found {len(new_events)} new events from recent reports.")
+def save_config_and_state(config, state, store=None):
+    """
+    Save state and config atomically, then commit the run's events. If we die
+    in between, the next run re-reads nothing (the cursor moved with the state)
+    and at worst the event history misses one batch - nothing is double counted.
+    """
+    _save_json(STATE_PATH, state)
+    _save_json(CONFIG_PATH, config)
+    (store if store is not None else event_store()).commit()
 
-    # Update rolling memory + counters
-    state = rollup_events_into_state(state, new_events)
+def run_cycle(config, state, new_events, now=None, store=None, rules=None):
+    """
+    One pass of the Adaptive Response Loop, entirely in memory:
+    roll new events into the counters, then adapt the policy.
+    `rules` defaults to the compiled configs/sentinel_rules.json.
+    Returns (config, state, changes, escalated).
+    """
+    # Update rolling memory + counters + risk scores
+    with METRICS.timer("core.rollup"):
+        state = rollup_events_into_state(state, new_events, now=now, store=store, scoring=config.get("scoring"))
+    for name, value in state["counters"].items():
+        METRICS.set("sentinel_counter", value, name=name)
+    for domain, score in state["scores"]["total"].items():
+        METRICS.set("sentinel_risk_score", score, domain=domain)
 
     # Compare before/after to know if the policy actually changed
     config_before = json.dumps(config["policy"], sort_keys=True)
-    config, changes = adapt_config(config, state)
+    with METRICS.timer("core.adapt"):
+        config, changes = adapt_config(config, state, now=now, rules=rules)
     config_after  = json.dumps(config["policy"], sort_keys=True)
+    return config, state, changes, config_before != config_after
 
-    # Persist state + (possibly) updated config, and write a core report
-    _save_json(STATE_PATH, state)
-    _save_json(CONFIG_PATH, config)
-    save_core_report(state, config, changes)
+def main(legacy_reports=False, cprofile_dir=None):
+    with state_lock(), profile_run("core", cprofile_dir):
+        _main(legacy_reports)
+
+def _main(legacy_reports):
+    config, state = load_config_and_state()
+
+    # Only the tail of the findings log we haven't seen yet
+    with METRICS.timer("core.read_findings"):
+        findings, offset = read_new_findings(state)
+        new_events = [f.to_event() for f in findings]
+
+    if legacy_reports:
+        # Look back 24h for files that *look like* existing detector reports
+        with METRICS.timer("core.list_reports"):
+            s3_paths  = _list_recent_reports(["*s3*report*", "*s3*_public*detector*"], within_hours=24)
+            iam_paths = _list_recent_reports(["iam_*report*"], within_hours=24)
+        with METRICS.timer("core.parse_reports"):
+            new_events += parse_s3_reports(s3_paths) + parse_iam_reports(iam_paths)
+
+    print(f"[i] Found {len(new_events)} new events.")
+
+    config, state, changes, escalated = run_cycle(config, state, new_events)
+
+    # Persist state (with the log cursor) + (possibly) updated config, and write a core report
+    state["findings_offset"] = offset
+    with METRICS.timer("core.save"):
+        save_config_and_state(config, state)
+    with METRICS.timer("core.report"):
+        save_core_report(state, config, changes)
+    METRICS.write_textfile("core", config.get("metrics"))
 
     # Console feedback for you during runs
-    if config_before != config_after:
+    if escalated:
         print("[+] Policy escalated based on recent events:")
-        print(config_after)
+        print(json.dumps(config["policy"], sort_keys=True))
     else:
         print("[-] No escalation needed.")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="SynAccel Sentinel core (Adaptive Response Loop)")
+    parser.add_argument("--legacy-reports", action="store_true",
+                        help="also scrape markdown reports in reports/sample_output (demo mode)")
+    parser.add_argument("--cprofile", metavar="DIR",
+                        help="profile this run with cProfile and save the stats in DIR")
+    args = parser.parse_args()
+    main(legacy_reports=args.legacy_reports, cprofile_dir=args.cprofile)
 
                 
                   
@@ -0,0 +1,427 @@
+from botocore.exceptions import ClientError
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+import argparse
+import gzip
+import io
+import json
+import re
+import sys
+import time
+
+# Make src/ importable when this file is run directly (python src/detectors/...)
+SRC = Path(__file__).resolve().parents[1]
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from utils.clients import ClientPool
+from utils.findings import Finding, FindingsLog, render_markdown
+from utils.metrics import METRICS, profile_run
+from utils.sessions import create_aws_session
+from utils.storage import atomic_write_json, read_json
+
+DETECTOR = "cloudtrail_anomaly"
+CONFIG_PATH = SRC.parent / "configs" / "sentinel_config.json"
+BASELINE_PATH = SRC.parent / "state" / "cloudtrail_baseline.json"
+
+# Used for anything the `detectors.cloudtrail` config block leaves out
+DEFAULT_SETTINGS = {
+    "sources": [],                  # local folders and/or s3://bucket/prefix
+    "warmup_events": 50,            # learn quietly until a principal has this many events
+    "max_principals": 10000,        # least recently active principals are forgotten first
+    "max_regions": 32,              # per principal
+    "max_actions": 512,             # per principal
+    "spike_factor": 5.0,            # a minute this many times the usual rate is a spike...
+    "min_spike_per_minute": 60,     # ...and at least this many calls
+    "ewma_alpha": 0.1,              # weight of the newest minute in the usual rate
+}
+
+# Calls worth a finding the first time a (warmed-up) principal makes them
+SENSITIVE_EVENTS = frozenset({
+    "StopLogging", "DeleteTrail", "UpdateTrail", "PutEventSelectors",
+    "PutBucketPolicy", "PutBucketAcl", "DeleteBucketPolicy", "PutBucketPublicAccessBlock",
+    "DeletePublicAccessBlock", "CreateAccessKey", "CreateUser", "CreateLoginProfile",
+    "UpdateLoginProfile", "AttachUserPolicy", "AttachRolePolicy", "PutUserPolicy",
+    "PutRolePolicy", "CreatePolicyVersion", "UpdateAssumeRolePolicy", "DeactivateMFADevice",
+    "DeleteDetector", "DisableSecurityHub", "DeleteFlowLogs", "ModifySnapshotAttribute",
+})
+
+CHUNK_CHARS = 1 << 16
+# How deep to look for `<account>/CloudTrail/<region>/` folders below an s3:// source
+STREAM_DEPTH = 5
+_STREAM = re.compile(r"(?:^|/)CloudTrail/[^/]+/")
+
+# ---- streaming input -------------------------------------------------------
+
+def iter_records(text_stream, chunk_chars=CHUNK_CHARS):
+    """
+    Yield the records of one CloudTrail log ({"Records": [{...}, ...]}) one at
+    a time, reading `chunk_chars` at a time, so a file never sits in memory
+    whole - only the record being decoded and one chunk of look-ahead.
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = text_stream.read(chunk_chars)
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + chunk     # drop what we've consumed
+        pos = 0
+
+    # Skip to the opening bracket of the Records array
+    while True:
+        start = buf.find('"Records"', pos)
+        if start >= 0:
+            bracket = buf.find("[", start)
+            if bracket >= 0:
+                pos = bracket + 1
+                break
+        if eof:
+            return
+        fill()
+
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(buf):
+            if eof:
+                return
+            fill()
+            continue
+        if buf[pos] == "]":
+            return
+        try:
+            record, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            fill()          # record runs past the buffer; read more and retry
+            continue
+        pos = end
+        yield record
+
+
+def _open_text(raw, key):
+    """Text stream over a (possibly gzipped) binary stream, decompressed as it's read."""
+    if key.endswith(".gz"):
+        raw = gzip.GzipFile(fileobj=raw, mode="rb")
+    return io.TextIOWrapper(raw, encoding="utf-8")
+
+
+def _is_log_key(key):
+    # CloudTrail also writes integrity digests next to the logs; those aren't records
+    return key.endswith((".json", ".json.gz")) and "CloudTrail-Digest" not in key
+
+
+def log_stream(key):
+    """
+    The `.../<account>/CloudTrail/<region>/` folder a log key is in ("" if the
+    key isn't laid out that way). Files only arrive in key order within one
+    such folder: a late file from another account or region can sort before
+    keys already read, so cursors are kept per stream.
+    """
+    match = None
+    for match in _STREAM.finditer(key):
+        pass
+    return key[:match.end()] if match else ""
+
+
+def _s3_prefixes(s3, bucket, prefix, depth=STREAM_DEPTH):
+    """The prefixes to list under `prefix`: each stream folder below it, or `prefix` itself."""
+    if depth == 0 or log_stream(prefix):
+        return [prefix]
+    children, has_files = [], False
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix, Delimiter="/"):
+        children += [p["Prefix"] for p in page.get("CommonPrefixes", [])]
+        has_files = has_files or bool(page.get("Contents"))
+    if has_files or not children:
+        return [prefix]
+    found = []
+    for child in children:
+        if not child.endswith("CloudTrail-Digest/"):
+            found += _s3_prefixes(s3, bucket, child, depth - 1)
+    return found
+
+
+def stream_cursors(saved):
+    """
+    A source's saved cursors as {stream: last key}. Older state kept one key
+    per source; it becomes the "*" cursor, the default of every stream.
+    """
+    if isinstance(saved, str):
+        return {"*": saved}
+    return dict(saved or {})
+
+
+def iter_log_files(source, session=None, cursors=None):
+    """
+    Yield (stream, key, opener) for each log file of a source that sorts after
+    its stream's cursor, in key order. A source is a local folder or
+    "s3://bucket/prefix". `opener()` returns a binary stream.
+
+    `cursors` maps stream (see log_stream) -> last key done; "*" is the
+    cursor of streams without their own (see stream_cursors).
+    """
+    done = cursors or {}
+    legacy = done.get("*", "")
+
+    if source.startswith("s3://"):
+        bucket, _, prefix = source[5:].partition("/")
+        s3 = session.client("s3")
+        paginator = s3.get_paginator("list_objects_v2")
+        for listed in _s3_prefixes(s3, bucket, prefix):
+            start_after = done.get(log_stream(listed), legacy)
+            for page in paginator.paginate(Bucket=bucket, Prefix=listed, StartAfter=start_after):
+                for obj in page.get("Contents", []):
+                    key = obj["Key"]
+                    stream = log_stream(key)
+                    if _is_log_key(key) and key > done.get(stream, legacy):
+                        yield stream, key, (lambda key=key: s3.get_object(Bucket=bucket, Key=key)["Body"])
+        return
+
+    root = Path(source)
+    base = root.resolve().as_posix().rstrip("/") + "/"
+    for path in sorted(root.rglob("*")):
+        key = path.relative_to(root).as_posix()
+        stream = log_stream(base + key)[len(base):]     # "" when the folder is inside one stream
+        if key > done.get(stream, legacy) and path.is_file() and _is_log_key(key):
+            yield stream, key, (lambda path=path: open(path, "rb"))
+
+
+def open_log_file(source, key, session=None):
+    """Text stream over one log file of `source`, decompressed as it's read."""
+    if source.startswith("s3://"):
+        bucket = source[5:].partition("/")[0]
+        raw = session.client("s3").get_object(Bucket=bucket, Key=key)["Body"]
+    else:
+        raw = open(Path(source) / key, "rb")
+    return _open_text(raw, key)
+
+# ---- baselines -------------------------------------------------------------
+
+def principal_of(record):
+    """Who made the call. Assumed-role sessions collapse onto their role."""
+    ident = record.get("userIdentity") or {}
+    arn = ident.get("arn") or ""
+    if ":assumed-role/" in arn:
+        arn = arn.rsplit("/", 1)[0]
+    return arn or ident.get("principalId") or ident.get("type") or "unknown"
+
+
+def _epoch(event_time):
+    try:
+        return datetime.fromisoformat(event_time.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+class PrincipalBaseline:
+    """What one principal normally does. Fixed-size apart from the capped sets."""
+    __slots__ = ("events", "regions", "actions", "minute", "minute_count", "rate")
+
+    def __init__(self, events=0, regions=(), actions=(), minute=0, minute_count=0, rate=0.0):
+        self.events = events
+        self.regions = set(regions)
+        self.actions = set(actions)
+        self.minute = minute
+        self.minute_count = minute_count
+        self.rate = rate        # EWMA of calls per active minute
+
+    def to_dict(self):
+        return {"events": self.events, "regions": sorted(self.regions), "actions": sorted(self.actions),
+                "minute": self.minute, "minute_count": self.minute_count, "rate": round(self.rate, 3)}
+
+
+class BaselineModel:
+    """
+    Rolling per-principal baselines in bounded memory: at most
+    `max_principals` principals (least recently active evicted), each with
+    capped region/action sets and an EWMA call rate.
+    """
+
+    def __init__(self, settings=None):
+        self.settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+        self.principals = OrderedDict()     # principal -> PrincipalBaseline
+
+    def _baseline(self, principal):
+        b = self.principals.get(principal)
+        if b is None:
+            b = self.principals[principal] = PrincipalBaseline()
+            if len(self.principals) > self.settings["max_principals"]:
+                self.principals.popitem(last=False)
+        else:
+            self.principals.move_to_end(principal)
+        return b
+
+    def observe(self, record):
+        """Learn from one record. Returns a list of anomaly Findings (usually empty)."""
+        ident_type = (record.get("userIdentity") or {}).get("type")
+        ts = _epoch(record.get("eventTime"))
+        if ts is None or ident_type == "AWSService":
+            return []
+
+        s = self.settings
+        principal = principal_of(record)
+        b = self._baseline(principal)
+        warmed = b.events >= s["warmup_events"]
+        name = record.get("eventName", "")
+        action = f'{record.get("eventSource", "").split(".")[0]}:{name}'
+        region = record.get("awsRegion", "")
+        anomalies = []
+
+        minute = int(ts // 60)
+        if minute > b.minute:
+            if b.minute_count:
+                b.rate = (s["ewma_alpha"] * b.minute_count + (1 - s["ewma_alpha"]) * b.rate
+                          if b.rate else float(b.minute_count))
+            b.minute, b.minute_count = minute, 0
+        # Out-of-order records (files interleave across regions) count toward the current minute
+        b.minute_count += 1
+        threshold = max(s["min_spike_per_minute"], int(s["spike_factor"] * b.rate) + 1)
+        if warmed and b.minute_count == threshold:
+            anomalies.append(_finding(
+                record, principal, "CT_RATE_SPIKE", "medium", str(minute),
+                f"{principal} made {threshold}+ calls in one minute (usual ~{b.rate:.0f}/min)",
+                usual_rate=round(b.rate, 1)))
+
+        if region and region not in b.regions:
+            if warmed and b.regions:
+                anomalies.append(_finding(
+                    record, principal, "CT_NEW_REGION", "medium", region,
+                    f"{principal} active in a new region: {region}", known_regions=sorted(b.regions)))
+            if len(b.regions) < s["max_regions"]:
+                b.regions.add(region)
+
+        if action not in b.actions:
+            if warmed and name in SENSITIVE_EVENTS:
+                anomalies.append(_finding(
+                    record, principal, "CT_NEW_ACTION", "high", action,
+                    f"{principal} called {action} for the first time"))
+            if len(b.actions) < s["max_actions"]:
+                b.actions.add(action)
+
+        b.events += 1
+        return anomalies
+
+    def to_dict(self):
+        return {p: b.to_dict() for p, b in self.principals.items()}
+
+    @classmethod
+    def from_dict(cls, d, settings=None):
+        model = cls(settings)
+        for principal, b in (d or {}).items():
+            model.principals[principal] = PrincipalBaseline(**b)
+        return model
+
+
+def _finding(record, principal, finding_type, severity, key, message, **detail):
+    """Build one anomaly finding, timestamped with the event that triggered it."""
+    ts = _epoch(record.get("eventTime"))
+    return Finding(
+        type=finding_type,
+        resource=principal,
+        severity=severity,
+        detector=DETECTOR,
+        message=message,
+        detail=dict(detail, event=record.get("eventName"), event_id=record.get("eventID"),
+                    source_ip=record.get("sourceIPAddress")),
+        id=f"{finding_type}:{principal}:{key}",
+        ts=datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts else "",
+        account=record.get("recipientAccountId", ""),
+        region=record.get("awsRegion", ""),
+    )
+
+# ---- detector --------------------------------------------------------------
+
+def load_detector_settings(path=CONFIG_PATH):
+    """Read the `detectors.cloudtrail` block from sentinel_config.json (empty dict if absent)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("detectors", {}).get("cloudtrail", {})
+    except FileNotFoundError:
+        return {}
+
+
+def check_cloudtrail_anomalies(session, sources=None, settings=None, baseline_path=BASELINE_PATH,
+                               stats=None, verbose=True, checkpoint_every=50):
+    """
+    Stream every new CloudTrail log file of `sources` through the baselines.
+
+    Files are processed in key order and each `<account>/CloudTrail/<region>/`
+    stream of a source remembers the last key it finished (saved with the
+    baselines every `checkpoint_every` files), so the next run only reads
+    files that arrived since. Returns anomaly Findings.
+
+    If a `stats` dict is passed it is filled with files, records, seconds and
+    records_per_second.
+    """
+    settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+    sources = sources if sources is not None else settings["sources"]
+    saved = read_json(baseline_path, {})
+    model = BaselineModel.from_dict(saved.get("baselines"), settings)
+    cursors = saved.get("cursors", {})
+    if stats is None:
+        stats = {}
+    stats.update(files=0, records=0, seconds=0.0)
+    findings = []
+    started = time.perf_counter()
+
+    def save():
+        atomic_write_json(baseline_path, {"baselines": model.to_dict(), "cursors": cursors},
+                          separators=(",", ":"))
+
+    if verbose:
+        print("=== SynAccel Detector: CloudTrail Anomalies ===")
+
+    for source in sources:
+        try:
+            done = cursors[source] = stream_cursors(cursors.get(source))
+            for stream, key, opener in iter_log_files(source, session, done):
+                with _open_text(opener(), key) as text:
+                    for record in iter_records(text):
+                        stats["records"] += 1
+                        findings.extend(model.observe(record))
+                done[stream] = key
+                stats["files"] += 1
+                if stats["files"] % checkpoint_every == 0:
+                    save()
+        except (ClientError, OSError, ValueError) as e:
+            # A bad file or source stops that source; the cursor keeps what finished
+            print(f"[x] Error reading CloudTrail logs from {source}: {e}")
+    save()
+
+    stats["seconds"] = time.perf_counter() - started
+    stats["records_per_second"] = stats["records"] / stats["seconds"] if stats["seconds"] else 0.0
+    METRICS.observe("sentinel_stage_seconds", stats["seconds"], stage="cloudtrail.scan")
+    METRICS.inc("sentinel_records_total", stats["records"], source="cloudtrail")
+    if verbose:
+        for finding in findings:
+            print(f"[!] {finding.message}")
+        print(f"\n[i] {stats['files']} files, {stats['records']} records in {stats['seconds']:.2f}s "
+              f"({stats['records_per_second']:.0f} records/s) -> {len(findings)} findings")
+    return findings
+
+
+if __name__ == "__main__":
+    settings = load_detector_settings()
+    parser = argparse.ArgumentParser(description="SynAccel CloudTrail anomaly detector")
+    parser.add_argument("sources", nargs="*", default=settings.get("sources", []),
+                        help="local folders or s3://bucket/prefix with CloudTrail logs")
+    parser.add_argument("--markdown", action="store_true",
+                        help="also render the findings as a markdown report")
+    args = parser.parse_args()
+
+    # Only S3 sources need AWS credentials
+    pool = ClientPool(create_aws_session()) if any(s.startswith("s3://") for s in args.sources) else None
+    with profile_run(DETECTOR):
+        findings = check_cloudtrail_anomalies(pool, args.sources, settings)
+    FindingsLog().append(findings)
+    print(f"[✓] {len(findings)} findings appended to the findings log")
+    METRICS.write_textfile(DETECTOR)
+    if args.markdown:
+        render_markdown(findings, "SynAccel CloudTrail Anomaly Report", "cloudtrail_detector_report")
@@ -1,74 +1,267 @@
-import boto3
 from botocore.exceptions import ClientError
 from datetime import datetime, timezone
-import os
+from pathlib import Path
+import argparse
+import csv
+import io
+import sys
+import time
+
+# Make src/ importable when this file is run directly (python src/detectors/...)
+SRC = Path(__file__).resolve().parents[1]
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from utils.clients import ClientPool
+from utils.findings import Finding, FindingsLog, render_markdown
+from utils.fingerprints import FingerprintStore, digest
+from utils.inventory_cache import access_keys, has_mfa, inventory_cache, list_user_names
+from utils.metrics import METRICS, profile_run
+from utils.sessions import create_aws_session
+
+DETECTOR = "iam_exposure"
+KEY_MAX_AGE_DAYS = 90
 
 def save_report(findings):
-    """Saves IAM exposure findings to a MD report
+    """Saves IAM exposure findings to a MD report in reports/sample_output/
 
     Args:
-        findings (_type_): _description_
+        findings (list): Findings returned by check_iam_exposures
     """
-    timestamp = datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
-    report_dir = os.path.join(os.path.dirname(__file__), "../../report/sample_output")
-    os.makedirs(report_dir, exist_ok=True)
-    report_path = os.path.join(report_dir, f"iam_detector_report_{timestamp}.md")
-    
-    with open(report_path, "w") as f:
-        f.write(" # SynAccel IAM Exposure Report\n\n")
-        f.write(f"Generated: {timestamp}\n\n")
-        if not findings:
-            f.write("✓ No risky IAM users detected.\n")
+    return render_markdown(findings, "SynAccel IAM Exposure Report", "iam_detector_report")
+
+def _finding(username, finding_type, severity, message, key="", **detail):
+    """Build one structured IAM finding."""
+    return Finding(
+        type=finding_type,
+        resource=username,
+        severity=severity,
+        detector=DETECTOR,
+        message=message,
+        detail=detail,
+        id=f"{finding_type}:{username}" + (f":{key}" if key else ""),
+    )
+
+def format_finding(finding):
+    """Console line for a finding."""
+    return f"[!] {finding.message}"
+
+def evaluate_user(username, facts, now=None):
+    """
+    Findings for one user from their facts: {"mfa": bool, "keys": [ISO create dates of active keys]}.
+    No API calls, so it's cheap to re-run on stored facts (key age grows even when nothing changes).
+    """
+    now = now or datetime.now(timezone.utc)
+    findings = []
+    if not facts["mfa"]:
+        findings.append(_finding(username, "IAM_NO_MFA", "high", f"{username} has no MFA enabled."))
+    for created in facts["keys"]:
+        age_days = (now - datetime.fromisoformat(created)).days
+        if age_days > KEY_MAX_AGE_DAYS:
+            findings.append(_finding(username, "IAM_OLD_KEY", "medium",
+                                     f"{username} has an old access key ({age_days} days).",
+                                     created, age_days=age_days, created=created))
+    return findings
+
+# ---- per-user mode ---------------------------------------------------------
+
+def fetch_user_facts(iam, username, stats, cache=None):
+    """list_mfa_devices + list_access_keys for one user -> facts dict (via the inventory cache)."""
+    # Step 1: Check MFA devices
+    mfa = has_mfa(iam, username, cache, stats)
+
+    # Step 2: Check access key age
+    keys = access_keys(iam, username, cache, stats)
+    active = sorted(k["CreateDate"] for k in keys if k["Status"] == "Active")
+    return {"mfa": mfa, "keys": active}
+
+def iter_users_per_user(iam, stats, skip=None, cache=None):
+    """
+    Original path: page through list_users, then fetch MFA devices and access
+    keys for each user. Two calls per user, so O(users) API calls (fewer when
+    the inventory cache already holds them from this cycle).
+
+    `skip(username)` returning True means "we already know this user" and the
+    two per-user calls are skipped (facts=None is yielded instead).
+    Yields (username, facts).
+    """
+    for username in list_user_names(iam, cache, stats):
+        stats["users"] += 1
+        if skip and skip(username):
+            yield username, None
         else:
-            for findings in findings:
-                f.write(f"- {findings}\n")
-    
-    print(f"[✓] Markdown report saved to: {os.path.abspath(report_path)}")
-    
-def create_aws_session(profile_name="sentinel-automation"):
-    """Create authenticated AWS session"""
-    return boto3.Session(profile_name=profile_name)
-
-def check_iam_exposures(session):
+            yield username, fetch_user_facts(iam, username, stats, cache)
+
+# ---- credential report mode ------------------------------------------------
+
+def fetch_credential_report(iam, stats, timeout=120, poll_interval=2):
+    """
+    Ask IAM to (re)generate the account credential report and download it.
+    AWS reuses a report younger than 4h, so this is usually 2 calls.
+    Returns the raw CSV bytes.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        state = iam.generate_credential_report()["State"]
+        stats["api_calls"] += 1
+        if state == "COMPLETE":
+            break
+        if time.monotonic() >= deadline:
+            raise TimeoutError("credential report was not ready in time")
+        time.sleep(poll_interval)
+
+    content = iam.get_credential_report()["Content"]
+    stats["api_calls"] += 1
+    return content
+
+def _parse_report_time(value):
+    """Credential report timestamps are ISO 8601; 'N/A' / 'not_supported' mean none."""
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+def iter_credential_report(content, stats=None):
+    """
+    Stream the credential report CSV row by row and yield (username, facts).
+    We never build the full table in memory, only one row at a time.
+    """
+    reader = csv.DictReader(io.TextIOWrapper(io.BytesIO(content), encoding="utf-8", newline=""))
+    for row in reader:
+        username = row["user"]
+        if username == "<root_account>":
+            continue    # list_users never returns root, keep both modes comparable
+        if stats is not None:
+            stats["users"] += 1
+        keys = []
+        for n in (1, 2):
+            if row.get(f"access_key_{n}_active") == "true":
+                created = _parse_report_time(row.get(f"access_key_{n}_last_rotated", ""))
+                if created:
+                    keys.append(created.isoformat())
+        yield username, {"mfa": row.get("mfa_active") == "true", "keys": sorted(keys)}
+
+def parse_credential_report(content, now=None, stats=None):
+    """Findings straight from a credential report (streaming, see iter_credential_report)."""
+    for username, facts in iter_credential_report(content, stats):
+        yield from evaluate_user(username, facts, now)
+
+# ---- entry point -----------------------------------------------------------
+
+def _cache_report(rows, cache):
+    """Pass report rows through, recording the user list and MFA status in the inventory cache."""
+    names = []
+    for username, facts in rows:
+        names.append(username)
+        cache.put("mfa", username, facts["mfa"])
+        yield username, facts
+    cache.put_listing("users", names)
+
+def _iter_user_facts(iam, mode, stats, skip, cache):
+    """Pick the data source for `mode`, falling back from report to per-user in auto mode."""
+    if mode in ("report", "auto"):
+        try:
+            with METRICS.timer("iam.credential_report"):
+                content = fetch_credential_report(iam, stats)
+            stats["mode"] = "report"
+            return _cache_report(iter_credential_report(content, stats), cache)
+        except (ClientError, TimeoutError) as e:
+            if mode == "report":
+                raise
+            print(f"[x] Credential report unavailable ({e}); falling back to per-user scan.")
+    stats["mode"] = "per_user"
+    return iter_users_per_user(iam, stats, skip, cache)
+
+def check_iam_exposures(session, mode="auto", stats=None, verbose=True,
+                        incremental=False, store=None, revalidate_hours=24, resume=True, cache=None):
     """Detects IAM users with:
     -No MFA enabled
     -Old access keys >90 days
+
+    mode:
+      "report"   - one credential report for the whole account (a few API calls)
+      "per_user" - list_mfa_devices + list_access_keys per user (2 calls/user)
+      "auto"     - try the report first, fall back to per-user if it fails
+
+    With `incremental=True` each user's MFA/key facts are fingerprinted; in
+    per-user mode users checked within `revalidate_hours` skip their API calls
+    and reuse stored facts. Only findings that are new since the last run are
+    returned, and an interrupted sweep resumes from its checkpoint.
+
+    The user list and per-user facts go through the inventory `cache`
+    (default: the process-wide one), which the IAM responder reads too.
+
+    If a `stats` dict is passed it is filled with mode, api_calls, users and seconds.
     """
-    
     iam = session.client("iam")
+    cache = cache or inventory_cache()
     findings = []
+    if stats is None:
+        stats = {}
+    stats.update(mode=mode, api_calls=0, users=0, seconds=0.0)
+    started = time.perf_counter()
+    now = datetime.now(timezone.utc)
 
-    try:
-        users = iam.list_users()["Users"]    
+    if verbose:
         print("=== SynAccel Detector: IAM Exposure ===")
-        
-        for users in users:
-            username = users["UserName"]
-            print(f"\n[+] Checking user: {username}")
-            
-            # Step 1: Check MFA devices
-            mfa_devices = iam.list_mfa_devices(UserName=username)["MFADevices"]
-            if not mfa_devices:
-                msg = f"[!] {username} has no MFA enabled."
-                print(msg)
-                findings.append(msg)   
-                
-            # Step 2: Check access key age
-            keys = iam.list_access_keys(UserName=username)["AccessKeyMetadata"]
-            for key in keys:
-                key_id = key["AccessKeyId"]
-                create_date = key["CreateDate"]
-                age_days = (datetime.now(timezone.utc) - create_date).days
-                if age_days > 90:
-                    msg = f"[!] {username} has an old access key ({age_days} days)."
-                    print(msg)
-                    findings.append(msg)
-    except ClientError as e:
+
+    skip = None
+    if incremental:
+        store = store or FingerprintStore()
+        done = store.begin_sweep("iam", resume=resume)
+        skip = lambda u: u in done or store.is_fresh("iam", u, revalidate_hours)
+
+    try:
+        seen = []
+        for username, facts in _iter_user_facts(iam, mode, stats, skip, cache):
+            seen.append(username)
+            if not incremental:
+                findings.extend(evaluate_user(username, facts, now))
+                continue
+            if username in done:
+                continue
+            record = store.get("iam", username)
+            if facts is None:
+                facts = record["facts"]    # fresh enough: reuse, no API calls spent
+            fp = digest(facts)
+            # Re-evaluate even if unchanged: key age keeps growing on its own
+            new = store.update("iam", username, fp, facts, evaluate_user(username, facts, now))
+            store.mark_done("iam", username, new)
+        if incremental:
+            findings = store.end_sweep("iam", seen)
+    except (ClientError, TimeoutError) as e:
         print(f"[x] AWS Error: {e}")
-        
+
+    stats["seconds"] = time.perf_counter() - started
+    # Sweep minus credential_report (report mode) is our own parsing + evaluation
+    METRICS.observe("sentinel_stage_seconds", stats["seconds"], stage="iam.sweep")
+    if verbose:
+        for finding in findings:
+            print(format_finding(finding))
+        print(f"\n[i] {stats['mode']} mode: {stats['users']} users, {stats['api_calls']} API calls, "
+              f"{stats['seconds']:.2f}s -> {len(findings)} findings")
     return findings
 
 if __name__ == "__main__":
-    session = create_aws_session()
-    findings = check_iam_exposures(session)
-    save_report(findings)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="SynAccel IAM exposure detector")
+    parser.add_argument("--mode", choices=("auto", "report", "per_user"), default="auto",
+                        help="credential report (fast) or per-user API calls")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only report new findings, skip API calls for recently checked users")
+    parser.add_argument("--revalidate-hours", type=float, default=24,
+                        help="re-fetch unchanged users at most this often (incremental per-user mode)")
+    parser.add_argument("--markdown", action="store_true",
+                        help="also render the findings as a markdown report")
+    args = parser.parse_args()
+
+    pool = ClientPool(create_aws_session())
+    with profile_run(DETECTOR):
+        findings = check_iam_exposures(pool, mode=args.mode, incremental=args.incremental,
+                                       revalidate_hours=args.revalidate_hours)
+    FindingsLog().append(findings)
+    inventory_cache().save()
+    print(f"[✓] {len(findings)} findings appended to the findings log")
+    pool.print_stats()
+    METRICS.write_textfile(DETECTOR)
+    if args.markdown:
+        save_report(findings)
@@ -1,109 +1,375 @@
-import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+import argparse
 import json
+import sys
+import time
 
+# Make src/ importable when this file is run directly (python src/detectors/...)
+SRC = Path(__file__).resolve().parents[1]
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
 
-def check_bucket_policy(s3, bucket_name):
-    check_public_access_blocks(s3, bucket_name)
-    """
-    Step 2: Checks the S3 bucket policy for statements that allow public access.
-    """
+from utils.clients import ClientPool
+from utils.findings import Finding, FindingsLog, render_markdown
+from utils.fingerprints import FingerprintStore, digest
+from utils.inventory_cache import inventory_cache
+from utils.metrics import METRICS, profile_run
+from utils.policy_analyzer import ANALYZER
+from utils.sessions import create_aws_session
+from utils.throttle import AdaptiveBackoff
+
+CONFIG_PATH = SRC.parent / "configs" / "sentinel_config.json"
+DETECTOR = "s3_public_access"
+# Incremental mode: how long an unchanged bucket goes without a re-check. A
+# change nothing told us about (no change event, no write of ours) can go
+# unseen for up to this long, so keep it a few sweep intervals, not a day.
+REVALIDATE_HOURS = 4
+
+ALL_USERS_URI = 'http://acs.amazonaws.com/groups/global/AllUsers'
+AUTH_USERS_URI = 'http://acs.amazonaws.com/groups/global/AuthenticatedUsers'
+
+
+MESSAGES = {
+    "acl_public": "Public ACL detected: {bucket}",
+    "acl_authenticated": "ACL open to all AWS accounts: {bucket}",
+    "policy_public": "Public bucket policy detected: {bucket}",
+    "pab_partial": "Public Access Block not fully enabled: {bucket}",
+    "pab_missing": "Missing Public Access Block: {bucket}",
+}
+
+
+def _finding(bucket_name, check, severity, key="", **detail):
+    """Build one structured S3 finding (instead of printing it on the spot)."""
+    return Finding(
+        type="S3_PUBLIC",
+        resource=bucket_name,
+        severity=severity,
+        detector=DETECTOR,
+        message=MESSAGES[check].format(bucket=bucket_name),
+        detail=dict(detail, check=check),
+        id=f"{check}:{bucket_name}" + (f":{key}" if key else ""),
+    )
+
+
+def _call(backoff, fn, **kwargs):
+    """Run an S3 call through the shared backoff if we have one."""
+    if backoff is None:
+        return fn(**kwargs)
+    return backoff.call(fn, **kwargs)
+
+# ---- fetch: the API calls --------------------------------------------------
+# Each fetch stores its result under a key in `cfg`. If the call fails the key
+# is left out, so evaluation skips that check and the fingerprint is incomplete.
+
+def _fetch_acl(s3, bucket_name, cfg, backoff=None):
     try:
-        response = s3.get_bucket_policy(Bucket=bucket_name)
-        policy_str = response['Policy']
-        policy = json.loads(policy_str)
-
-        for statement in policy.get('Statement', []):
-            effect = statement.get('Effect')
-            principal = statement.get('Principal')
-            action = statement.get('Action')
-            resource = statement.get('Resource')
-
-            # Detect if the bucket policy allows public access
-            if effect == "Allow" and (principal == "*" or principal == {"AWS": "*"}):
-                print(f"[!] Public bucket policy detected: {bucket_name}")
-                print(f"    Action: {action}")
-                print(f"    Resource: {resource}")
-
-    except s3.exceptions.from_code('NoSuchBucketPolicy'):
-        print(f"[-] No bucket policy found for {bucket_name}.")
+        cfg["grants"] = _call(backoff, s3.get_bucket_acl, Bucket=bucket_name)['Grants']
     except ClientError as e:
-        print(f"[x] Error checking policy for {bucket_name}: {e}")
-        
-def check_public_access_blocks(s3, bucket_name):
-    """Checks if the buckets Public Access Block configuration
-    is missing or not fully enabled
+        print(f"[x] Error checking ACL for {bucket_name}: {e}")
 
-    Args:
-        s3 (_type_): _description_
-        bucket_name (_type_): _description_
-    """
+
+def _fetch_policy(s3, bucket_name, cfg, backoff=None):
+    try:
+        cfg["policy"] = _call(backoff, s3.get_bucket_policy, Bucket=bucket_name)['Policy']
+    except ClientError as e:
+        # S3 has no modeled NoSuchBucketPolicy exception, so check the code ourselves
+        if e.response['Error']['Code'] == 'NoSuchBucketPolicy':
+            cfg["policy"] = None
+        else:
+            print(f"[x] Error checking policy for {bucket_name}: {e}")
+
+
+def _fetch_pab(s3, bucket_name, cfg, backoff=None):
     try:
-        pab = s3.get_public_access_block(Bucket=bucket_name)
-        config = pab['PublicAccessBlockConfiguration']
-        
-        # If any flag is false, alert
-        if not all(config.values()):
-            print(f"[!] Public Access Block not fully enabled: {bucket_name}")
-            print(f"    Config: {config}")
-            
+        pab = _call(backoff, s3.get_public_access_block, Bucket=bucket_name)
+        cfg["pab"] = pab['PublicAccessBlockConfiguration']
     except ClientError as e:
         # Handle cases where config doesn't exist or access denied
         if e.response['Error']['Code'] == 'NoSuchPublicAccessBlockConfiguration':
-            print(f"[!] Missing Public Access Block: {bucket_name}")
+            cfg["pab"] = None
         else:
             print(f"[x] Error checking Public Access Block for {bucket_name}: {e}")
-        
-            
 
 
-def create_aws_session(profile_name="sentinel-automation"):
+def fetch_bucket_config(s3, bucket_name, backoff=None):
+    """The three API calls for one bucket: ACL grants, bucket policy, Public Access Block."""
+    cfg = {}
+    _fetch_acl(s3, bucket_name, cfg, backoff)
+    _fetch_policy(s3, bucket_name, cfg, backoff)
+    _fetch_pab(s3, bucket_name, cfg, backoff)
+    return cfg
+
+# ---- evaluate: no API calls ------------------------------------------------
+
+def _acl_findings(bucket_name, cfg):
+    findings = []
+    for grant in cfg.get("grants", []):
+        grantee = grant.get('Grantee', {})
+        permission = grant.get('Permission', 'Unknown')
+
+        # Check if ACL allows public or any AWS-authenticated user
+        if grantee.get('URI') == ALL_USERS_URI:
+            findings.append(_finding(bucket_name, "acl_public", "high", permission, permission=permission))
+        elif grantee.get('URI') == AUTH_USERS_URI:
+            findings.append(_finding(bucket_name, "acl_authenticated", "medium", permission,
+                                     permission=permission))
+    return findings
+
+
+def _policy_findings(bucket_name, cfg):
+    if not cfg.get("policy"):
+        return []
+    # Wildcard / list / NotPrincipal grants, narrowed by VPC/org/IP conditions;
+    # cached per policy template, see utils/policy_analyzer.py
+    return [_finding(bucket_name, "policy_public", e.severity, str(e.index),
+                     action=list(e.actions), exposure=e.level, reason=e.reason, sid=e.sid)
+            for e in ANALYZER.public_exposures(cfg["policy"], bucket_name)]
+
+
+def _pab_findings(bucket_name, cfg):
+    if "pab" not in cfg:
+        return []
+    if cfg["pab"] is None:
+        return [_finding(bucket_name, "pab_missing", "medium")]
+    # If any flag is false, alert
+    if not all(cfg["pab"].values()):
+        return [_finding(bucket_name, "pab_partial", "medium", config=cfg["pab"])]
+    return []
+
+
+def evaluate_bucket_config(bucket_name, cfg):
+    """Turn a fetched bucket config into findings."""
+    return (_acl_findings(bucket_name, cfg)
+            + _policy_findings(bucket_name, cfg)
+            + _pab_findings(bucket_name, cfg))
+
+
+def bucket_fingerprint(cfg):
     """
-    Creates an authenticated AWS session using the specified IAM profile.
-    This lets the detector use your sentinel-automation credentials securely.
+    Digest of each part of the bucket config (ACL grants, policy document, PAB).
+    Returns None if any fetch failed, since a partial view can't prove "unchanged".
     """
-    session = boto3.Session(profile_name=profile_name)
-    return session
+    if not {"grants", "policy", "pab"} <= cfg.keys():
+        return None
+    grants = sorted(json.dumps(g, sort_keys=True) for g in cfg["grants"])
+    return {"acl": digest(grants), "policy": digest(cfg["policy"]), "pab": digest(cfg["pab"])}
 
 
-def check_s3_public_access(session):
+def cached_bucket_config(s3, bucket_name, backoff=None, cache=None):
+    """
+    fetch_bucket_config through the inventory cache: a config fetched within
+    the bucket_config TTL (by a sweep, a change event...) is reused. Partial
+    configs (a fetch failed) are never cached.
+    """
+    return (cache or inventory_cache()).get(
+        "bucket_config", bucket_name, lambda: fetch_bucket_config(s3, bucket_name, backoff),
+        keep=lambda cfg: bucket_fingerprint(cfg) is not None)
+
+
+def list_bucket_names(s3, backoff=None, cache=None):
+    """All bucket names (list_buckets), at most once per buckets TTL."""
+    return (cache or inventory_cache()).listing(
+        "buckets", lambda: [b['Name'] for b in _call(backoff, s3.list_buckets)['Buckets']])
+
+# ---- single-check helpers (fetch + evaluate) -------------------------------
+
+def check_bucket_acl(s3, bucket_name, backoff=None):
+    """
+    Step 1: Checks the bucket ACL for grants to everyone or to any AWS account.
+    """
+    cfg = {}
+    _fetch_acl(s3, bucket_name, cfg, backoff)
+    return _acl_findings(bucket_name, cfg)
+
+
+def check_bucket_policy(s3, bucket_name, backoff=None):
+    """
+    Step 2: Checks the S3 bucket policy for statements that allow public access.
+    """
+    cfg = {}
+    _fetch_policy(s3, bucket_name, cfg, backoff)
+    return _policy_findings(bucket_name, cfg)
+
+
+def check_public_access_blocks(s3, bucket_name, backoff=None):
+    """Step 3: Checks if the buckets Public Access Block configuration
+    is missing or not fully enabled
+
+    Args:
+        s3: boto3 S3 client
+        bucket_name (str): bucket to check
+        backoff (AdaptiveBackoff, optional): shared throttle handling
+    """
+    cfg = {}
+    _fetch_pab(s3, bucket_name, cfg, backoff)
+    return _pab_findings(bucket_name, cfg)
+
+
+def scan_bucket(s3, bucket_name, backoff=None, cache=None):
+    """Run all three checks against one bucket (config from the inventory cache) and return its findings."""
+    return evaluate_bucket_config(bucket_name, cached_bucket_config(s3, bucket_name, backoff, cache))
+
+
+def _print_finding(f):
+    """Console line for a finding, worded like the original detector output."""
+    d = f.detail
+    if d["check"] in ("acl_public", "acl_authenticated"):
+        print(f"[!] {f.message} | Permission: {d['permission']}")
+        return
+    print(f"[!] {f.message}")
+    if d["check"] == "policy_public":
+        print(f"    Action: {d['action']}")
+        print(f"    Exposure: {d['exposure']} ({d['reason']})")
+    elif d["check"] == "pab_partial":
+        print(f"    Config: {d['config']}")
+
+
+def load_detector_settings(path=CONFIG_PATH):
+    """Read the `detectors.s3` block from sentinel_config.json (empty dict if absent)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("detectors", {}).get("s3", {})
+    except FileNotFoundError:
+        return {}
+
+
+def _fetch_all(s3, bucket_names, backoff, concurrency, cache):
+    """Yield (bucket_name, config) as each bucket's fetch finishes."""
+    if concurrency == 1:
+        for name in bucket_names:
+            yield name, cached_bucket_config(s3, name, backoff, cache)
+        return
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(cached_bucket_config, s3, name, backoff, cache): name for name in bucket_names}
+        for fut in as_completed(futures):
+            yield futures[fut], fut.result()
+
+
+def check_s3_public_access(session, concurrency=1, max_attempts=8, verbose=True,
+                           incremental=False, store=None, revalidate_hours=REVALIDATE_HOURS, resume=True, cache=None):
     """
     Checks all S3 buckets in the AWS account for public exposure
     via ACLs, policies, or missing public access blocks.
+
+    With `concurrency` > 1 buckets are scanned by a bounded thread pool that
+    shares one client (boto3 clients are thread-safe, sessions are not) and one
+    AdaptiveBackoff, so a throttle seen by any worker slows the whole pool.
+
+    With `incremental=True` buckets checked within `revalidate_hours` are
+    skipped without an API call, unless the inventory cache heard of a change
+    since (a change event, or one of our responders wrote to the bucket); new
+    buckets are always checked. Any other change to a skipped bucket is only
+    seen when its window runs out, so `revalidate_hours` is the worst-case
+    delay. Buckets whose config fingerprint hasn't changed aren't
+    re-evaluated, and only findings that are new since the last run are
+    returned. Progress is checkpointed in the
+    FingerprintStore so an interrupted sweep resumes where it stopped.
+
+    The bucket list and configs go through the inventory `cache` (default:
+    the process-wide one), so anything else that needs them this cycle
+    doesn't list or fetch them again.
+
+    Returns a list of Findings (the S3 check name is in detail["check"]).
     """
-    s3 = session.client('s3')
+    concurrency = max(1, int(concurrency))
+    # botocore's default pool is 10 connections; give every worker its own
+    s3 = session.client('s3', config=Config(max_pool_connections=max(10, concurrency)))
+    backoff = AdaptiveBackoff(max_attempts=max_attempts, name="s3")
+    findings = []
+    started = time.perf_counter()
 
     try:
-        response = s3.list_buckets()
+        with METRICS.timer("s3.list_buckets"):
+            bucket_names = list_bucket_names(s3, backoff, cache)
+    except ClientError as e:
+        print(f"[x] AWS Error: {e}")
+        return findings
+
+    to_scan = bucket_names
+    if incremental:
+        store = store or FingerprintStore()
+        done = store.begin_sweep("s3", resume=resume)
+        changes = cache or inventory_cache()
+        to_scan = [n for n in bucket_names if n not in done and not store.is_fresh(
+            "s3", n, revalidate_hours, changed_at=changes.changed_at("bucket_config", n))]
+
+    if verbose:
         print("=== SynAccel Detector: S3 Public Access ===")
 
-        # Loop through all buckets
-        for bucket in response['Buckets']:
-            bucket_name = bucket['Name']
+    # Results are handled on this thread only, so output from workers doesn't
+    # interleave and the fingerprint store never sees concurrent writes.
+    # Time spent here (our own evaluation) is timed apart from the sweep,
+    # which is mostly waiting on the API.
+    evaluating = 0.0
+    for bucket_name, cfg in _fetch_all(s3, to_scan, backoff, concurrency, cache):
+        if verbose and concurrency == 1:
             print(f"\n[+] Checking bucket: {bucket_name}")
+        evaluate_started = time.perf_counter()
 
-            # Step 1: Check bucket ACL for public grants
-            try:
-                acl = s3.get_bucket_acl(Bucket=bucket_name)
-                for grant in acl['Grants']:
-                    grantee = grant.get('Grantee', {})
-                    permission = grant.get('Permission', 'Unknown')
+        if not incremental:
+            bucket_findings = evaluate_bucket_config(bucket_name, cfg)
+            findings.extend(bucket_findings)
+        else:
+            parts = bucket_fingerprint(cfg)
+            record = store.get("s3", bucket_name)
+            if parts is None:
+                # Couldn't see the whole config; report what we saw, retry next run
+                bucket_findings = evaluate_bucket_config(bucket_name, cfg)
+            elif record and record["fp"] == digest(parts):
+                store.touch("s3", bucket_name)
+                bucket_findings = []
+            else:
+                bucket_findings = store.update("s3", bucket_name, digest(parts), parts,
+                                               evaluate_bucket_config(bucket_name, cfg))
+            store.mark_done("s3", bucket_name, bucket_findings)
+        evaluating += time.perf_counter() - evaluate_started
 
-                    # Check if ACL allows public or any AWS-authenticated user
-                    if grantee.get('URI') == 'http://acs.amazonaws.com/groups/global/AllUsers':
-                        print(f"[!] Public ACL detected: {bucket_name} | Permission: {permission}")
-                    elif grantee.get('URI') == 'http://acs.amazonaws.com/groups/global/AuthenticatedUsers':
-                        print(f"[!] ACL open to all AWS accounts: {bucket_name} | Permission: {permission}")
-            except ClientError as e:
-                print(f"[x] Error checking ACL for {bucket_name}: {e}")
+        if verbose:
+            for f in bucket_findings:
+                _print_finding(f)
 
-            # Step 2: Check bucket policy exposure
-            check_bucket_policy(s3, bucket_name)
+    if incremental:
+        # Includes findings checkpointed by an interrupted earlier run
+        findings = store.end_sweep("s3", bucket_names)
+    METRICS.observe("sentinel_stage_seconds", evaluating, stage="s3.evaluate")
+    METRICS.observe("sentinel_stage_seconds", time.perf_counter() - started, stage="s3.sweep")
 
-    except ClientError as e:
-        print(f"[x] AWS Error: {e}")
+    if verbose:
+        elapsed = time.perf_counter() - started
+        print(f"\n[i] Scanned {len(to_scan)} of {len(bucket_names)} buckets in {elapsed:.2f}s "
+              f"(concurrency={concurrency}, throttles={backoff.throttle_count}, "
+              f"retries={backoff.retry_count}) -> {len(findings)} findings")
+    return findings
 
 
 if __name__ == "__main__":
-    session = create_aws_session()
-    check_s3_public_access(session)
+    settings = load_detector_settings()
+    parser = argparse.ArgumentParser(description="SynAccel S3 public access detector")
+    parser.add_argument("--concurrency", type=int, default=settings.get("concurrency", 1),
+                        help="number of buckets to scan in parallel")
+    parser.add_argument("--max-attempts", type=int, default=settings.get("max_attempts", 8),
+                        help="attempts per API call before giving up on throttling")
+    parser.add_argument("--incremental", action="store_true", default=settings.get("incremental", False),
+                        help="only check new/changed buckets, resume interrupted sweeps")
+    parser.add_argument("--full", dest="incremental", action="store_false",
+                        help="force a full sweep even if incremental is configured")
+    parser.add_argument("--revalidate-hours", type=float, default=settings.get("revalidate_hours", REVALIDATE_HOURS),
+                        help="re-check unchanged buckets at least this often (incremental mode)")
+    parser.add_argument("--markdown", action="store_true",
+                        help="also render the findings as a markdown report")
+    args = parser.parse_args()
+
+    pool = ClientPool(create_aws_session(), concurrency=args.concurrency)
+    with profile_run(DETECTOR):
+        findings = check_s3_public_access(pool, concurrency=args.concurrency, max_attempts=args.max_attempts,
+                                          incremental=args.incremental, revalidate_hours=args.revalidate_hours)
+    FindingsLog().append(findings)
+    inventory_cache().save()
+    print(f"[✓] {len(findings)} findings appended to the findings log")
+    pool.print_stats()
+    METRICS.write_textfile(DETECTOR)
+    if args.markdown:
+        render_markdown(findings, "SynAccel S3 Public Access Report", "s3_detector_report")
@@ -0,0 +1,220 @@
+"""
+Event-driven detection: re-check a resource the moment it changes.
+
+Full S3/IAM sweeps catch a bucket made public one sweep interval later, and
+cost API calls for every bucket and user whether anything changed or not.
+Here CloudTrail management events (delivered by an EventBridge rule to SQS,
+or written to a local spool for testing) name the resource that changed,
+and only that resource is re-evaluated with the detectors' own checks:
+
+    PutBucketPolicy / PutBucketAcl / DeletePublicAccessBlock / ...  -> scan_bucket()
+    CreateUser / DeactivateMFADevice / CreateAccessKey / ...         -> fetch_user_facts() + evaluate_user()
+
+so detection latency is the queue delay plus a few API calls, and API usage
+grows with the number of changes rather than the size of the account.
+Several events for one resource in a batch are checked once. The resource's
+cached inventory entries are invalidated first, so the re-check (and the
+responders after it) see the new configuration.
+
+The findings are appended to the findings log like any detector's, and the
+engine (--changes) runs the core and the responders on them straight away.
+
+    python src/engine/change_events.py --queue file:state/changes.jsonl --once
+    python src/engine/sentinel_engine.py --changes sqs:https://sqs.us-east-1.amazonaws.com/123/sentinel
+"""
+import argparse
+import json
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT / "src") not in sys.path:
+    sys.path.insert(0, str(ROOT / "src"))
+
+from botocore.exceptions import ClientError
+
+from detectors.iam_exposure_detector import evaluate_user, fetch_user_facts
+from detectors.s3_public_access_detector import scan_bucket
+from utils.change_queue import open_queue
+from utils.clients import ClientPool
+from utils.findings import FindingsLog, FINDINGS_PATH
+from utils.inventory_cache import inventory_cache
+from utils.metrics import METRICS
+from utils.sessions import DEFAULT_PROFILE, create_aws_session
+from utils.throttle import AdaptiveBackoff
+
+# eventName -> (resource kind, requestParameters key naming the resource)
+CHANGE_EVENTS = {
+    "CreateBucket": ("s3", "bucketName"),
+    "PutBucketPolicy": ("s3", "bucketName"),
+    "DeleteBucketPolicy": ("s3", "bucketName"),
+    "PutBucketAcl": ("s3", "bucketName"),
+    "PutPublicAccessBlock": ("s3", "bucketName"),
+    "DeletePublicAccessBlock": ("s3", "bucketName"),
+    "PutBucketPublicAccessBlock": ("s3", "bucketName"),       # CloudTrail's spelling
+    "DeleteBucketPublicAccessBlock": ("s3", "bucketName"),
+    "CreateUser": ("iam", "userName"),
+    "CreateLoginProfile": ("iam", "userName"),
+    "EnableMFADevice": ("iam", "userName"),
+    "DeactivateMFADevice": ("iam", "userName"),
+    "CreateAccessKey": ("iam", "userName"),
+    "UpdateAccessKey": ("iam", "userName"),
+    "DeleteAccessKey": ("iam", "userName"),
+}
+
+# Used for anything the `engine.changes` config block leaves out
+DEFAULT_SETTINGS = {
+    "queue": None,          # "memory:", "file:<path>" or "sqs:<url>"; None = no change listener
+    "batch_size": 10,
+    "wait_seconds": 5,      # long-poll time per receive
+    "concurrency": 4,       # resources re-checked in parallel per batch
+}
+
+Change = namedtuple("Change", "kind resource event_name event_time")
+
+
+def _parse_time(value):
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+def parse_change(body):
+    """
+    Change for one queue message, or None if it isn't a change we act on.
+    Accepts an EventBridge event ({"detail": <CloudTrail record>}), a bare
+    CloudTrail record, or either of those wrapped in an SNS notification.
+    """
+    if not isinstance(body, dict):
+        return None
+    if body.get("Type") == "Notification" and "Message" in body:
+        try:
+            body = json.loads(body["Message"])
+        except ValueError:
+            return None
+    record = body.get("detail", body)
+    spec = CHANGE_EVENTS.get(record.get("eventName"))
+    if spec is None or record.get("errorCode"):
+        return None     # not ours, or the call failed and changed nothing
+    kind, key = spec
+    resource = (record.get("requestParameters") or {}).get(key)
+    if resource is None and kind == "iam":
+        # CreateAccessKey & co. without userName act on the caller
+        identity = record.get("userIdentity") or {}
+        resource = identity.get("userName") if identity.get("type") == "IAMUser" else None
+    if not resource:
+        return None
+    return Change(kind, resource, record["eventName"], _parse_time(record.get("eventTime")))
+
+
+# Inventory cache classes a change to each kind of resource makes stale
+CACHED_CLASSES = {"s3": ("bucket_config",), "iam": ("mfa", "access_keys")}
+
+
+def evaluate_changes(session, changes, concurrency=4, backoff=None, cache=None):
+    """
+    Re-run the detector checks for each changed resource (once per resource).
+    Returns (findings, number of resources checked).
+    """
+    targets = list(dict.fromkeys((c.kind, c.resource) for c in changes))
+    cache = cache or inventory_cache()
+    for kind, resource in targets:
+        for cls in CACHED_CLASSES[kind]:
+            cache.invalidate(cls, resource)
+    s3 = session.client("s3") if any(kind == "s3" for kind, _ in targets) else None
+    iam = session.client("iam") if any(kind == "iam" for kind, _ in targets) else None
+    backoff = backoff or AdaptiveBackoff(name="s3")
+
+    def check(target):
+        kind, resource = target
+        try:
+            if kind == "s3":
+                return scan_bucket(s3, resource, backoff, cache)
+            return evaluate_user(resource, fetch_user_facts(iam, resource, {"api_calls": 0}, cache))
+        except ClientError as e:
+            # Deleted again before we got to it, or no permission; nothing to report
+            print(f"[x] Could not re-check {kind} {resource}: {e.response['Error'].get('Code')}")
+            return []
+
+    findings = []
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(targets) or 1))) as pool:
+        for result in pool.map(check, targets):
+            findings.extend(result)
+    return findings, len(targets)
+
+
+class ChangeListener:
+    """Pulls change events off a queue, re-checks the resources and logs the findings."""
+
+    def __init__(self, queue, session, log=None, settings=None):
+        self.queue = queue
+        self.session = session
+        self.log = log or FindingsLog(FINDINGS_PATH)
+        self.settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+        self.backoff = AdaptiveBackoff(name="s3")
+
+    def poll_once(self, wait_seconds=None):
+        """
+        Handle one batch. Returns the findings (possibly empty), or None when
+        the queue had nothing. Messages are acknowledged only after the
+        findings are in the log, so a crash means a re-check, not a miss.
+        """
+        wait = self.settings["wait_seconds"] if wait_seconds is None else wait_seconds
+        messages = self.queue.receive(self.settings["batch_size"], wait)
+        if not messages:
+            return None
+        changes = [c for c in (parse_change(m.body) for m in messages) if c is not None]
+        for c in changes:
+            METRICS.inc("sentinel_change_events_total", kind=c.kind, event=c.event_name)
+        findings = []
+        if changes:
+            with METRICS.timer("changes.evaluate"):
+                findings, checked = evaluate_changes(self.session, changes, self.settings["concurrency"],
+                                                     self.backoff)
+            self.log.append(findings)
+            now = time.time()
+            for c in changes:
+                if c.event_time is not None:
+                    METRICS.observe("sentinel_change_latency_seconds", max(0.0, now - c.event_time),
+                                    kind=c.kind)
+            print(f"[+] changes: {len(changes)} events, {checked} resources re-checked, "
+                  f"{len(findings)} findings")
+        self.queue.delete(messages)
+        return findings
+
+    def drain(self):
+        """Handle everything currently queued. Returns all findings."""
+        findings = []
+        while True:
+            batch = self.poll_once(wait_seconds=0)
+            if batch is None:
+                return findings
+            findings += batch
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SynAccel event-driven change detection")
+    parser.add_argument("--queue", required=True, help="memory:, file:<path> or sqs:<url>")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, help="AWS profile to use")
+    parser.add_argument("--once", action="store_true", help="handle what's queued now, then exit")
+    args = parser.parse_args()
+
+    pool = ClientPool(create_aws_session(args.profile))
+    listener = ChangeListener(open_queue(args.queue, pool), pool)
+    if args.once:
+        found = listener.drain()
+        print(f"[✓] {len(found)} findings from queued changes")
+    else:
+        print(f"=== SynAccel Sentinel change listener on {args.queue} ===")
+        try:
+            while True:
+                if listener.poll_once():
+                    inventory_cache().save()
+        except KeyboardInterrupt:
+            pass
+    inventory_cache().save()
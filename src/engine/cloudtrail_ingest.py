@@ -0,0 +1,234 @@
+"""
+Parallel CloudTrail ingestion: shard the day's log files over a process pool
+and summarize them with mergeable sketches.
+
+Each worker streams its shard of files (same reader as the anomaly detector)
+into a CloudTrailSummary - a count-min sketch of principal x action
+frequencies, a HyperLogLog of distinct source IPs and bounded top-K lists -
+and hands it back; the parent merges summaries as they complete. Parsing is
+the CPU-bound part and shards share nothing, so throughput grows with the
+number of worker processes, and memory is the same for a megabyte or a
+terabyte of logs.
+
+The merged summary turns into CT_HEAVY_HITTER findings (a principal calling
+one action more than `heavy_hitter_threshold` times) for the core counters,
+and a compact snapshot saved under state["cloudtrail"].
+
+    python src/engine/cloudtrail_ingest.py --workers 8
+    python src/engine/cloudtrail_ingest.py /var/log/cloudtrail --workers 4
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT / "src") not in sys.path:
+    sys.path.insert(0, str(ROOT / "src"))
+
+from core import sentinel_core as core
+from detectors.cloudtrail_anomaly_detector import (iter_log_files, iter_records, load_detector_settings,
+                                                   open_log_file, principal_of, stream_cursors)
+from utils.clients import ClientPool
+from utils.findings import Finding, FindingsLog, FINDINGS_PATH
+from utils.sessions import DEFAULT_PROFILE, create_aws_session
+from utils.sketches import CountMinSketch, HyperLogLog, TopK
+from utils.storage import atomic_write_json, read_json
+
+DETECTOR = "cloudtrail_ingest"
+CURSORS_PATH = ROOT / "state" / "cloudtrail_ingest.json"
+
+# Used for anything the `detectors.cloudtrail` config block leaves out
+DEFAULT_SETTINGS = {
+    "sources": [],
+    "heavy_hitter_threshold": 10000,    # calls of one action by one principal per run
+    "top_k": 20,
+    "cms_width": 4096,
+    "cms_depth": 4,
+    "hll_precision": 14,
+}
+
+
+class CloudTrailSummary:
+    """Fixed-size summary of any number of CloudTrail records. Mergeable and picklable."""
+
+    def __init__(self, settings=None):
+        s = dict(DEFAULT_SETTINGS, **(settings or {}))
+        self.records = 0
+        self.files = 0
+        self.first_event = ""
+        self.last_event = ""
+        self.pairs = CountMinSketch(s["cms_width"], s["cms_depth"])     # "principal|action"
+        self.distinct_ips = HyperLogLog(s["hll_precision"])
+        self.top_pairs = TopK(s["top_k"])
+        self.top_principals = TopK(s["top_k"])
+        self.top_ips = TopK(s["top_k"])
+
+    def add(self, record):
+        principal = principal_of(record)
+        pair = f'{principal}|{record.get("eventSource", "").split(".")[0]}:{record.get("eventName", "")}'
+        ip = record.get("sourceIPAddress") or ""
+        self.pairs.add(pair)
+        self.top_pairs.add(pair)
+        self.top_principals.add(principal)
+        if ip:
+            self.distinct_ips.add(ip)
+            self.top_ips.add(ip)
+        when = record.get("eventTime") or ""
+        if when and (not self.first_event or when < self.first_event):
+            self.first_event = when
+        if when > self.last_event:
+            self.last_event = when
+        self.records += 1
+
+    def merge(self, other):
+        self.records += other.records
+        self.files += other.files
+        self.first_event = min(filter(None, (self.first_event, other.first_event)), default="")
+        self.last_event = max(self.last_event, other.last_event)
+        self.pairs.merge(other.pairs)
+        self.distinct_ips.merge(other.distinct_ips)
+        self.top_pairs.merge(other.top_pairs)
+        self.top_principals.merge(other.top_principals)
+        self.top_ips.merge(other.top_ips)
+        return self
+
+    def heavy_hitters(self, threshold):
+        """[(principal, action, estimated calls)] at or above `threshold`."""
+        out = []
+        for pair, _ in self.top_pairs.top():
+            estimate = self.pairs.estimate(pair)
+            if estimate >= threshold:
+                principal, _, action = pair.rpartition("|")
+                out.append((principal, action, estimate))
+        return out
+
+    def to_dict(self):
+        """Small JSON snapshot for state["cloudtrail"]."""
+        return {"records": self.records, "files": self.files,
+                "first_event": self.first_event, "last_event": self.last_event,
+                "distinct_ips": self.distinct_ips.count(),
+                "top_principals": self.top_principals.top(10), "top_ips": self.top_ips.top(10)}
+
+
+_SESSION = None     # per worker process
+
+
+def _init_worker(profile_name):
+    global _SESSION
+    if profile_name:
+        _SESSION = ClientPool(create_aws_session(profile_name))
+
+
+def summarize_shard(files, settings, session=None):
+    """Summarize a list of (source, key) log files. Runs in a worker."""
+    session = session or _SESSION
+    summary = CloudTrailSummary(settings)
+    for source, key in files:
+        with open_log_file(source, key, session) as text:
+            for record in iter_records(text):
+                summary.add(record)
+        summary.files += 1
+    return summary
+
+
+def plan_shards(files, n_shards):
+    """Deal files round-robin into at most `n_shards` shards."""
+    n_shards = max(1, min(n_shards, len(files)))
+    return [files[i::n_shards] for i in range(n_shards)]
+
+
+def ingest(sources, workers=None, settings=None, cursors=None, session=None, profile_name=None):
+    """
+    Summarize every log file after each source's cursor using `workers` processes.
+
+    Pass `session` (e.g. a StubSession) to run shards in threads sharing it
+    instead of in processes. Returns (summary, cursors, stats); `cursors` is
+    updated to the last key listed per source and `<account>/CloudTrail/<region>/`
+    stream.
+    """
+    settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+    workers = workers or os.cpu_count() or 1
+    cursors = dict(cursors or {})
+    started = time.perf_counter()
+
+    files = []
+    for source in sources:
+        done = stream_cursors(cursors.get(source))
+        for stream, key, _ in iter_log_files(source, session or _lister(source, profile_name), done):
+            files.append((source, key))
+            done[stream] = key      # files come in key order within a stream
+        cursors[source] = done
+    # A few shards per worker so a slow shard doesn't leave the others idle
+    shards = plan_shards(files, workers * 4)
+
+    if session is None:
+        needs_aws = any(source.startswith("s3://") for source in sources)
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                       initargs=(profile_name if needs_aws else None,))
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers)
+
+    summary = CloudTrailSummary(settings)
+    with executor:
+        futures = [executor.submit(summarize_shard, shard, settings, session) for shard in shards]
+        for fut in as_completed(futures):
+            summary.merge(fut.result())     # merged as they land; the parent holds one summary
+
+    seconds = time.perf_counter() - started
+    stats = {"files": summary.files, "records": summary.records, "workers": workers,
+             "shards": len(shards), "seconds": seconds,
+             "records_per_second": summary.records / seconds if seconds else 0.0}
+    return summary, cursors, stats
+
+
+def _lister(source, profile_name):
+    # Listing S3 happens in the parent, so it needs its own client
+    if source.startswith("s3://"):
+        return ClientPool(create_aws_session(profile_name or DEFAULT_PROFILE))
+    return None
+
+
+def summary_findings(summary, threshold):
+    """CT_HEAVY_HITTER findings for the core counters, one per principal x action per day."""
+    day = summary.last_event[:10]
+    return [Finding(type="CT_HEAVY_HITTER", resource=principal, severity="medium", detector=DETECTOR,
+                    message=f"{principal} called {action} ~{calls} times",
+                    detail={"action": action, "estimated_calls": calls, "day": day},
+                    id=f"CT_HEAVY_HITTER:{principal}:{action}:{day}")
+            for principal, action, calls in summary.heavy_hitters(threshold)]
+
+
+if __name__ == "__main__":
+    settings = dict(DEFAULT_SETTINGS, **load_detector_settings())
+    parser = argparse.ArgumentParser(description="SynAccel parallel CloudTrail ingestion")
+    parser.add_argument("sources", nargs="*", default=settings["sources"],
+                        help="local folders or s3://bucket/prefix with CloudTrail logs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, help="AWS profile for s3:// sources")
+    args = parser.parse_args()
+
+    saved = read_json(CURSORS_PATH, {})
+    summary, cursors, stats = ingest(args.sources, args.workers, settings, saved.get("cursors"),
+                                     profile_name=args.profile)
+    print(f"[i] {stats['files']} files, {stats['records']} records in {stats['seconds']:.2f}s "
+          f"with {stats['workers']} workers ({stats['records_per_second']:.0f} records/s)")
+
+    findings = summary_findings(summary, settings["heavy_hitter_threshold"])
+    FindingsLog(FINDINGS_PATH).append(findings)
+    for f in findings:
+        print(f"[!] {f.message}")
+
+    # Merged result -> core counters, with the snapshot kept alongside them
+    with core.state_lock():
+        config, state = core.load_config_and_state()
+        new, offset = core.read_new_findings(state)
+        config, state, changes, escalated = core.run_cycle(config, state, [f.to_event() for f in new])
+        state["findings_offset"] = offset
+        state["cloudtrail"] = summary.to_dict()
+        core.save_config_and_state(config, state)
+    # Cursors move only once everything is merged and saved
+    atomic_write_json(CURSORS_PATH, {"cursors": cursors})
+    print(f"[✓] {len(findings)} findings; distinct source IPs ~{state['cloudtrail']['distinct_ips']}")
@@ -0,0 +1,250 @@
+"""
+GuardDuty ingestion: new and updated GuardDuty findings into the findings log,
+so they count towards the core's counters and risk scores.
+
+High-volume accounts produce thousands of GuardDuty findings a day, and a
+finding whose activity keeps recurring is updated in place (same Id, newer
+UpdatedAt, Service.Count + 1). Re-reading all of them every run isn't an
+option, so each (region, detector) keeps a high-water mark - the newest
+UpdatedAt ingested - in state/guardduty_ingest.json:
+
+- list_findings asks only for updatedAt >= mark - lookback_seconds, oldest
+  first, `page_size` IDs per page (50, the API maximum), and each page is
+  fetched with a single get_findings call;
+- a finding already ingested at the same UpdatedAt (the lookback overlap,
+  or a finding that moved between pages) is skipped; a newer version of it
+  is a new event, so recurring activity keeps counting;
+- regions and detectors are read in parallel, and a detector stops after
+  `max_findings_per_run`, leaving the rest for the next run.
+
+Findings on access keys become IAM_GUARDDUTY events on the user, findings on
+buckets S3_GUARDDUTY events on the bucket, anything else GD_<RESOURCE TYPE>.
+GuardDuty's 0-10 severity score is bucketed into low/medium/high/critical.
+
+    python src/engine/guardduty_ingest.py --regions us-east-1 eu-west-1
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT / "src") not in sys.path:
+    sys.path.insert(0, str(ROOT / "src"))
+
+from botocore.exceptions import ClientError
+
+from utils.clients import ClientPool
+from utils.findings import Finding, FindingsLog, FINDINGS_PATH
+from utils.metrics import METRICS, profile_run
+from utils.sessions import DEFAULT_PROFILE, create_aws_session
+from utils.storage import atomic_write_json, read_json
+from utils.throttle import AdaptiveBackoff
+
+DETECTOR = "guardduty"
+CONFIG_PATH = ROOT / "configs" / "sentinel_config.json"
+CURSORS_PATH = ROOT / "state" / "guardduty_ingest.json"
+MAX_PAGE = 50       # list_findings MaxResults and get_findings FindingIds limit
+
+# Used for anything the `detectors.guardduty` config block leaves out
+DEFAULT_SETTINGS = {
+    "regions": [],                  # [] = the session's default region
+    "page_size": 50,
+    "lookback_seconds": 300,        # re-list this far behind the mark, for late-arriving updates
+    "initial_hours": 24,            # how far back the very first run reaches
+    "max_findings_per_run": 20000,  # per detector
+    "include_archived": False,
+    "concurrency": 8,               # (region, detector) pairs read in parallel
+}
+
+# GuardDuty ResourceType -> Sentinel event type (anything else is GD_<TYPE>)
+EVENT_TYPES = {"AccessKey": "IAM_GUARDDUTY", "S3Bucket": "S3_GUARDDUTY"}
+
+
+def load_detector_settings(path=CONFIG_PATH):
+    """The `detectors.guardduty` block of sentinel_config.json (empty dict if absent)."""
+    return read_json(path, {}).get("detectors", {}).get("guardduty", {})
+
+
+def _ms(value):
+    return int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() * 1000)
+
+
+def severity_of(score):
+    """GuardDuty severity score (0-10) -> one of SEVERITIES."""
+    if score >= 9.0:
+        return "critical"
+    if score >= 7.0:
+        return "high"
+    if score >= 4.0:
+        return "medium"
+    return "low"
+
+
+def resource_of(gd):
+    """The user, bucket or instance a GuardDuty finding is about (its ARN otherwise)."""
+    resource = gd.get("Resource") or {}
+    kind = resource.get("ResourceType")
+    if kind == "AccessKey":
+        details = resource.get("AccessKeyDetails") or {}
+        return details.get("UserName") or details.get("AccessKeyId") or gd["Arn"]
+    if kind == "S3Bucket":
+        buckets = resource.get("S3BucketDetails") or [{}]
+        return buckets[0].get("Name") or gd["Arn"]
+    if kind == "Instance":
+        return (resource.get("InstanceDetails") or {}).get("InstanceId") or gd["Arn"]
+    return gd["Arn"]
+
+
+def to_finding(gd):
+    """Map one get_findings result onto a Finding. Each UpdatedAt is its own event id."""
+    kind = (gd.get("Resource") or {}).get("ResourceType") or "Finding"
+    updated = _ms(gd["UpdatedAt"])
+    service = gd.get("Service") or {}
+    return Finding(
+        type=EVENT_TYPES.get(kind, f"GD_{kind.upper()}"),
+        resource=resource_of(gd),
+        severity=severity_of(float(gd.get("Severity", 0))),
+        detector=DETECTOR,
+        message=f'{gd.get("Type")}: {gd.get("Title", "")}',
+        detail={"guardduty_id": gd["Id"], "guardduty_type": gd.get("Type"), "score": gd.get("Severity"),
+                "count": service.get("Count", 1), "detector_id": service.get("DetectorId", "")},
+        id=f'GD:{gd["Id"]}:{updated}',
+        ts=datetime.fromtimestamp(updated / 1000, timezone.utc).isoformat(),
+        account=gd.get("AccountId", ""),
+        region=gd.get("Region", ""),
+    )
+
+
+def list_detector_ids(client, backoff):
+    ids, kwargs = [], {}
+    while True:
+        page = backoff.call(client.list_detectors, **kwargs)
+        ids += page.get("DetectorIds", [])
+        if not page.get("NextToken"):
+            return ids
+        kwargs["NextToken"] = page["NextToken"]
+
+
+def ingest_detector(client, backoff, detector_id, cursor, settings, now_ms):
+    """
+    New and updated findings of one detector since its cursor ({"mark", "seen"}).
+    Returns (findings, updated cursor, IDs listed).
+    """
+    lookback = int(settings["lookback_seconds"] * 1000)
+    mark = cursor.get("mark") or now_ms - int(settings["initial_hours"] * 3600 * 1000)
+    seen = dict(cursor.get("seen", {}))      # finding id -> UpdatedAt (ms) already ingested
+    criteria = {"updatedAt": {"GreaterThanOrEqual": max(0, mark - lookback)}}
+    if not settings["include_archived"]:
+        criteria["service.archived"] = {"Eq": ["false"]}
+    request = {"DetectorId": detector_id, "FindingCriteria": {"Criterion": criteria},
+               "SortCriteria": {"AttributeName": "updatedAt", "OrderBy": "ASC"},
+               "MaxResults": max(1, min(MAX_PAGE, int(settings["page_size"])))}
+
+    findings, listed = [], 0
+    while listed < settings["max_findings_per_run"]:
+        page = backoff.call(client.list_findings, **request)
+        ids = page.get("FindingIds", [])
+        listed += len(ids)
+        if ids:
+            for gd in backoff.call(client.get_findings, DetectorId=detector_id, FindingIds=ids)["Findings"]:
+                updated = _ms(gd["UpdatedAt"])
+                if seen.get(gd["Id"], -1) >= updated:
+                    continue
+                seen[gd["Id"]] = updated
+                mark = max(mark, updated)
+                findings.append(to_finding(gd))
+        if not page.get("NextToken"):
+            break
+        request["NextToken"] = page["NextToken"]
+
+    # Versions older than the next run's lookback can't be listed again
+    seen = {i: t for i, t in seen.items() if t >= mark - lookback}
+    return findings, {"mark": mark, "seen": seen}, listed
+
+
+def ingest_guardduty(session, settings=None, cursors_path=CURSORS_PATH, stats=None, verbose=True):
+    """
+    Fetch every GuardDuty finding created or updated since the last run, over
+    all configured regions and their detectors. Returns Findings; the cursors
+    in `cursors_path` move on for detectors that were read successfully.
+
+    If a `stats` dict is passed it is filled with regions, detectors, listed,
+    new, errors and seconds.
+    """
+    settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+    regions = settings["regions"] or [None]
+    cursors = read_json(cursors_path, {}).get("cursors", {})
+    if stats is None:
+        stats = {}
+    stats.update(regions=len(regions), detectors=0, listed=0, new=0, errors=0, seconds=0.0)
+    started = time.perf_counter()
+    now_ms = int(time.time() * 1000)
+    workers = max(1, int(settings["concurrency"]))
+    clients = {region: session.client("guardduty", region_name=region) for region in regions}
+    backoffs = {region: AdaptiveBackoff(name="guardduty") for region in regions}     # quotas are per region
+
+    if verbose:
+        print("=== SynAccel Ingest: GuardDuty ===")
+
+    def detectors_in(region):
+        try:
+            return [(region, d) for d in list_detector_ids(clients[region], backoffs[region])]
+        except ClientError as e:
+            print(f"[x] GuardDuty in {region or 'default region'}: {e.response['Error'].get('Code')}")
+            return None
+
+    def read(target):
+        region, detector_id = target
+        key = f"{region or 'default'}/{detector_id}"
+        try:
+            found, cursor, listed = ingest_detector(clients[region], backoffs[region], detector_id,
+                                                    cursors.get(key, {}), settings, now_ms)
+        except ClientError as e:
+            print(f"[x] GuardDuty detector {key}: {e.response['Error'].get('Code')}")
+            return key, [], None, 0
+        METRICS.inc("sentinel_guardduty_findings_total", listed - len(found), region=region or "default",
+                    outcome="duplicate")
+        METRICS.inc("sentinel_guardduty_findings_total", len(found), region=region or "default", outcome="new")
+        return key, found, cursor, listed
+
+    findings = []
+    with METRICS.timer("guardduty.ingest"), ThreadPoolExecutor(max_workers=workers) as pool:
+        targets = []
+        for batch in pool.map(detectors_in, regions):
+            if batch is None:
+                stats["errors"] += 1
+            else:
+                targets += batch
+        for key, found, cursor, listed in pool.map(read, targets):
+            stats["listed"] += listed
+            if cursor is None:
+                stats["errors"] += 1
+                continue
+            cursors[key] = cursor
+            findings.extend(found)
+    atomic_write_json(cursors_path, {"cursors": cursors}, separators=(",", ":"))
+
+    stats.update(detectors=len(targets), new=len(findings), seconds=time.perf_counter() - started)
+    if verbose:
+        print(f"[✓] {stats['detectors']} detectors in {stats['regions']} regions: {stats['listed']} listed, "
+              f"{stats['new']} new or updated in {stats['seconds']:.2f}s")
+    return findings
+
+
+if __name__ == "__main__":
+    settings = dict(DEFAULT_SETTINGS, **load_detector_settings())
+    parser = argparse.ArgumentParser(description="SynAccel GuardDuty ingestion")
+    parser.add_argument("--regions", nargs="*", default=settings["regions"], help="regions to read")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, help="AWS profile to use")
+    args = parser.parse_args()
+    settings["regions"] = args.regions
+
+    pool = ClientPool(create_aws_session(args.profile), concurrency=settings["concurrency"])
+    with profile_run(DETECTOR):
+        found = ingest_guardduty(pool, settings)
+    FindingsLog(FINDINGS_PATH).append(found)
+    print(f"[✓] {len(found)} findings appended to the findings log")
+    METRICS.write_textfile(DETECTOR)
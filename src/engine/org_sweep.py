@@ -0,0 +1,171 @@
+"""
+Organization sweep: run the detectors across every account and region in
+configs/accounts.json in parallel, then merge everything into one state and
+one adaptive policy.
+
+Each worker process assumes the account's role through its own cached
+SessionFactory, keeps one ClientPool of clients per (account, region,
+service), runs the detectors and hands the findings back; the parent
+is the only writer of the findings log and runs the core loop once at the
+end. Wall time scales with accounts / workers.
+
+    python src/engine/org_sweep.py --workers 16
+    python src/engine/org_sweep.py --detectors iam --accounts 111111111111 222222222222
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT / "src") not in sys.path:
+    sys.path.insert(0, str(ROOT / "src"))
+
+from core import sentinel_core as core
+from detectors.iam_exposure_detector import check_iam_exposures
+from detectors.s3_public_access_detector import REVALIDATE_HOURS, check_s3_public_access
+from utils.clients import ClientPool
+from utils.findings import FindingsLog, FINDINGS_PATH
+from utils.fingerprints import FingerprintStore
+from utils.inventory_cache import InventoryCache, load_settings
+from utils.sessions import DEFAULT_PROFILE, SessionFactory, load_inventory
+
+FINGERPRINTS_DIR = ROOT / "state" / "fingerprints"
+INVENTORY_DIR = ROOT / "state" / "inventory"
+
+
+def _run_s3(session, opts, store, cache):
+    return check_s3_public_access(session, concurrency=opts.get("concurrency", 1),
+                                  max_attempts=opts.get("max_attempts", 8),
+                                  incremental=store is not None, store=store,
+                                  revalidate_hours=opts.get("revalidate_hours", REVALIDATE_HOURS), verbose=False,
+                                  cache=cache)
+
+
+def _run_iam(session, opts, store, cache):
+    return check_iam_exposures(session, mode=opts.get("mode", "auto"),
+                               incremental=store is not None, store=store, verbose=False, cache=cache)
+
+
+# name -> (scope, runner). "account" scope detectors look at global services
+# (S3 bucket list, IAM) so they run once per account, not once per region.
+DETECTORS = {
+    "s3": ("account", _run_s3),
+    "iam": ("account", _run_iam),
+}
+
+_POOL = None        # per worker process, so credentials and clients are cached per process
+
+
+def _init_worker(inventory, profile_name, concurrency, client_settings):
+    global _POOL
+    _POOL = ClientPool(factory=SessionFactory.from_inventory(inventory, profile_name),
+                       concurrency=concurrency, settings=client_settings)
+
+
+def plan_tasks(inventory, detectors):
+    """One (account, region, detector) task per account for global detectors, per region otherwise."""
+    tasks = []
+    for account in inventory["accounts"]:
+        for name in detectors:
+            scope, _ = DETECTORS[name]
+            regions = account["regions"][:1] if scope == "account" else account["regions"]
+            for region in regions:
+                tasks.append((account, region, name))
+    return tasks
+
+
+def run_task(task, settings, pool=None):
+    """Run one detector in one account/region. Returns a result dict (never raises)."""
+    account, region, name = task
+    pool = pool or _POOL
+    started = time.perf_counter()
+    result = {"account": account["id"], "region": region, "detector": name, "findings": [], "error": None}
+    try:
+        session = pool.for_account(account, region)
+        opts = settings.get(name, {})
+        store = None
+        if opts.get("incremental"):
+            # One fingerprint file per account: names (IAM users) repeat across accounts
+            store = FingerprintStore(FINGERPRINTS_DIR / f"{account['id']}.json")
+        # One inventory cache per account too, for the same reason
+        cache = InventoryCache(INVENTORY_DIR / f"{account['id']}.json.gz", load_settings())
+        findings = DETECTORS[name][1](session, opts, store, cache)
+        cache.save()
+        for f in findings:
+            f.account, f.region = account["id"], region
+            f.id = f"{account['id']}:{f.id}"
+        result["findings"] = findings
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+def sweep_organization(inventory, detectors=("s3", "iam"), workers=8, settings=None,
+                       factory=None, log=None, profile_name=DEFAULT_PROFILE, client_settings=None):
+    """
+    Fan the detectors out over every account/region and merge the results.
+
+    By default tasks run in a process pool. Passing a `factory` (anything with
+    `session_for(account, region)`) runs them in threads sharing it instead,
+    which is what you want with stub sessions or very few accounts.
+
+    Returns (findings, errors).
+    """
+    settings = settings or {}
+    concurrency = settings.get("s3", {}).get("concurrency", 1)
+    log = log or FindingsLog(FINDINGS_PATH)
+    tasks = plan_tasks(inventory, detectors)
+    print(f"=== SynAccel Org Sweep: {len(inventory['accounts'])} accounts, "
+          f"{len(tasks)} tasks, {workers} workers ===")
+
+    if factory is None:
+        meta = {k: v for k, v in inventory.items() if k != "accounts"}
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                       initargs=(meta, profile_name, concurrency, client_settings))
+        clients = None
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers)
+        clients = ClientPool(factory=factory, concurrency=concurrency, settings=client_settings)
+
+    findings, errors = [], []
+    started = time.perf_counter()
+    with executor:
+        futures = [executor.submit(run_task, task, settings, clients) for task in tasks]
+        for fut in as_completed(futures):
+            result = fut.result()
+            label = f"{result['account']}/{result['region']}/{result['detector']}"
+            if result["error"]:
+                errors.append(result)
+                print(f"[x] {label}: {result['error']}")
+                continue
+            # Parent is the only writer, so the log never sees interleaved batches
+            log.append(result["findings"])
+            findings.extend(result["findings"])
+            print(f"[+] {label}: {len(result['findings'])} findings in {result['seconds']:.1f}s")
+
+    print(f"[i] Sweep finished in {time.perf_counter() - started:.1f}s: "
+          f"{len(findings)} findings, {len(errors)} failed tasks")
+    return findings, errors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SynAccel multi-account, multi-region sweep")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, help="base profile used to assume roles")
+    parser.add_argument("--workers", type=int, default=8, help="parallel worker processes")
+    parser.add_argument("--detectors", nargs="+", default=list(DETECTORS), choices=list(DETECTORS))
+    parser.add_argument("--accounts", nargs="+", help="only these account ids")
+    args = parser.parse_args()
+
+    inventory = load_inventory()
+    if args.accounts:
+        inventory["accounts"] = [a for a in inventory["accounts"] if a["id"] in args.accounts]
+
+    config, state = core.load_config_and_state()
+    sweep_organization(inventory, args.detectors, args.workers, settings=config.get("detectors", {}),
+                       profile_name=args.profile, client_settings=config.get("clients"))
+
+    # One core pass over everything the sweep logged -> one state, one policy
+    core.main()
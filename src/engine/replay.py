@@ -0,0 +1,302 @@
+"""
+Replay: stream archived findings through the core loop on a simulated clock,
+for many policy variants at once, to tune thresholds offline.
+
+Nothing here touches AWS or the live state: every variant starts from a copy
+of the config with its overrides applied, an empty state and an in-memory
+EventStore, and results only go to the console (or --out). The clock
+advances in `--step-minutes` ticks, as the engine would run the core; each
+tick feeds the findings logged during it to rollup_events_into_state(now=tick)
+and then adapt_config(now=tick). Quiet ticks still run, so counters drain
+and de-escalation rules get their chance.
+
+Rollup only depends on the config's `scoring` block, so variants that differ
+only in policy thresholds share one rollup per tick and each pays only for
+its own rule evaluation - a hundred threshold combinations cost little more
+than one. With --workers > 1 the variants are split over processes.
+
+For each variant you get the escalation timeline (every rule flip, with the
+simulated time) plus escalation/revert counts and hours spent escalated per
+rule.
+
+    python src/engine/replay.py state/findings.jsonl archive/findings-*.jsonl.gz \\
+        --set policy.iam.escalation_threshold_24h=2,3,5 --set policy.s3.escalation_score=10,15,25
+    python src/engine/replay.py state/findings.jsonl --days 30 --out /tmp/replay.json --timeline
+"""
+import argparse
+import copy
+import gzip
+import heapq
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT / "src") not in sys.path:
+    sys.path.insert(0, str(ROOT / "src"))
+
+from core import sentinel_core as core
+from utils.event_store import EventStore
+from utils.findings import Finding, FINDINGS_PATH
+from utils.rules import load_rules
+from utils.storage import atomic_write_json, read_json
+
+STEP_MINUTES = 15
+
+
+def _iso(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat(timespec="seconds")
+
+
+def _open(path):
+    path = Path(path)
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def _read_log(path, since, until):
+    """(epoch, event) for each finding in one JSONL findings log (optionally gzipped)."""
+    with _open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                event = Finding.from_dict(json.loads(line)).to_event()
+            except (ValueError, TypeError) as e:
+                print(f"[x] Skipping malformed finding line in {path}: {e}")
+                continue
+            ts = core._parse_ts(event["ts"])
+            if ts is not None and since <= ts < until:
+                yield ts, event
+
+
+def iter_archived_events(paths, since=None, until=None):
+    """
+    (epoch, event) from findings logs, merged by time. Each log is streamed
+    (logs are append-only, so already close to time order), so a month of
+    findings never sits in memory at once.
+    """
+    since = float("-inf") if since is None else since
+    until = float("inf") if until is None else until
+    streams = [_read_log(p, since, until) for p in paths]
+    return heapq.merge(*streams, key=lambda item: item[0])
+
+
+def parse_grid(specs):
+    """
+    ["policy.iam.escalation_threshold_24h=2,3", "scoring.half_life_hours=12,24"]
+    -> every combination, as [{path: value}, ...]. Values are JSON (numbers,
+    true/false), anything else is kept as a string.
+    """
+    axes = []
+    for spec in specs or []:
+        path, sep, values = spec.partition("=")
+        if not sep or not path:
+            raise ValueError(f"expected PATH=V1,V2,..., got {spec!r}")
+        parsed = []
+        for text in values.split(","):
+            try:
+                parsed.append(json.loads(text))
+            except ValueError:
+                parsed.append(text)
+        axes.append([(path, v) for v in parsed])
+    return [dict(combo) for combo in itertools.product(*axes)]
+
+
+def apply_overrides(config, overrides):
+    """A deep copy of `config` with each dotted path in `overrides` set."""
+    config = copy.deepcopy(config)
+    for path, value in overrides.items():
+        *parents, key = path.split(".")
+        node = config
+        for part in parents:
+            node = node.setdefault(part, {})
+        node[key] = value
+    return config
+
+
+def variant_name(overrides):
+    if not overrides:
+        return "baseline"
+    return ", ".join(f"{path.removeprefix('policy.')}={json.dumps(v)}" for path, v in overrides.items())
+
+
+class _Run:
+    """One variant's config and rule memory, and what happened to it."""
+
+    def __init__(self, base_config, overrides):
+        self.overrides = overrides
+        self.config = apply_overrides(base_config, overrides)
+        self.memory = {}            # state["rules"] of this variant
+        self.timeline = []
+        self.on_since = {}          # rule -> simulated time it escalated
+        self.by_rule = {}
+
+    def step(self, state, now, rules):
+        view = {"counters": state["counters"], "scores": state["scores"], "rules": self.memory}
+        before = {name: e.get("on") for name, e in self.memory.get("active", {}).items()}
+        self.config, changes = core.adapt_config(self.config, view, now=now, rules=rules)
+        for name, entry in self.memory.get("active", {}).items():
+            if entry.get("on") == before.get(name, False):
+                continue
+            counts = self.by_rule.setdefault(name, {"escalations": 0, "reverts": 0, "hours_active": 0.0})
+            if entry["on"]:
+                counts["escalations"] += 1
+                self.on_since[name] = now
+            else:
+                counts["reverts"] += 1
+                counts["hours_active"] += (now - self.on_since.pop(name)) / 3600
+            self.timeline.append({"ts": _iso(now), "rule": name,
+                                  "action": "escalate" if entry["on"] else "revert",
+                                  "changes": changes})
+
+    def result(self, end):
+        for name, since in self.on_since.items():     # still escalated when the log ran out
+            self.by_rule[name]["hours_active"] += (end - since) / 3600
+        return {
+            "name": variant_name(self.overrides),
+            "overrides": self.overrides,
+            "escalations": sum(c["escalations"] for c in self.by_rule.values()),
+            "reverts": sum(c["reverts"] for c in self.by_rule.values()),
+            "first_escalation": self.timeline[0]["ts"] if self.timeline else None,
+            "by_rule": {name: dict(c, hours_active=round(c["hours_active"], 2))
+                        for name, c in sorted(self.by_rule.items())},
+            "timeline": self.timeline,
+            "final_policy": self.config.get("policy", {}),
+        }
+
+
+def replay(paths, base_config, variants, rules_path=core.RULES_PATH, step_minutes=STEP_MINUTES,
+           since=None, until=None):
+    """
+    Replay the findings logs `paths` for each override dict in `variants`.
+    Returns (one result dict per variant, in order; stats).
+    """
+    rules = load_rules(rules_path)
+    step = step_minutes * 60
+    runs = [_Run(base_config, overrides) for overrides in variants]
+    groups = {}     # scoring block -> the state and store its variants share
+    for run in runs:
+        key = json.dumps(run.config.get("scoring"), sort_keys=True)
+        group = groups.setdefault(key, {"scoring": run.config.get("scoring"), "state": {},
+                                        "store": EventStore(":memory:"), "runs": []})
+        group["runs"].append(run)
+    stats = {"events": 0, "cycles": 0, "variants": len(runs), "rollups": len(groups),
+             "start": None, "end": None, "seconds": 0.0}
+    started = time.perf_counter()
+
+    def cycle(batch, now):
+        for group in groups.values():
+            core.rollup_events_into_state(group["state"], batch, now=now, store=group["store"],
+                                          scoring=group["scoring"])
+            for run in group["runs"]:
+                run.step(group["state"], now, rules)
+        stats["cycles"] += 1
+
+    now, batch = None, []
+    for ts, event in iter_archived_events(paths, since, until):
+        if now is None:
+            now = ts - ts % step + step     # end of the first tick
+            stats["start"] = _iso(now - step)
+        while ts >= now:
+            cycle(batch, now)
+            batch = []
+            now += step
+        batch.append(event)
+        stats["events"] += 1
+    if now is not None:
+        cycle(batch, now)
+        stats["end"] = _iso(now)
+
+    for group in groups.values():
+        group["store"].close()
+    stats["seconds"] = time.perf_counter() - started
+    return [run.result(now or 0.0) for run in runs], stats
+
+
+def replay_parallel(paths, base_config, variants, rules_path=core.RULES_PATH, step_minutes=STEP_MINUTES,
+                    since=None, until=None, workers=None):
+    """replay() with the variants split over `workers` processes. Same return value."""
+    workers = max(1, min(workers or os.cpu_count() or 1, len(variants)))
+    if workers == 1:
+        return replay(paths, base_config, variants, rules_path, step_minutes, since, until)
+    # Contiguous shards of variants sorted by scoring block, so shared rollups mostly stay shared
+    order = sorted(range(len(variants)), key=lambda i: json.dumps(
+        apply_overrides(base_config, variants[i]).get("scoring"), sort_keys=True))
+    size = -(-len(order) // workers)
+    shards = [order[i:i + size] for i in range(0, len(order), size)]
+    started = time.perf_counter()
+    results = [None] * len(variants)
+    stats = None
+    with ProcessPoolExecutor(max_workers=len(shards)) as pool:
+        futures = [(shard, pool.submit(replay, paths, base_config, [variants[i] for i in shard],
+                                       rules_path, step_minutes, since, until)) for shard in shards]
+        for shard, fut in futures:
+            shard_results, shard_stats = fut.result()
+            for i, result in zip(shard, shard_results):
+                results[i] = result
+            if stats is None:
+                stats = shard_stats
+            else:
+                stats["rollups"] += shard_stats["rollups"]
+    stats.update(variants=len(variants), workers=len(shards), seconds=time.perf_counter() - started)
+    return results, stats
+
+
+def print_summary(results, stats, timeline=False):
+    print(f"[i] {stats['events']} events, {stats['cycles']} ticks ({stats['start']} .. {stats['end']}), "
+          f"{stats['variants']} variants in {stats['seconds']:.2f}s")
+    width = max(len(r["name"]) for r in results)
+    print(f"{'variant':<{width}} {'escalations':>11} {'reverts':>7}  {'first escalation':<25} hours escalated")
+    for r in results:
+        hours = ", ".join(f"{name} {c['hours_active']:.1f}h" for name, c in r["by_rule"].items()) or "-"
+        print(f"{r['name']:<{width}} {r['escalations']:>11} {r['reverts']:>7}  "
+              f"{r['first_escalation'] or '-':<25} {hours}")
+        if timeline:
+            for entry in r["timeline"]:
+                print(f"    {entry['ts']}  {entry['action']:<8} {entry['rule']}")
+
+
+def _epoch(value):
+    """ISO date/time -> epoch seconds; naive values are UTC."""
+    if not value:
+        return None
+    when = datetime.fromisoformat(value)
+    return (when if when.tzinfo else when.replace(tzinfo=timezone.utc)).timestamp()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SynAccel replay / dry run of the adaptive response loop")
+    parser.add_argument("logs", nargs="*", default=[str(FINDINGS_PATH)],
+                        help="findings logs (.jsonl or .jsonl.gz) to replay")
+    parser.add_argument("--set", dest="grid", action="append", metavar="PATH=V1,V2",
+                        help="config value(s) to try, e.g. policy.s3.escalation_score=10,15; "
+                             "repeat for a grid of every combination")
+    parser.add_argument("--config", default=str(core.CONFIG_PATH), help="base config (only read)")
+    parser.add_argument("--rules", default=str(core.RULES_PATH), help="rule file (only read)")
+    parser.add_argument("--step-minutes", type=float, default=STEP_MINUTES, help="simulated core interval")
+    parser.add_argument("--since", help="replay from this UTC date/time (ISO)")
+    parser.add_argument("--until", help="replay up to this UTC date/time (ISO)")
+    parser.add_argument("--days", type=float, help="replay only the last N days before --until (or now)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--timeline", action="store_true", help="print every escalation and revert")
+    parser.add_argument("--out", help="write the full results as JSON here")
+    args = parser.parse_args()
+
+    until = _epoch(args.until)
+    since = _epoch(args.since)
+    if args.days is not None:
+        since = (until or time.time()) - args.days * 86400
+    variants = parse_grid(args.grid) or [{}]
+    results, stats = replay_parallel(args.logs, read_json(args.config, {}), variants, args.rules,
+                                     args.step_minutes, since, until, args.workers)
+    print_summary(results, stats, args.timeline)
+    if args.out:
+        atomic_write_json(args.out, {"stats": stats, "results": results}, indent=2)
+        print(f"[✓] Results written to {args.out}")
@@ -0,0 +1,315 @@
+"""
+SynAccel Sentinel engine: one resident process instead of one-shot scripts.
+
+The engine imports boto3 once, keeps its clients warm in a shared ClientPool,
+holds config/state in memory, and runs each detector on its own interval
+(with jitter so they don't all fire together). Whenever a detector appends
+findings to the log, the core rollup + adapt_config runs straight away
+instead of waiting for the next cron tick, and the new findings go through
+the remediation queue under the freshly adapted policy.
+
+    python src/engine/sentinel_engine.py            # run until Ctrl+C
+    python src/engine/sentinel_engine.py --once     # every detector once, then exit
+    python src/engine/sentinel_engine.py --changes file:state/changes.jsonl
+
+With a change queue (--changes, or `engine.changes.queue` in the config) a
+listener thread also re-checks each resource named by a configuration-change
+event as it arrives (see change_events.py), so a bucket made public is
+flagged and remediated within seconds instead of at the next S3 sweep.
+--no-sweeps runs on change events alone.
+
+Metrics go to state/metrics/engine.prom after every core pass, and to
+http://127.0.0.1:<port>/metrics if `metrics.port` is set in the config.
+"""
+import argparse
+import heapq
+import json
+import queue
+import random
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT / "src") not in sys.path:
+    sys.path.insert(0, str(ROOT / "src"))
+
+from core import sentinel_core as core
+from engine.change_events import ChangeListener
+from engine.guardduty_ingest import ingest_guardduty
+from detectors.cloudtrail_anomaly_detector import check_cloudtrail_anomalies
+from detectors.iam_exposure_detector import check_iam_exposures
+from detectors.s3_public_access_detector import REVALIDATE_HOURS, check_s3_public_access
+from responders.remediation_queue import RemediationQueue, save_batch_report
+from utils.change_queue import open_queue
+from utils.clients import ClientPool
+from utils.findings import FindingsLog, FINDINGS_PATH
+from utils.inventory_cache import inventory_cache
+from utils.metrics import METRICS, profile_run
+from utils.sessions import create_aws_session
+
+# Used when sentinel_config.json has no "engine" section
+DEFAULT_SCHEDULE = {
+    "s3":  {"interval_seconds": 900,  "jitter": 0.1},
+    "iam": {"interval_seconds": 3600, "jitter": 0.1},
+}
+# A failed core pass is retried this long after, or sooner if new findings arrive
+CORE_RETRY_SECONDS = 30
+
+
+class Job:
+    """A detector plus its schedule."""
+
+    def __init__(self, name, fn, interval_seconds, jitter=0.1):
+        self.name = name
+        self.fn = fn
+        self.interval = float(interval_seconds)
+        self.jitter = float(jitter)
+        self.next_run = 0.0
+        self.running = False
+
+    def reschedule(self, now):
+        spread = self.interval * self.jitter
+        self.next_run = now + self.interval + random.uniform(-spread, spread)
+
+    def __lt__(self, other):
+        return self.next_run < other.next_run
+
+
+def pool_concurrency(config):
+    """Largest number of threads that will share one client: detector scans or the responder batch."""
+    return max(config.get("detectors", {}).get("s3", {}).get("concurrency", 1),
+               config.get("responders", {}).get("concurrency", 1))
+
+
+def detector_jobs(config):
+    """Build the detector jobs from the "engine" and "detectors" sections of the config."""
+    schedule = config.get("engine", {}).get("detectors", DEFAULT_SCHEDULE)
+    s3_opts = config.get("detectors", {}).get("s3", {})
+    ct_opts = config.get("detectors", {}).get("cloudtrail", {})
+    gd_opts = config.get("detectors", {}).get("guardduty", {})
+    runners = {
+        "s3": lambda session: check_s3_public_access(
+            session, concurrency=s3_opts.get("concurrency", 1),
+            max_attempts=s3_opts.get("max_attempts", 8),
+            incremental=s3_opts.get("incremental", False),
+            revalidate_hours=s3_opts.get("revalidate_hours", REVALIDATE_HOURS), verbose=False),
+        "iam": lambda session: check_iam_exposures(session, verbose=False),
+        "cloudtrail": lambda session: check_cloudtrail_anomalies(session, settings=ct_opts, verbose=False),
+        "guardduty": lambda session: ingest_guardduty(session, settings=gd_opts, verbose=False),
+    }
+    jobs = []
+    for name, opts in schedule.items():
+        if name not in runners:
+            print(f"[x] Unknown detector in engine schedule: {name}")
+            continue
+        jobs.append(Job(name, runners[name], opts.get("interval_seconds", 900), opts.get("jitter", 0.1)))
+    return jobs
+
+
+class SentinelEngine:
+    """Schedules detectors and runs the core loop whenever new findings land."""
+
+    def __init__(self, session, config=None, state=None, log=None, max_workers=4, respond=True, changes=None):
+        """
+        `session` is normally a ClientPool, so detector runs reuse warm clients.
+        `changes` is an optional change queue (utils.change_queue) to listen on.
+        """
+        if config is None or state is None:
+            config, state = core.load_config_and_state()
+        self.session = session
+        self.config = config
+        self.state = state
+        self.log = log or FindingsLog(FINDINGS_PATH)
+        self.jobs = detector_jobs(config)
+        self.remediation = RemediationQueue(session, config["policy"], config.get("responders")) if respond else None
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="detector")
+        self._events = queue.Queue()    # ("findings", job) / ("done", job) from workers
+        self._stop = threading.Event()
+        self._stamp = core.state_stamp()    # state file as we last loaded/saved it
+        self._core_retry_at = None          # monotonic time to retry a failed core pass
+        self.changes = None
+        if changes is not None:
+            self.changes = ChangeListener(changes, session, self.log, config.get("engine", {}).get("changes"))
+
+    # ---- detector side (worker threads) --------------------------------------
+
+    def _run_job(self, job):
+        started = time.perf_counter()
+        try:
+            findings = job.fn(self.session)
+            self.log.append(findings)
+            elapsed = time.perf_counter() - started
+            METRICS.observe("sentinel_stage_seconds", elapsed, stage=f"engine.{job.name}")
+            print(f"[+] {job.name}: {len(findings)} findings in {elapsed:.2f}s")
+            if findings:
+                self._events.put(("findings", job))
+        except Exception as e:
+            # Keep the engine alive; the job just runs again on its next slot
+            print(f"[x] {job.name} detector failed: {e}")
+        finally:
+            self._events.put(("done", job))
+
+    def _listen(self):
+        """Change listener thread: findings from re-checked resources wake the core loop."""
+        while not self._stop.is_set():
+            try:
+                findings = self.changes.poll_once()
+            except Exception as e:
+                print(f"[x] Change listener failed: {e}")
+                self._stop.wait(5)
+                continue
+            if findings:
+                self._events.put(("findings", None))
+
+    # ---- core side (main thread) ---------------------------------------------
+
+    def run_core(self):
+        """
+        Roll the new tail of the findings log into state, adapt the policy,
+        then remediate the new findings under that (possibly escalated) policy.
+        """
+        with core.state_lock():
+            if core.state_stamp() != self._stamp:
+                # Another process (a cron'd core run, an org sweep) saved since we did
+                self.config, self.state = core.load_config_and_state()
+            try:
+                with METRICS.timer("core.read_findings"):
+                    findings, offset = core.read_new_findings(self.state, self.log)
+                    new_events = [f.to_event() for f in findings]
+                self.config, self.state, changes, escalated = core.run_cycle(self.config, self.state, new_events)
+                self.state["findings_offset"] = offset
+                with METRICS.timer("core.save"):
+                    core.save_config_and_state(self.config, self.state)
+            except Exception:
+                # Nothing was committed: forget the half-counted events and
+                # start over from the saved state, so the retry sees them again
+                core.event_store().rollback()
+                self._stamp = None
+                raise
+            self._stamp = core.state_stamp()
+        if escalated:
+            core.save_core_report(self.state, self.config, changes)
+            print("[+] Policy escalated based on recent events:")
+            print(json.dumps(self.config["policy"], sort_keys=True))
+
+        if self.remediation is not None and findings:
+            self.remediation.policy = self.config["policy"]
+            self.remediation.submit(findings)
+            results = self.remediation.run()
+            if results:
+                save_batch_report(results)
+        with METRICS.timer("inventory.save"):
+            inventory_cache().save()
+        METRICS.write_textfile("engine", self.config.get("metrics"))
+        return changes
+
+    def _try_core(self):
+        """run_core(), but a failure only schedules a retry instead of stopping the engine."""
+        try:
+            self.run_core()
+            self._core_retry_at = None
+        except Exception as e:
+            self._core_retry_at = time.monotonic() + CORE_RETRY_SECONDS
+            print(f"[x] Core pass failed, retrying in {CORE_RETRY_SECONDS}s: {e}")
+
+    def _launch_due(self, heap, now):
+        while heap and heap[0].next_run <= now:
+            job = heapq.heappop(heap)
+            if job.running:
+                # Previous run still going; don't stack another one on top
+                job.reschedule(now)
+                heapq.heappush(heap, job)
+                continue
+            job.running = True
+            self._pool.submit(self._run_job, job)
+
+    def run_forever(self, once=False):
+        """
+        Main loop. Sleeps until either a detector is due or a worker reports
+        findings; findings trigger run_core() immediately. With `once=True`
+        every detector runs a single time (and queued change events are
+        handled) and we return after the core pass.
+        """
+        if self.changes is not None:
+            if once:
+                self.changes.drain()
+            else:
+                threading.Thread(target=self._listen, name="changes", daemon=True).start()
+        try:
+            self._try_core()    # catch up on anything logged while we were down
+            self._loop(once)
+        finally:
+            self._stop.set()    # also stops the change listener
+            self._pool.shutdown(wait=True)
+            inventory_cache().save()
+
+    def _loop(self, once):
+        now = time.monotonic()
+        heap = []
+        for job in self.jobs:
+            job.next_run = now      # everything runs once at startup
+            heapq.heappush(heap, job)
+
+        while not self._stop.is_set():
+            if not once or len(heap) == len(self.jobs):
+                self._launch_due(heap, time.monotonic())
+            if self._core_retry_at is not None and time.monotonic() >= self._core_retry_at:
+                self._try_core()
+            if once and not heap and not any(j.running for j in self.jobs):
+                break
+
+            wait = 1.0      # wake up at least once a second to notice stop()
+            if heap:
+                wait = min(wait, max(0.0, heap[0].next_run - time.monotonic()))
+            METRICS.set("sentinel_queue_depth", self._events.qsize(), queue="engine_events")
+            try:
+                kind, job = self._events.get(timeout=wait)
+            except queue.Empty:
+                continue
+
+            if kind == "findings":
+                self._try_core()
+            elif kind == "done":
+                job.running = False
+                if not once:
+                    job.reschedule(time.monotonic())
+                    heapq.heappush(heap, job)
+
+    def stop(self, *_):
+        print("\n[i] Stopping Sentinel engine...")
+        self._stop.set()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SynAccel Sentinel resident engine")
+    parser.add_argument("--profile", default="sentinel-automation", help="AWS profile to use")
+    parser.add_argument("--once", action="store_true", help="run every detector once, then exit")
+    parser.add_argument("--changes", metavar="QUEUE",
+                        help="also listen for change events: memory:, file:<path> or sqs:<url>")
+    parser.add_argument("--no-sweeps", action="store_true", help="don't schedule the detector sweeps")
+    parser.add_argument("--cprofile", metavar="DIR",
+                        help="profile the whole run with cProfile and save the stats in DIR")
+    args = parser.parse_args()
+
+    config, state = core.load_config_and_state()
+    pool = ClientPool(create_aws_session(args.profile), concurrency=pool_concurrency(config),
+                      settings=config.get("clients"))
+    spec = args.changes or config.get("engine", {}).get("changes", {}).get("queue")
+    engine = SentinelEngine(pool, config, state, changes=open_queue(spec, pool) if spec else None)
+    if args.no_sweeps:
+        engine.jobs = []
+    signal.signal(signal.SIGINT, engine.stop)
+    signal.signal(signal.SIGTERM, engine.stop)
+    port = config.get("metrics", {}).get("port")
+    if port:
+        METRICS.serve(port)
+        print(f"[i] Metrics on http://127.0.0.1:{port}/metrics")
+    names = [j.name for j in engine.jobs] + (["changes"] if spec else [])
+    print(f"=== SynAccel Sentinel Engine: {', '.join(names)} ===")
+    with profile_run("engine", args.cprofile):
+        engine.run_forever(once=args.once)
+    pool.print_stats()
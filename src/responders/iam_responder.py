@@ -1,38 +1,66 @@
-import boto3
 from botocore.exceptions import ClientError
 from datetime import datetime
-import os
+from pathlib import Path
+import sys
+
+# Make src/ importable when this file is run directly (python src/responders/...)
+SRC = Path(__file__).resolve().parents[1]
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from utils.clients import ClientPool
+from utils.inventory_cache import access_keys, has_mfa, inventory_cache, list_user_names
+from utils.report_store import report_store
+from utils.sessions import create_aws_session
 
 def save_report(user_name, result):
     """Saves responder output to a markdown report."""
     timestamp = datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
-    report_dir = os.path.join(os.path.dirname(__file__), "../../reports/sample_output")
-    os.makedirs(report_dir, exist_ok=True)
-    report_path = os.path.join(report_dir, f"iam_responder_report_{timestamp}.md")
+    report_path = report_store().write("iam_responder_report", (
+        "# SynAccel IAM Responder Report\n\n"
+        f"Generated: {timestamp}\n\n"
+        f"User: {user_name}\n\n"
+        f"Result: {result}\n"))
+
+    print(f"[✓] Markdown report saved to: {report_path}")
 
-    with open(report_path, "w") as f:
-        f.write("# SynAccel IAM Responder Report\n\n")
-        f.write(f"Generated: {timestamp}\n\n")
-        f.write(f"User: {user_name}\n\n")
-        f.write(f"Result: {result}\n")
 
-    print(f"[✓] Markdown report saved to: {os.path.abspath(report_path)}")
+def tag_user(iam, user_name, value="NoMFA"):
+    """Tags an IAM user as flagged. Raises ClientError on failure."""
+    iam.tag_user(
+        UserName=user_name,
+        Tags=[{"Key": "SynAccelFlagged", "Value": value}]
+    )
+    return f"Tagged SynAccelFlagged:{value}"
 
 
-def create_aws_session(profile_name="sentinel-automation"):
-    """Creates an authenticated AWS session."""
-    session = boto3.Session(profile_name=profile_name)
-    return session
+def disable_access_keys(iam, user_name, cache=None):
+    """
+    Deactivates (not deletes) every active access key of a user, for the
+    disable_keys_on_nomfa policy. Raises ClientError on failure. The key list
+    comes from the inventory cache (usually fetched by this cycle's detector).
+    """
+    cache = cache or inventory_cache()
+    disabled = 0
+    try:
+        for key in access_keys(iam, user_name, cache):
+            if key["Status"] == "Active":
+                iam.update_access_key(UserName=user_name, AccessKeyId=key["AccessKeyId"], Status="Inactive")
+                disabled += 1
+    finally:
+        if disabled:
+            cache.invalidate("access_keys", user_name)
+    return f"Deactivated {disabled} access key(s)"
 
 
-def tag_user_no_mfa(user_name, session):
-    """Applies a tag to an IAM user missing MFA."""
-    iam = session.client("iam")
+def tag_user_no_mfa(user_name, session, iam=None):
+    """
+    Applies a tag to an IAM user missing MFA. Pass a ClientPool as `session`
+    (or an `iam` client) so repeated calls reuse one client.
+    """
+    iam = iam or session.client("iam")
     try:
-        iam.tag_user(
-            UserName=user_name,
-            Tags=[{"Key": "SynAccelFlagged", "Value": "NoMFA"}]
-        )
+        tag_user(iam, user_name)
         print(f"[+] Tagged user {user_name} as SynAccelFlagged:NoMFA")
         return "User tagged successfully (No MFA)"
     except ClientError as e:
@@ -41,22 +69,23 @@ def tag_user_no_mfa(user_name, session):
 
 
 def check_and_remediate_users(session):
-    """Scans users and remediates those missing MFA."""
+    """
+    Scans users and remediates those missing MFA.
+    Standalone fallback; the remediation queue acts on detector findings instead.
+    """
     iam = session.client("iam")
-    response = iam.list_users()
-
-    for user in response["Users"]:
-        user_name = user["UserName"]
-        mfa_devices = iam.list_mfa_devices(UserName=user_name)["MFADevices"]
+    cache = inventory_cache()
 
-        if not mfa_devices:
+    for user_name in list_user_names(iam, cache):
+        if not has_mfa(iam, user_name, cache):
             print(f"[!] {user_name} has no MFA — tagging user.")
-            result = tag_user_no_mfa(user_name, session)
+            result = tag_user_no_mfa(user_name, session, iam)
             save_report(user_name, result)
         else:
             print(f"[✓] {user_name} already has MFA.")
 
 
 if __name__ == "__main__":
-    session = create_aws_session()
-    check_and_remediate_users(session)
+    pool = ClientPool(create_aws_session())
+    check_and_remediate_users(pool)
+    inventory_cache().save()
@@ -0,0 +1,306 @@
+"""
+Remediation queue: turns detector findings into responder actions and runs
+them as one concurrent batch.
+
+- which actions run is decided by the live policy in sentinel_config.json
+- duplicate actions are coalesced (same bucket flagged twice -> locked once),
+  also across batches within `coalesce_seconds`
+- findings from other accounts (org sweeps) are acted on in that account,
+  through the inventory role; without an inventory entry they are skipped,
+  never applied to a same-named resource in the home account
+- each AWS service gets its own token-bucket rate limit and throttle backoff
+- one consolidated markdown report is written per batch, not one per action
+
+    python src/responders/remediation_queue.py     # act on findings logged since the last run
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT / "src") not in sys.path:
+    sys.path.insert(0, str(ROOT / "src"))
+
+from responders.iam_responder import disable_access_keys, tag_user
+from responders.s3_responder import apply_public_access_block, tag_bucket
+from utils.clients import ClientPool
+from utils.findings import FindingsLog, FINDINGS_PATH
+from utils.inventory_cache import InventoryCache, inventory_cache, load_settings
+from utils.metrics import METRICS, profile_run
+from utils.report_store import REPORTS_DIR, report_store
+from utils.sessions import ACCOUNTS_PATH, SessionFactory, create_aws_session, load_inventory
+from utils.storage import FileLock, atomic_write_json
+from utils.throttle import AdaptiveBackoff
+
+CONFIG_PATH = ROOT / "configs" / "sentinel_config.json"
+CURSOR_PATH = ROOT / "state" / "remediation_cursor.json"
+
+# Used when sentinel_config.json has no "responders" section
+DEFAULT_SETTINGS = {
+    "concurrency": 16,
+    "rate_limits": {"s3": 25, "iam": 5},    # calls/second; IAM's control plane is slow
+    "coalesce_seconds": 300,
+}
+
+
+def _lock_bucket(s3, bucket, cache):
+    return f"{apply_public_access_block(s3, bucket, cache)}; {tag_bucket(s3, bucket)}"
+
+
+def _tag_bucket_only(s3, bucket, cache):
+    return tag_bucket(s3, bucket, value="PublicAccessDetected")
+
+
+def _tag_user(iam, user, cache):
+    return tag_user(iam, user)
+
+
+# action name -> (service, function(client, resource, inventory cache) -> result message)
+ACTIONS = {
+    "s3:lock": ("s3", _lock_bucket),
+    "s3:tag": ("s3", _tag_bucket_only),
+    "iam:tag_no_mfa": ("iam", _tag_user),
+    "iam:disable_keys": ("iam", disable_access_keys),
+}
+
+
+def plan_actions(finding, policy):
+    """Which actions the current policy asks for, for one finding."""
+    if finding.type == "S3_PUBLIC":
+        s3 = policy.get("s3", {})
+        if s3.get("auto_remediate_public"):
+            return ["s3:lock"]
+        if s3.get("auto_tag_only"):
+            return ["s3:tag"]
+    elif finding.type == "IAM_NO_MFA":
+        actions = ["iam:tag_no_mfa"]
+        if policy.get("iam", {}).get("disable_keys_on_nomfa"):
+            actions.append("iam:disable_keys")
+        return actions
+    return []
+
+
+class TokenBucket:
+    """Thread-safe token bucket: at most `rate` acquisitions/second, bursts up to `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1.0, rate))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class _RateLimitedClient:
+    """Every method call on the wrapped client waits for a token and goes through the backoff."""
+
+    def __init__(self, client, bucket, backoff):
+        self._client = client
+        self._bucket = bucket
+        self._backoff = backoff
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            def attempt():
+                self._bucket.acquire()
+                return attr(*args, **kwargs)
+            return self._backoff.call(attempt)
+        return call
+
+
+class RemediationQueue:
+    """
+    Collects findings, coalesces them into actions, and runs them as one batch.
+
+    accounts - inventory accounts by id (load_inventory()); with a ClientPool
+               that has a SessionFactory, findings that carry one of these
+               accounts are remediated in it. Findings of any other account
+               are skipped.
+    """
+
+    def __init__(self, session, policy, settings=None, accounts=None):
+        settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+        self.session = session
+        self.policy = policy
+        self.accounts = accounts or {}
+        self.concurrency = int(settings["concurrency"])
+        self.rate_limits = dict(DEFAULT_SETTINGS["rate_limits"], **settings.get("rate_limits", {}))
+        self.coalesce_seconds = settings["coalesce_seconds"]
+        self._clients = {}          # (account id, service) -> rate-limited client
+        self._caches = {}           # account id -> InventoryCache of another account
+        self._lock = threading.Lock()
+        self._pending = {}          # (action, account, resource) -> [finding ids]
+        self._recent = {}           # (action, account, resource) -> monotonic time it last ran OK
+        self.skipped = 0
+
+    def _can_act_in(self, account):
+        """The home account (""), or an inventory account we can assume a role into."""
+        if not account:
+            return True
+        return account in self.accounts and getattr(self.session, "factory", None) is not None
+
+    def _client(self, service, account=""):
+        with self._lock:
+            key = (account, service)
+            if key not in self._clients:
+                session = self.session.for_account(self.accounts[account]) if account else self.session
+                raw = session.client(service, config=Config(max_pool_connections=max(10, self.concurrency)))
+                self._clients[key] = _RateLimitedClient(
+                    raw, TokenBucket(self.rate_limits.get(service, 5)), AdaptiveBackoff(name=service))
+            return self._clients[key]
+
+    def _cache(self, account):
+        """The home inventory cache, or a fresh in-memory one per other account (names repeat)."""
+        if not account:
+            return None
+        with self._lock:
+            if account not in self._caches:
+                self._caches[account] = InventoryCache(None, load_settings())
+            return self._caches[account]
+
+    def submit(self, findings):
+        """Queue the actions for `findings`. Returns how many new actions were queued."""
+        now = time.monotonic()
+        queued = 0
+        for finding in findings:
+            actions = plan_actions(finding, self.policy)
+            if actions and not self._can_act_in(finding.account):
+                self.skipped += 1
+                METRICS.inc("sentinel_remediation_skipped_total", reason="unknown_account")
+                print(f"[x] Skipping {finding.id}: account {finding.account} isn't in the inventory")
+                continue
+            for action in actions:
+                key = (action, finding.account, finding.resource)
+                done_at = self._recent.get(key)
+                if done_at is not None and now - done_at < self.coalesce_seconds:
+                    continue        # already handled this window
+                if key not in self._pending:
+                    self._pending[key] = []
+                    queued += 1
+                self._pending[key].append(finding.id)
+        METRICS.set("sentinel_queue_depth", len(self._pending), queue="remediation")
+        return queued
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _execute(self, action, account, resource):
+        service, fn = ACTIONS[action]
+        started = time.perf_counter()
+        try:
+            message = fn(self._client(service, account), resource, self._cache(account))
+            ok = True
+        except (ClientError, BotoCoreError) as e:      # one action failing never sinks the batch
+            message, ok = f"Error: {e}", False
+        return {"action": action, "account": account, "resource": resource, "ok": ok, "result": message,
+                "seconds": time.perf_counter() - started}
+
+    def run(self):
+        """Run every pending action concurrently. Returns one result dict per action."""
+        batch, self._pending = self._pending, {}
+        METRICS.set("sentinel_queue_depth", 0, queue="remediation")
+        if not batch:
+            return []
+        results = []
+        with METRICS.timer("responders.batch"), ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = {pool.submit(self._execute, *key): (key, ids) for key, ids in batch.items()}
+            for fut in as_completed(futures):
+                key, ids = futures[fut]
+                action, account, resource = key
+                result = fut.result()
+                result["findings"] = ids
+                results.append(result)
+                if result["ok"]:
+                    self._recent[key] = time.monotonic()
+                METRICS.inc("sentinel_remediation_actions_total", action=action,
+                            result="ok" if result["ok"] else "error")
+                mark = "+" if result["ok"] else "x"
+                where = f"{account}/{resource}" if account else resource
+                print(f"[{mark}] {action} {where}: {result['result']}")
+
+        # Forget coalescing entries that have aged out
+        cutoff = time.monotonic() - self.coalesce_seconds
+        self._recent = {k: t for k, t in self._recent.items() if t >= cutoff}
+        return results
+
+
+def save_batch_report(results, reports_dir=REPORTS_DIR):
+    """One markdown report for the whole batch."""
+    timestamp = datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
+    ok = sum(1 for r in results if r["ok"])
+
+    lines = ["# SynAccel Remediation Batch Report\n\n",
+             f"Generated: {timestamp}\n\n",
+             f"Actions: {len(results)} ({ok} succeeded, {len(results) - ok} failed)\n\n"]
+    if results:
+        lines += ["| Action | Account | Resource | Result | Seconds |\n", "|---|---|---|---|---|\n"]
+        for r in sorted(results, key=lambda r: (r["action"], r.get("account", ""), r["resource"])):
+            lines.append(f"| {r['action']} | {r.get('account') or 'home'} | {r['resource']} | {r['result']} "
+                         f"| {r['seconds']:.2f} |\n")
+    path = report_store(reports_dir).write("remediation_batch_report", "".join(lines))
+
+    print(f"[✓] Batch report saved to: {path}")
+    return path
+
+
+def _load_json(path, default):
+    if Path(path).exists():
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return default
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SynAccel remediation queue")
+    parser.add_argument("--profile", default="sentinel-automation", help="AWS profile to use")
+    args = parser.parse_args()
+
+    config = _load_json(CONFIG_PATH, {"policy": {}})
+    # Held for the whole run so two queue runs never act on the same findings
+    with FileLock(CURSOR_PATH.with_suffix(".lock")):
+        cursor = _load_json(CURSOR_PATH, {"offset": 0})
+        findings, offset = FindingsLog(FINDINGS_PATH).read_from(cursor["offset"])
+
+        settings = dict(DEFAULT_SETTINGS, **config.get("responders", {}))
+        base = create_aws_session(args.profile)
+        # Org-sweep findings are fixed in their own account, through the inventory's roles
+        inventory = load_inventory() if ACCOUNTS_PATH.exists() else {"accounts": []}
+        factory = SessionFactory.from_inventory(inventory, args.profile, base) if inventory["accounts"] else None
+        pool = ClientPool(base, factory=factory, concurrency=settings["concurrency"],
+                          settings=config.get("clients"))
+        q = RemediationQueue(pool, config.get("policy", {}), settings,
+                             accounts={a["id"]: a for a in inventory["accounts"]})
+        print(f"[i] {len(findings)} new findings -> {q.submit(findings)} actions")
+        with profile_run("remediation_queue"):
+            results = q.run()
+        if results:
+            save_batch_report(results)
+            pool.print_stats()
+
+        atomic_write_json(CURSOR_PATH, {"offset": offset})
+    inventory_cache().save()
+    METRICS.write_textfile("remediation_queue", config.get("metrics"))
@@ -1,7 +1,17 @@
-import boto3
 from botocore.exceptions import ClientError
 from datetime import datetime
-import os
+from pathlib import Path
+import sys
+
+# Make src/ importable when this file is run directly (python src/responders/...)
+SRC = Path(__file__).resolve().parents[1]
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from utils.clients import ClientPool
+from utils.inventory_cache import inventory_cache
+from utils.report_store import report_store
+from utils.sessions import create_aws_session
 
 
 def save_report(bucket_name, result):
@@ -9,25 +19,45 @@ def save_report(bucket_name, result):
     Saves a markdown report summarizing responder actions.
     """
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    report_dir = os.path.join(os.path.dirname(__file__), "../../reports/sample_output")
-    os.makedirs(report_dir, exist_ok=True)
-    report_path = os.path.join(report_dir, f"s3_responder_report_{timestamp}.md")
-
-    with open(report_path, "w") as f:
-        f.write(f"# SynAccel Responder Report\n\n")
-        f.write(f"Generated: {timestamp}\n\n")
-        f.write(f"Bucket: {bucket_name}\n\n")
-        f.write(f"Result: {result}\n")
-
-    print(f"[✓] Markdown report saved to: {os.path.abspath(report_path)}")
-
-
-def create_aws_session(profile_name="sentinel-automation"):
-    """
-    Creates an authenticated AWS session using the specified IAM profile.
-    """
-    session = boto3.Session(profile_name=profile_name)
-    return session
+    report_path = report_store().write("s3_responder_report", (
+        f"# SynAccel Responder Report\n\n"
+        f"Generated: {timestamp}\n\n"
+        f"Bucket: {bucket_name}\n\n"
+        f"Result: {result}\n"))
+
+    print(f"[✓] Markdown report saved to: {report_path}")
+
+
+PAB_ALL_ON = {
+    'BlockPublicAcls': True,
+    'IgnorePublicAcls': True,
+    'BlockPublicPolicy': True,
+    'RestrictPublicBuckets': True
+}
+
+
+def apply_public_access_block(s3, bucket_name, cache=None):
+    """Step 1: Block all public access. Raises ClientError on failure."""
+    s3.put_public_access_block(
+        Bucket=bucket_name,
+        PublicAccessBlockConfiguration=dict(PAB_ALL_ON)
+    )
+    # The cached config is out of date now; the next reader fetches it again
+    (cache or inventory_cache()).invalidate("bucket_config", bucket_name)
+    return "Public Access Block applied"
+
+
+def tag_bucket(s3, bucket_name, value='PublicAccessRemediated'):
+    """Step 2: Add a security tag. Raises ClientError on failure."""
+    s3.put_bucket_tagging(
+        Bucket=bucket_name,
+        Tagging={
+            'TagSet': [
+                {'Key': 'SynAccelFlagged', 'Value': value}
+            ]
+        }
+    )
+    return f"Tagged SynAccelFlagged:{value}"
 
 
 def lock_public_bucket(bucket_name, session):
@@ -37,27 +67,10 @@ def lock_public_bucket(bucket_name, session):
     s3 = session.client('s3')
 
     try:
-        # Step 1: Block all public access
-        s3.put_public_access_block(
-            Bucket=bucket_name,
-            PublicAccessBlockConfiguration={
-                'BlockPublicAcls': True,
-                'IgnorePublicAcls': True,
-                'BlockPublicPolicy': True,
-                'RestrictPublicBuckets': True
-            }
-        )
+        apply_public_access_block(s3, bucket_name)
         print(f"[+] Public Access Block applied to: {bucket_name}")
 
-        # Step 2: Add a security tag
-        s3.put_bucket_tagging(
-            Bucket=bucket_name,
-            Tagging={
-                'TagSet': [
-                    {'Key': 'SynAccelFlagged', 'Value': 'PublicAccessRemediated'}
-                ]
-            }
-        )
+        tag_bucket(s3, bucket_name)
         print(f"[+] Tagged {bucket_name} as SynAccelFlagged")
 
         # Save success report
@@ -71,9 +84,9 @@ def lock_public_bucket(bucket_name, session):
 
 
 if __name__ == "__main__":
-    session = create_aws_session()
+    pool = ClientPool(create_aws_session())
     # Example test bucket (replace with your target)
     bucket_to_fix = "synaccel-site"
-    lock_public_bucket(bucket_to_fix, session)
+    lock_public_bucket(bucket_to_fix, pool)
 
 
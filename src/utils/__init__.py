@@ -0,0 +1 @@
+"""Shared helpers used by Sentinel detectors, responders and the core loop."""
@@ -0,0 +1,431 @@
+"""
+Tiny in-process stand-ins for the AWS clients Sentinel uses.
+
+They only implement the handful of calls our detectors/responders make, and
+they raise real botocore ClientErrors so the error handling paths are the same
+as against AWS. Use them to benchmark or demo without credentials:
+
+    s3 = StubS3Client.synthetic(n_buckets=2000, latency=0.02)
+    findings = check_s3_public_access(StubSession(s3=s3), concurrency=32)
+"""
+import csv
+import io
+import json
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from botocore.exceptions import ClientError
+
+
+def _client_error(code, operation, message=""):
+    return ClientError({"Error": {"Code": code, "Message": message or code}}, operation)
+
+
+class _StubClient:
+    """Common bits: fake network latency, optional throttling, and call counting."""
+
+    def __init__(self, latency=0.0, throttle_rate=0.0, throttle_code="Throttling", seed=None):
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.throttle_code = throttle_code
+        self.calls = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _call(self, operation):
+        with self._lock:
+            self.calls[operation] += 1
+            throttled = self.throttle_rate and self._rng.random() < self.throttle_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if throttled:
+            raise _client_error(self.throttle_code, operation, "Rate exceeded")
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+
+class StubS3Client(_StubClient):
+    """
+    In-memory S3: bucket name -> {"acl": [...], "pab": {...} | None, "policy": str | None}.
+    Buckets may also hold "objects": {key: bytes} (e.g. CloudTrail log files).
+    """
+    PAGE_SIZE = 1000
+
+    def __init__(self, buckets=None, **kwargs):
+        super().__init__(throttle_code=kwargs.pop("throttle_code", "SlowDown"), **kwargs)
+        self.buckets = buckets if buckets is not None else {}
+
+    @classmethod
+    def synthetic(cls, n_buckets, public_ratio=0.1, seed=42, **kwargs):
+        """Build a stub with `n_buckets` buckets, roughly `public_ratio` of them exposed."""
+        rng = random.Random(seed)
+        buckets = {}
+        for i in range(n_buckets):
+            name = f"synthetic-bucket-{i:05d}"
+            public = rng.random() < public_ratio
+            acl = [{"Grantee": {"Type": "CanonicalUser", "ID": "owner"}, "Permission": "FULL_CONTROL"}]
+            pab = {
+                "BlockPublicAcls": True,
+                "IgnorePublicAcls": True,
+                "BlockPublicPolicy": True,
+                "RestrictPublicBuckets": True,
+            }
+            policy = None
+            if public:
+                kind = rng.choice(("acl", "policy", "pab"))
+                if kind == "acl":
+                    acl.append({"Grantee": {"Type": "Group",
+                                            "URI": "http://acs.amazonaws.com/groups/global/AllUsers"},
+                                "Permission": "READ"})
+                elif kind == "policy":
+                    policy = json.dumps({"Version": "2012-10-17", "Statement": [{
+                        "Effect": "Allow", "Principal": "*", "Action": "s3:GetObject",
+                        "Resource": f"arn:aws:s3:::{name}/*"}]})
+                else:
+                    pab = None if rng.random() < 0.5 else dict(pab, BlockPublicPolicy=False)
+            buckets[name] = {"acl": acl, "pab": pab, "policy": policy}
+        return cls(buckets=buckets, seed=seed, **kwargs)
+
+    def _bucket(self, operation, name):
+        self._call(operation)
+        if name not in self.buckets:
+            raise _client_error("NoSuchBucket", operation)
+        return self.buckets[name]
+
+    def list_buckets(self):
+        self._call("ListBuckets")
+        return {"Buckets": [{"Name": n} for n in self.buckets]}
+
+    def get_bucket_acl(self, Bucket):
+        return {"Grants": list(self._bucket("GetBucketAcl", Bucket)["acl"])}
+
+    def get_public_access_block(self, Bucket):
+        pab = self._bucket("GetPublicAccessBlock", Bucket)["pab"]
+        if pab is None:
+            raise _client_error("NoSuchPublicAccessBlockConfiguration", "GetPublicAccessBlock")
+        return {"PublicAccessBlockConfiguration": dict(pab)}
+
+    def get_bucket_policy(self, Bucket):
+        policy = self._bucket("GetBucketPolicy", Bucket)["policy"]
+        if policy is None:
+            raise _client_error("NoSuchBucketPolicy", "GetBucketPolicy")
+        return {"Policy": policy}
+
+    def put_public_access_block(self, Bucket, PublicAccessBlockConfiguration):
+        self._bucket("PutPublicAccessBlock", Bucket)["pab"] = dict(PublicAccessBlockConfiguration)
+        return {}
+
+    def put_bucket_tagging(self, Bucket, Tagging):
+        self._bucket("PutBucketTagging", Bucket)["tags"] = list(Tagging["TagSet"])
+        return {}
+
+    def put_object(self, Bucket, Key, Body):
+        self._bucket("PutObject", Bucket).setdefault("objects", {})[Key] = bytes(Body)
+        return {}
+
+    def get_object(self, Bucket, Key):
+        objects = self._bucket("GetObject", Bucket).get("objects", {})
+        if Key not in objects:
+            raise _client_error("NoSuchKey", "GetObject")
+        return {"Body": io.BytesIO(objects[Key]), "ContentLength": len(objects[Key])}
+
+    def get_paginator(self, operation_name):
+        if operation_name != "list_objects_v2":
+            raise ValueError(f"{type(self).__name__} has no '{operation_name}' paginator (supported: list_objects_v2)")
+
+        def items(Bucket, Prefix="", StartAfter="", Delimiter=None):
+            objects = self.buckets.get(Bucket, {}).get("objects", {})
+            listed, folders = [], set()
+            for k in sorted(objects):
+                if not k.startswith(Prefix) or k <= StartAfter:
+                    continue
+                cut = k.find(Delimiter, len(Prefix)) if Delimiter else -1
+                if cut < 0:
+                    listed.append({"Key": k, "Size": len(objects[k])})
+                elif k[:cut + 1] not in folders:
+                    folders.add(k[:cut + 1])
+                    listed.append({"Prefix": k[:cut + 1]})     # goes to CommonPrefixes
+            return listed
+        return _StubPaginator(self, "ListObjectsV2", "Contents", items, self.PAGE_SIZE)
+
+
+class _StubPaginator:
+    """Mimics a boto3 paginator: one counted call per page of `page_size` items."""
+
+    def __init__(self, client, operation, key, items, page_size):
+        self._client = client
+        self._operation = operation
+        self._key = key
+        self._items = items
+        self._page_size = page_size
+
+    def paginate(self, **kwargs):
+        items = self._items(**kwargs)
+        for start in range(0, max(len(items), 1), self._page_size):
+            self._client._call(self._operation)
+            chunk = items[start:start + self._page_size]
+            page = {self._key: [i for i in chunk if "Prefix" not in i],
+                    "IsTruncated": start + self._page_size < len(items)}
+            folders = [i for i in chunk if "Prefix" in i]
+            if folders:
+                page["CommonPrefixes"] = folders
+            yield page
+
+
+# Column order of the real IAM credential report (we only fill the ones we use)
+CREDENTIAL_REPORT_COLUMNS = [
+    "user", "arn", "user_creation_time", "password_enabled", "password_last_used",
+    "password_last_changed", "password_next_rotation", "mfa_active",
+    "access_key_1_active", "access_key_1_last_rotated", "access_key_1_last_used_date",
+    "access_key_1_last_used_region", "access_key_1_last_used_service",
+    "access_key_2_active", "access_key_2_last_rotated", "access_key_2_last_used_date",
+    "access_key_2_last_used_region", "access_key_2_last_used_service",
+    "cert_1_active", "cert_1_last_rotated", "cert_2_active", "cert_2_last_rotated",
+]
+
+
+class StubIAMClient(_StubClient):
+    """In-memory IAM: user name -> {"mfa": bool, "keys": [{"AccessKeyId", "CreateDate", "Status"}]}."""
+
+    PAGE_SIZE = 100  # list_users default MaxItems
+
+    def __init__(self, users=None, report_generation_polls=1, **kwargs):
+        super().__init__(**kwargs)
+        self.users = users if users is not None else {}
+        self.tags = {}
+        # How many generate_credential_report calls return STARTED before COMPLETE
+        self._report_polls_left = report_generation_polls
+
+    @classmethod
+    def synthetic(cls, n_users, no_mfa_ratio=0.2, old_key_ratio=0.2, seed=42, **kwargs):
+        """Build a stub with `n_users` users and a given mix of missing MFA / stale keys."""
+        rng = random.Random(seed)
+        now = datetime.now(timezone.utc)
+        users = {}
+        for i in range(n_users):
+            keys = []
+            for k in range(rng.choice((0, 1, 1, 2))):
+                age = rng.randint(91, 900) if rng.random() < old_key_ratio else rng.randint(0, 89)
+                keys.append({"AccessKeyId": f"AKIASYNTH{i:06d}{k}", "CreateDate": now - timedelta(days=age),
+                             "Status": "Active"})
+            users[f"synthetic-user-{i:05d}"] = {"mfa": rng.random() >= no_mfa_ratio, "keys": keys}
+        return cls(users=users, seed=seed, **kwargs)
+
+    def _user(self, operation, name):
+        self._call(operation)
+        if name not in self.users:
+            raise _client_error("NoSuchEntity", operation)
+        return self.users[name]
+
+    def get_paginator(self, operation_name):
+        if operation_name != "list_users":
+            raise ValueError(f"{type(self).__name__} has no '{operation_name}' paginator (supported: list_users)")
+        return _StubPaginator(self, "ListUsers", "Users",
+                              lambda **_: [{"UserName": n} for n in self.users], self.PAGE_SIZE)
+
+    def list_users(self):
+        # Like AWS: only the first page unless you paginate
+        self._call("ListUsers")
+        names = list(self.users)
+        return {"Users": [{"UserName": n} for n in names[:self.PAGE_SIZE]],
+                "IsTruncated": len(names) > self.PAGE_SIZE}
+
+    def list_mfa_devices(self, UserName):
+        mfa = self._user("ListMFADevices", UserName)["mfa"]
+        return {"MFADevices": [{"UserName": UserName, "SerialNumber": f"arn:aws:iam::000000000000:mfa/{UserName}"}]
+                if mfa else []}
+
+    def list_access_keys(self, UserName):
+        keys = self._user("ListAccessKeys", UserName)["keys"]
+        return {"AccessKeyMetadata": [dict(k, UserName=UserName) for k in keys]}
+
+    def tag_user(self, UserName, Tags):
+        self._user("TagUser", UserName)
+        self.tags.setdefault(UserName, {}).update({t["Key"]: t["Value"] for t in Tags})
+        return {}
+
+    def update_access_key(self, UserName, AccessKeyId, Status):
+        for key in self._user("UpdateAccessKey", UserName)["keys"]:
+            if key["AccessKeyId"] == AccessKeyId:
+                key["Status"] = Status
+                return {}
+        raise _client_error("NoSuchEntity", "UpdateAccessKey")
+
+    def generate_credential_report(self):
+        self._call("GenerateCredentialReport")
+        if self._report_polls_left > 0:
+            self._report_polls_left -= 1
+            return {"State": "STARTED"}
+        return {"State": "COMPLETE"}
+
+    def get_credential_report(self):
+        self._call("GetCredentialReport")
+        if self._report_polls_left > 0:
+            raise _client_error("ReportInProgress", "GetCredentialReport")
+        buf = io.StringIO()
+        writer = csv.writer(buf, lineterminator="\n")
+        writer.writerow(CREDENTIAL_REPORT_COLUMNS)
+        writer.writerow(["<root_account>", "arn:aws:iam::000000000000:root"] + ["N/A"] * 5
+                        + ["true"] + ["N/A"] * 14)
+        for name, u in self.users.items():
+            row = dict.fromkeys(CREDENTIAL_REPORT_COLUMNS, "N/A")
+            row.update(user=name, arn=f"arn:aws:iam::000000000000:user/{name}",
+                       mfa_active=str(u["mfa"]).lower())
+            for n in (1, 2):
+                if len(u["keys"]) >= n:
+                    key = u["keys"][n - 1]
+                    row[f"access_key_{n}_active"] = str(key["Status"] == "Active").lower()
+                    row[f"access_key_{n}_last_rotated"] = key["CreateDate"].isoformat()
+                else:
+                    row[f"access_key_{n}_active"] = "false"
+            writer.writerow([row[c] for c in CREDENTIAL_REPORT_COLUMNS])
+        return {"Content": buf.getvalue().encode("utf-8"), "ReportFormat": "text/csv",
+                "GeneratedTime": datetime.now(timezone.utc)}
+
+
+# (Type, ResourceType, severity score) of the synthetic GuardDuty findings
+GUARDDUTY_TYPES = [
+    ("UnauthorizedAccess:IAMUser/InstanceCredentialExfiltration.OutsideAWS", "AccessKey", 8.0),
+    ("CredentialAccess:IAMUser/AnomalousBehavior", "AccessKey", 5.0),
+    ("Recon:IAMUser/MaliciousIPCaller", "AccessKey", 5.0),
+    ("Policy:S3/BucketBlockPublicAccessDisabled", "S3Bucket", 2.0),
+    ("Exfiltration:S3/AnomalousBehavior", "S3Bucket", 8.0),
+    ("Recon:EC2/PortProbeUnprotectedPort", "Instance", 2.0),
+    ("CryptoCurrency:EC2/BitcoinTool.B!DNS", "Instance", 8.0),
+    ("AttackSequence:IAM/CompromisedCredentials", "AccessKey", 9.0),
+]
+
+
+def _gd_time(dt):
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.") + f"{dt.microsecond // 1000:03d}Z"
+
+
+class StubGuardDutyClient(_StubClient):
+    """
+    In-memory GuardDuty for one region: detector id -> {finding id: finding}.
+    list_findings understands the updatedAt / service.archived criteria and
+    sorting that ingestion uses; both it and get_findings enforce the API's
+    50-per-call limit.
+    """
+    MAX_RESULTS = 50
+
+    def __init__(self, detectors=None, region="us-east-1", **kwargs):
+        super().__init__(throttle_code=kwargs.pop("throttle_code", "TooManyRequestsException"), **kwargs)
+        self.region = region
+        self.detectors = detectors if detectors is not None else {}
+        self._serial = 0
+
+    @classmethod
+    def synthetic(cls, n_findings, n_detectors=1, region="us-east-1", hours=24, seed=42, **kwargs):
+        """A stub whose detectors hold `n_findings` findings updated over the last `hours`."""
+        stub = cls(detectors={f"synth{region.replace('-', '')}{d}": {} for d in range(n_detectors)},
+                   region=region, seed=seed, **kwargs)
+        rng = random.Random(seed)
+        now = datetime.now(timezone.utc)
+        for i in range(n_findings):
+            stub.add_finding(detector_id=sorted(stub.detectors)[i % n_detectors],
+                             updated=now - timedelta(seconds=rng.uniform(0, hours * 3600)), rng=rng)
+        return stub
+
+    def add_finding(self, detector_id=None, updated=None, rng=None):
+        """Create one new finding (random type and resource). Returns it."""
+        rng = rng or self._rng
+        detector_id = detector_id or sorted(self.detectors)[0]
+        updated = updated or datetime.now(timezone.utc)
+        finding_type, resource_type, score = rng.choice(GUARDDUTY_TYPES)
+        self._serial += 1
+        finding_id = f"{self._serial:08x}{rng.getrandbits(64):016x}"
+        n = rng.randint(0, 49)
+        resource = {"ResourceType": resource_type}
+        if resource_type == "AccessKey":
+            resource["AccessKeyDetails"] = {"UserName": f"synthetic-user-{n:05d}", "AccessKeyId": f"AKIASYNTH{n:06d}0"}
+        elif resource_type == "S3Bucket":
+            resource["S3BucketDetails"] = [{"Name": f"synthetic-bucket-{n:05d}"}]
+        else:
+            resource["InstanceDetails"] = {"InstanceId": f"i-{n:017x}"}
+        finding = {
+            "Id": finding_id, "AccountId": "000000000000", "Region": self.region,
+            "Arn": f"arn:aws:guardduty:{self.region}:000000000000:detector/{detector_id}/finding/{finding_id}",
+            "Type": finding_type, "Title": finding_type.split("/")[-1], "Severity": score,
+            "CreatedAt": _gd_time(updated), "UpdatedAt": _gd_time(updated), "Resource": resource,
+            "Service": {"Count": 1, "Archived": False, "DetectorId": detector_id,
+                        "EventFirstSeen": _gd_time(updated), "EventLastSeen": _gd_time(updated)},
+        }
+        self.detectors[detector_id][finding_id] = finding
+        return finding
+
+    def recur(self, finding_id, updated=None):
+        """The activity behind a finding happened again: Count + 1 and a new UpdatedAt."""
+        updated = _gd_time(updated or datetime.now(timezone.utc))
+        for findings in self.detectors.values():
+            if finding_id in findings:
+                finding = findings[finding_id]
+                finding["UpdatedAt"] = finding["Service"]["EventLastSeen"] = updated
+                finding["Service"]["Count"] += 1
+                return finding
+        raise KeyError(finding_id)
+
+    def _detector(self, operation, detector_id):
+        self._call(operation)
+        if detector_id not in self.detectors:
+            raise _client_error("BadRequestException", operation, f"detector {detector_id} not found")
+        return self.detectors[detector_id]
+
+    def list_detectors(self, MaxResults=50, NextToken=None):
+        self._call("ListDetectors")
+        return {"DetectorIds": sorted(self.detectors)}
+
+    def list_findings(self, DetectorId, FindingCriteria=None, SortCriteria=None, MaxResults=50, NextToken=None):
+        findings = self._detector("ListFindings", DetectorId)
+        if MaxResults > self.MAX_RESULTS:
+            raise _client_error("BadRequestException", "ListFindings", "MaxResults must be <= 50")
+        criteria = (FindingCriteria or {}).get("Criterion", {})
+        since = criteria.get("updatedAt", {}).get("GreaterThanOrEqual", criteria.get("updatedAt", {}).get("Gte"))
+        archived = criteria.get("service.archived", {}).get("Eq")
+        matches = []
+        for f in findings.values():
+            updated = datetime.fromisoformat(f["UpdatedAt"].replace("Z", "+00:00")).timestamp() * 1000
+            if since is not None and updated < since:
+                continue
+            if archived is not None and str(f["Service"]["Archived"]).lower() not in archived:
+                continue
+            matches.append((f["UpdatedAt"], f["Id"]))
+        reverse = (SortCriteria or {}).get("OrderBy") == "DESC"
+        matches.sort(reverse=reverse)
+        start = int(NextToken or 0)
+        page = matches[start:start + MaxResults]
+        out = {"FindingIds": [finding_id for _, finding_id in page]}
+        if start + MaxResults < len(matches):
+            out["NextToken"] = str(start + MaxResults)
+        return out
+
+    def get_findings(self, DetectorId, FindingIds, SortCriteria=None):
+        findings = self._detector("GetFindings", DetectorId)
+        if len(FindingIds) > self.MAX_RESULTS:
+            raise _client_error("BadRequestException", "GetFindings", "FindingIds must have at most 50 items")
+        return {"Findings": [json.loads(json.dumps(findings[i])) for i in FindingIds if i in findings]}
+
+
+class StubSession:
+    """
+    Quacks like boto3.Session for `session.client(name)` and hands back our stubs.
+    A client may also be given per region, as {region_name: stub}.
+    """
+
+    def __init__(self, region_name="us-east-1", **clients):
+        self.region_name = region_name
+        self._clients = clients
+
+    def client(self, service_name, region_name=None, **kwargs):
+        try:
+            client = self._clients[service_name]
+            if isinstance(client, dict):
+                client = client[region_name or self.region_name]
+            return client
+        except KeyError:
+            raise ValueError(f"StubSession has no '{service_name}' client for {region_name or self.region_name}") from None
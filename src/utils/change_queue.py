@@ -0,0 +1,158 @@
+"""
+Queues of configuration-change notifications (EventBridge -> SQS style).
+
+Every queue has the same small interface:
+
+    messages = q.receive(max_messages=10, wait_seconds=5)   # [Message(id, body, receipt)]
+    ...handle them...
+    q.delete(messages)                                      # acknowledge
+
+Delivery is at-least-once: a message that isn't deleted comes back (after
+the SQS visibility timeout, or on the next start for the file queue), so
+consumers acknowledge only after their results are safely written.
+
+- MemoryQueue  - in-process, for tests and demos
+- FileQueue    - a JSONL spool file plus a saved cursor; `send()` appends
+- SQSQueue     - a real SQS queue (long polling, batch deletes)
+
+open_queue("memory:" | "file:state/changes.jsonl" | "sqs:https://sqs...") picks one.
+"""
+import json
+import os
+import queue
+import time
+from collections import namedtuple
+from pathlib import Path
+
+from utils.storage import FileLock, atomic_write_json, read_json
+
+Message = namedtuple("Message", "id body receipt")
+
+
+class MemoryQueue:
+    """In-process queue. `send(body)` takes a dict (the decoded event)."""
+
+    def __init__(self):
+        self._q = queue.Queue()
+        self._next_id = 0
+
+    def send(self, body):
+        self._next_id += 1
+        self._q.put(Message(str(self._next_id), body, None))
+
+    def receive(self, max_messages=10, wait_seconds=0):
+        try:
+            first = self._q.get(timeout=wait_seconds) if wait_seconds else self._q.get_nowait()
+        except queue.Empty:
+            return []
+        out = [first]
+        while len(out) < max_messages:
+            try:
+                out.append(self._q.get_nowait())
+            except queue.Empty:
+                break
+        return out
+
+    def delete(self, messages):
+        pass    # received is gone; nothing to acknowledge in memory
+
+    def __len__(self):
+        return self._q.qsize()
+
+
+class FileQueue:
+    """
+    JSONL spool file: producers append one JSON event per line, the consumer
+    keeps its byte offset in `<path>.cursor`. The cursor only moves on
+    delete(), so whatever wasn't acknowledged is read again after a restart.
+    """
+
+    def __init__(self, path, poll_interval=0.5):
+        self.path = Path(path)
+        self.cursor_path = self.path.with_suffix(self.path.suffix + ".cursor")
+        self.poll_interval = poll_interval
+        self._read_offset = read_json(self.cursor_path, {"offset": 0})["offset"]
+
+    def send(self, body):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        line = json.dumps(body, separators=(",", ":")) + "\n"
+        with FileLock(self.path.with_suffix(self.path.suffix + ".lock")):
+            with open(self.path, "ab") as f:
+                f.write(line.encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _read(self, max_messages):
+        if not self.path.exists():
+            return []
+        out = []
+        with open(self.path, "rb") as f:
+            f.seek(self._read_offset)
+            while len(out) < max_messages:
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    break       # nothing more, or a write still in progress
+                end = f.tell()
+                if line.strip():
+                    try:
+                        out.append(Message(str(end), json.loads(line), end))
+                    except ValueError as e:
+                        print(f"[x] Skipping malformed change event: {e}")
+                self._read_offset = end
+        return out
+
+    def receive(self, max_messages=10, wait_seconds=0):
+        deadline = time.monotonic() + wait_seconds
+        while True:
+            messages = self._read(max_messages)
+            if messages or time.monotonic() >= deadline:
+                return messages
+            time.sleep(self.poll_interval)
+
+    def delete(self, messages):
+        """Acknowledge `messages` (moves the saved cursor past the last one)."""
+        if messages:
+            atomic_write_json(self.cursor_path, {"offset": max(m.receipt for m in messages)})
+
+
+class SQSQueue:
+    """An SQS queue via a boto3 (or ClientPool) SQS client. Bodies are decoded as JSON."""
+
+    def __init__(self, sqs, url):
+        self.sqs = sqs
+        self.url = url
+
+    def receive(self, max_messages=10, wait_seconds=0):
+        response = self.sqs.receive_message(QueueUrl=self.url, MaxNumberOfMessages=min(10, max_messages),
+                                            WaitTimeSeconds=min(20, int(wait_seconds)))
+        out = []
+        for m in response.get("Messages", []):
+            try:
+                body = json.loads(m["Body"])
+            except ValueError:
+                print(f"[x] Skipping non-JSON message {m['MessageId']}")
+                body = None
+            out.append(Message(m["MessageId"], body, m["ReceiptHandle"]))
+        return out
+
+    def delete(self, messages):
+        for i in range(0, len(messages), 10):
+            entries = [{"Id": str(n), "ReceiptHandle": m.receipt} for n, m in enumerate(messages[i:i + 10])]
+            failed = self.sqs.delete_message_batch(QueueUrl=self.url, Entries=entries).get("Failed", [])
+            for f in failed:
+                print(f"[x] Could not delete message: {f.get('Message', f.get('Code'))}")
+
+
+def open_queue(spec, session=None):
+    """Queue for a spec: "memory:", "file:<path>" or "sqs:<queue url>" (a bare https://sqs... URL works too)."""
+    kind, _, target = spec.partition(":")
+    if kind == "memory":
+        return MemoryQueue()
+    if kind == "file":
+        return FileQueue(target)
+    if kind == "sqs" or spec.startswith("https://sqs."):
+        url = target if kind == "sqs" else spec
+        if session is None:
+            raise ValueError("an SQS queue needs an AWS session")
+        return SQSQueue(session.client("sqs"), url)
+    raise ValueError(f"unknown change queue: {spec!r} (use memory:, file:<path> or sqs:<url>)")
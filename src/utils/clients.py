@@ -0,0 +1,272 @@
+"""
+Shared, cached AWS clients.
+
+Creating a boto3 client is expensive (endpoint and model loading, then a
+fresh TLS handshake on its first calls), and botocore's defaults - a 10
+connection pool, "legacy" retries, 60s timeouts - are tuned for one caller,
+not a thread pool. `ClientPool` creates one client per (account, region,
+service) for the life of the process, with:
+
+- the connection pool sized to the scan concurrency
+- adaptive retry mode (client-side rate limiting when AWS starts throttling)
+- explicit connect/read timeouts
+- per-service call, error and retry counts plus a latency histogram
+
+A pool quacks like a boto3 Session (`pool.client("s3")`), so detectors and
+responders take one wherever they took a session:
+
+    pool = ClientPool(create_aws_session(), concurrency=16)
+    findings = check_s3_public_access(pool, concurrency=16)
+    print(pool.stats()["s3"]["latency_ms"])
+
+With a SessionFactory it serves every account of the inventory:
+`pool.for_account(account, region)` is a session-like view on that account.
+"""
+import bisect
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from utils.metrics import METRICS
+
+# Used when sentinel_config.json has no "clients" section
+DEFAULT_SETTINGS = {
+    "connect_timeout": 5,
+    "read_timeout": 30,
+    "retry_mode": "adaptive",
+    "max_attempts": 5,
+}
+
+# Upper bounds (ms) of the latency histogram buckets; the last catches everything slower
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float("inf"))
+
+# Rebuild a client this long before its assumed-role credentials expire
+EXPIRY_MARGIN = timedelta(minutes=5)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram. Not thread-safe on its own (ServiceStats locks)."""
+
+    def __init__(self, bounds_ms=LATENCY_BUCKETS_MS):
+        self.bounds_ms = tuple(bounds_ms)
+        self.counts = [0] * len(self.bounds_ms)
+        self.total = 0
+        self.sum_ms = 0.0
+
+    def observe(self, seconds):
+        ms = seconds * 1000.0
+        self.counts[bisect.bisect_left(self.bounds_ms, ms)] += 1
+        self.total += 1
+        self.sum_ms += ms
+
+    def percentile(self, p):
+        """Upper bound (ms) of the bucket holding the p-th percentile (0 < p <= 100)."""
+        if not self.total:
+            return 0.0
+        rank = self.total * p / 100.0
+        seen = 0
+        for bound, count in zip(self.bounds_ms, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.bounds_ms[-1]
+
+    def to_dict(self):
+        return {
+            "count": self.total,
+            "mean": round(self.sum_ms / self.total, 2) if self.total else 0.0,
+            "p50": self.percentile(50), "p90": self.percentile(90), "p99": self.percentile(99),
+            "buckets": {("+Inf" if b == float("inf") else str(b)): c
+                        for b, c in zip(self.bounds_ms, self.counts)},
+        }
+
+
+class ServiceStats:
+    """
+    Call/error/retry counts and latency for one service. Thread-safe.
+    Every call is also recorded in the process-wide METRICS for export.
+    """
+
+    def __init__(self, service=""):
+        self.service = service
+        self.calls = Counter()      # operation -> calls
+        self.errors = Counter()     # error code -> count
+        self.retries = 0
+        self.latency = LatencyHistogram()
+        self._lock = threading.Lock()
+
+    def record(self, operation, seconds, error=None, retries=0):
+        with self._lock:
+            self.calls[operation] += 1
+            if error:
+                self.errors[error] += 1
+            self.retries += retries
+            self.latency.observe(seconds)
+        METRICS.inc("sentinel_api_calls_total", service=self.service, operation=operation)
+        METRICS.observe_latency("sentinel_api_call_seconds", seconds, service=self.service)
+        if error:
+            METRICS.inc("sentinel_api_errors_total", service=self.service, code=error)
+        if retries:
+            METRICS.inc("sentinel_api_retries_total", retries, service=self.service)
+
+    def to_dict(self):
+        with self._lock:
+            return {"calls": sum(self.calls.values()), "errors": sum(self.errors.values()),
+                    "retries": self.retries, "by_operation": dict(self.calls),
+                    "by_error": dict(self.errors), "latency_ms": self.latency.to_dict()}
+
+
+class _TimedClient:
+    """
+    Timing proxy for clients without botocore's event system (our stubs).
+    Real botocore clients are instrumented through events instead, which
+    also sees the calls paginators and waiters make.
+    """
+
+    def __init__(self, client, stats):
+        self._client = client
+        self._stats = stats
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr) or name in ("get_paginator", "get_waiter", "can_paginate"):
+            return attr
+
+        def call(*args, **kwargs):
+            started = time.perf_counter()
+            error = None
+            try:
+                return attr(*args, **kwargs)
+            except ClientError as e:
+                error = e.response.get("Error", {}).get("Code", "ClientError")
+                raise
+            finally:
+                self._stats.record(name, time.perf_counter() - started, error)
+        return call
+
+
+class _AccountView:
+    """Session-like view of a ClientPool for one inventory account."""
+
+    def __init__(self, pool, account, region_name=None):
+        self._pool = pool
+        self.account = account
+        self.region_name = region_name
+
+    def client(self, service_name, region_name=None, **kwargs):
+        return self._pool.client(service_name, region_name or self.region_name,
+                                 account=self.account, **kwargs)
+
+
+class ClientPool:
+    """
+    One cached, instrumented client per (account, region, service). Thread-safe.
+
+    session     - base boto3 Session, used when no account is given
+    factory     - optional SessionFactory for inventory accounts
+    concurrency - threads that will share each client; sizes the connection pool
+    settings    - the "clients" section of sentinel_config.json
+    """
+
+    def __init__(self, session=None, factory=None, concurrency=10, settings=None):
+        settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+        self.session = session
+        self.factory = factory
+        self.max_pool_connections = max(10, int(concurrency))
+        self.config = Config(
+            max_pool_connections=self.max_pool_connections,
+            connect_timeout=settings["connect_timeout"],
+            read_timeout=settings["read_timeout"],
+            retries={"mode": settings["retry_mode"], "max_attempts": settings["max_attempts"]},
+        )
+        self._clients = {}      # (account id, region, service) -> (client, expires_at | None)
+        self._stats = {}        # service -> ServiceStats
+        self._lock = threading.Lock()
+        self.clients_created = 0
+
+    def for_account(self, account, region_name=None):
+        return _AccountView(self, account, region_name)
+
+    def _session_for(self, account, region_name):
+        if account is not None and self.factory is not None:
+            return self.factory.session_for(account, region_name)
+        return self.session
+
+    def _expires_at(self, account):
+        # Clients built on assumed-role credentials stop working when they expire
+        if account is None or not hasattr(self.factory, "expiration"):
+            return None
+        return self.factory.expiration(account)
+
+    def client(self, service_name, region_name=None, config=None, account=None, **kwargs):
+        """
+        The shared client for (account, region, service), created on first use.
+        A caller's `config` is merged over the pool's on creation, except
+        that the connection pool never shrinks below the pool's size.
+        """
+        key = (account["id"] if account else "", region_name, service_name)
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry is not None:
+                client, expires_at = entry
+                if expires_at is None or expires_at - datetime.now(timezone.utc) > EXPIRY_MARGIN:
+                    return client
+
+            merged = self.config if config is None else self.config.merge(config)
+            if (merged.max_pool_connections or 0) < self.max_pool_connections:
+                merged = merged.merge(Config(max_pool_connections=self.max_pool_connections))
+            # boto3 Sessions aren't thread-safe, so creation stays under the lock
+            session = self._session_for(account, region_name)
+            raw = session.client(service_name, region_name=region_name, config=merged, **kwargs)
+            client = self._instrument(raw, service_name)
+            self._clients[key] = (client, self._expires_at(account))
+            self.clients_created += 1
+            return client
+
+    def _service_stats(self, service_name):
+        if service_name not in self._stats:
+            self._stats[service_name] = ServiceStats(service_name)
+        return self._stats[service_name]
+
+    def _instrument(self, client, service_name):
+        stats = self._service_stats(service_name)
+        events = getattr(getattr(client, "meta", None), "events", None)
+        if events is None:
+            return _TimedClient(client, stats)
+
+        def before_call(context, **_):
+            context["sentinel_started"] = time.perf_counter()
+
+        def after_call(model, context, parsed=None, http_response=None, **_):
+            parsed = parsed or {}
+            error = None
+            if http_response is not None and http_response.status_code >= 300:
+                error = parsed.get("Error", {}).get("Code", str(http_response.status_code))
+            retries = parsed.get("ResponseMetadata", {}).get("RetryAttempts", 0)
+            elapsed = time.perf_counter() - context.pop("sentinel_started", time.perf_counter())
+            stats.record(model.name, elapsed, error, retries)
+
+        def after_call_error(model, context, exception, **_):
+            elapsed = time.perf_counter() - context.pop("sentinel_started", time.perf_counter())
+            stats.record(model.name, elapsed, type(exception).__name__)
+
+        events.register_first("before-call.*.*", before_call)   # ahead of anything that short-circuits the call
+        events.register("after-call", after_call)
+        events.register("after-call-error", after_call_error)
+        return client
+
+    def stats(self):
+        """Per-service call counts, error codes, retries and latency (ms)."""
+        with self._lock:
+            services = dict(self._stats)
+        return {name: s.to_dict() for name, s in services.items()}
+
+    def print_stats(self):
+        for name, s in sorted(self.stats().items()):
+            lat = s["latency_ms"]
+            print(f"[i] {name}: {s['calls']} calls, {s['errors']} errors, {s['retries']} retries, "
+                  f"p50 {lat['p50']}ms p99 {lat['p99']}ms")
@@ -0,0 +1,128 @@
+"""
+Time-bucketed sliding-window counters.
+
+SlidingWindowCounter keeps, per event type, a ring of fixed-width time
+buckets covering the retention period plus a running total for each query
+window. Inserting an event and reading a window total are both O(1)
+(advancing the clock is O(buckets that expired), amortized O(1)), and the
+memory per type is fixed no matter how many events arrive.
+
+The counter serializes to a small JSON-able dict so the core can keep it in
+state/sentinel_state.json instead of a growing list of events (the dedup
+index lives in the SQLite event store, see utils/event_store.py).
+"""
+class SlidingWindowCounter:
+    """
+    Counts events per type over sliding windows (e.g. 24h) using ring buckets.
+
+    bucket_seconds   - width of one bucket (60 = per-minute resolution)
+    retention_seconds- how far back we keep buckets at all
+    windows          - window sizes (seconds) we can answer in O(1)
+    """
+
+    def __init__(self, bucket_seconds=60, retention_seconds=48 * 3600, windows=(24 * 3600,)):
+        self.bucket_seconds = int(bucket_seconds)
+        self.n_buckets = max(1, int(retention_seconds) // self.bucket_seconds)
+        self.windows = tuple(int(w) for w in windows)
+        for w in self.windows:
+            if w // self.bucket_seconds > self.n_buckets:
+                raise ValueError(f"window {w}s is longer than retention")
+        self.head = None        # id of the newest bucket (epoch // bucket_seconds)
+        self._rings = {}        # type -> list of counts, indexed by bucket id % n_buckets
+        self._totals = {}       # type -> {window: running total}
+
+    def _bucket(self, ts):
+        return int(ts) // self.bucket_seconds
+
+    def _ring(self, event_type):
+        ring = self._rings.get(event_type)
+        if ring is None:
+            ring = self._rings[event_type] = [0] * self.n_buckets
+            self._totals[event_type] = dict.fromkeys(self.windows, 0)
+        return ring
+
+    def advance(self, now):
+        """Move the clock to `now` (epoch seconds), expiring buckets that slid out."""
+        b = self._bucket(now)
+        if self.head is None:
+            self.head = b
+            return
+        steps = b - self.head
+        if steps <= 0:
+            return
+        if steps >= self.n_buckets:
+            # Everything expired; cheaper to start over than to walk the ring
+            for event_type in self._rings:
+                self._rings[event_type] = [0] * self.n_buckets
+                self._totals[event_type] = dict.fromkeys(self.windows, 0)
+            self.head = b
+            return
+        for event_type, ring in self._rings.items():
+            totals = self._totals[event_type]
+            for new in range(self.head + 1, b + 1):
+                for w in self.windows:
+                    k = w // self.bucket_seconds
+                    totals[w] -= ring[(new - k) % self.n_buckets]
+                ring[new % self.n_buckets] = 0     # slot is reused for the new bucket
+        self.head = b
+
+    def add(self, event_type, ts, n=1):
+        """Count `n` events of `event_type` at epoch `ts`. Events older than retention are ignored."""
+        b = self._bucket(ts)
+        if self.head is None or b > self.head:
+            self.advance(ts)
+        age = self.head - b
+        if age >= self.n_buckets:
+            return False
+        ring = self._ring(event_type)
+        ring[b % self.n_buckets] += n
+        totals = self._totals[event_type]
+        for w in self.windows:
+            if age < w // self.bucket_seconds:
+                totals[w] += n
+        return True
+
+    def count(self, event_type, window):
+        """Events of `event_type` in the last `window` seconds (must be one of `windows`)."""
+        totals = self._totals.get(event_type)
+        return totals[window] if totals else 0
+
+    def types(self):
+        return list(self._rings)
+
+    def to_dict(self):
+        """Sparse form: only non-empty buckets, as [bucket_id, count] pairs."""
+        types = {}
+        if self.head is not None:
+            pos = self.head % self.n_buckets
+            for event_type, ring in self._rings.items():
+                # Newest bucket first: ring[pos], ring[pos - 1], ..., wrapping around
+                newest_first = ring[pos::-1] + ring[:pos:-1]
+                pairs = [[self.head - age, c] for age, c in enumerate(newest_first) if c]
+                if pairs:
+                    types[event_type] = pairs
+        return {"bucket_seconds": self.bucket_seconds,
+                "retention_seconds": self.n_buckets * self.bucket_seconds,
+                "windows": list(self.windows), "head": self.head, "types": types}
+
+    @classmethod
+    def from_dict(cls, d, **defaults):
+        """Rebuild from to_dict() output; `defaults` are used when `d` is empty."""
+        if not d:
+            return cls(**defaults)
+        counter = cls(d["bucket_seconds"], d["retention_seconds"], d["windows"])
+        counter.head = d["head"]
+        spans = [(w, w // counter.bucket_seconds) for w in counter.windows]
+        for event_type, pairs in d["types"].items():
+            ring = counter._ring(event_type)
+            totals = counter._totals[event_type]
+            for b, c in pairs:
+                # Same as add(), minus the clock checks: saved buckets are never ahead of head
+                age = counter.head - b
+                if not 0 <= age < counter.n_buckets:
+                    continue
+                ring[b % counter.n_buckets] += c
+                for w, k in spans:
+                    if age < k:
+                        totals[w] += c
+        return counter
@@ -0,0 +1,142 @@
+"""
+SQLite-backed event store: the core's dedup memory and event history.
+
+Every event the core counts is one row keyed by an 8-byte hash of
+"type|id", indexed on (type, ts). Saving a run writes only that run's rows,
+so the cost follows the delta instead of the whole history (the dedup index
+used to be rewritten into sentinel_state.json on every run). Window queries
+such as "S3_PUBLIC events in the last 24h" are index range scans.
+
+SQLite runs in WAL mode, so detector, engine and core processes can read
+while one of them writes. Writes stay inside a transaction until commit(),
+which lets the core save its JSON state first and then commit the events.
+
+The store belongs to one state file: both carry the same epoch, and the
+core clears the store when the state it loads has a different one (or was
+reset by hand), so stale dedup rows never hide a fresh state's events.
+"""
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    key      BLOB PRIMARY KEY,   -- blake2b-64 of "type|id"
+    type     TEXT NOT NULL,
+    ts       REAL NOT NULL,      -- when the event happened (epoch seconds)
+    seen     REAL NOT NULL,      -- when the core counted it (dedup TTL runs from here)
+    resource TEXT,
+    severity TEXT,
+    detector TEXT
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS events_type_ts ON events (type, ts);
+CREATE INDEX IF NOT EXISTS events_seen ON events (seen);
+CREATE TABLE IF NOT EXISTS meta (
+    name  TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# A row that's older than the dedup TTL is counted again if the event comes back
+UPSERT = """
+INSERT INTO events (key, type, ts, seen, resource, severity, detector)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET
+    type = excluded.type, ts = excluded.ts, seen = excluded.seen,
+    resource = excluded.resource, severity = excluded.severity, detector = excluded.detector
+WHERE events.seen < ?
+"""
+
+
+def event_key(key):
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+
+
+class EventStore:
+    """
+    dedup_ttl_seconds - how long a counted event blocks the same key
+    retention_seconds - rows older than this (by `seen`) are pruned
+    Use ":memory:" as `path` for a throwaway store (e.g. replays).
+    """
+
+    def __init__(self, path, dedup_ttl_seconds=48 * 3600, retention_seconds=30 * 86400):
+        if str(path) != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.dedup_ttl_seconds = dedup_ttl_seconds
+        self.retention_seconds = retention_seconds
+        self._db = sqlite3.connect(str(path), timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def _begin(self):
+        if not self._db.in_transaction:
+            self._db.execute("BEGIN IMMEDIATE")
+
+    def add(self, key, event_type, ts, now, resource=None, severity=None, detector=None):
+        """Record an event. True if it's new (or its last sighting aged out), False if a duplicate."""
+        with self._lock:
+            self._begin()
+            cur = self._db.execute(UPSERT, (event_key(key), event_type, ts, now, resource, severity,
+                                            detector, now - self.dedup_ttl_seconds))
+            return cur.rowcount == 1
+
+    def epoch(self):
+        """Epoch of the state these events were counted for, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE name = 'epoch'").fetchone()
+        return row[0] if row else None
+
+    def set_epoch(self, epoch, clear=False):
+        """Tag the store with `epoch`; with `clear`, forget every event first. Part of the current transaction."""
+        with self._lock:
+            self._begin()
+            if clear:
+                self._db.execute("DELETE FROM events")
+            self._db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('epoch', ?)", (epoch,))
+
+    def prune(self, now):
+        """Drop rows past retention. Returns how many were removed."""
+        with self._lock:
+            self._begin()
+            return self._db.execute("DELETE FROM events WHERE seen < ?",
+                                    (now - self.retention_seconds,)).rowcount
+
+    def commit(self):
+        with self._lock:
+            if self._db.in_transaction:
+                self._db.execute("COMMIT")
+
+    def rollback(self):
+        with self._lock:
+            if self._db.in_transaction:
+                self._db.execute("ROLLBACK")
+
+    def count(self, event_type, since, until=None):
+        """Events of `event_type` with since <= ts < until (index range scan)."""
+        until = float("inf") if until is None else until
+        with self._lock:
+            row = self._db.execute("SELECT COUNT(*) FROM events WHERE type = ? AND ts >= ? AND ts < ?",
+                                   (event_type, since, until)).fetchone()
+        return row[0]
+
+    def events(self, event_type=None, since=0.0, until=None):
+        """(type, ts, resource, severity, detector) rows, oldest first."""
+        until = float("inf") if until is None else until
+        where, args = "ts >= ? AND ts < ?", [since, until]
+        if event_type is not None:
+            where, args = "type = ? AND " + where, [event_type] + args
+        sql = f"SELECT type, ts, resource, severity, detector FROM events WHERE {where} ORDER BY ts"
+        with self._lock:
+            return self._db.execute(sql, args).fetchall()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+    def close(self):
+        self.commit()
+        self._db.close()
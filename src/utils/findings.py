@@ -0,0 +1,126 @@
+"""
+Typed finding record and the append-only JSONL findings log.
+
+Detectors append one JSON line per finding to state/findings.jsonl; the core
+remembers the byte offset it has read up to (stored in sentinel_state.json)
+and on each run only reads the new tail. Markdown reports are just an
+optional rendering of a list of findings.
+"""
+import json
+import os
+from collections import Counter
+from dataclasses import asdict, dataclass, field, fields
+from datetime import datetime, timezone
+from pathlib import Path
+
+from utils.metrics import METRICS
+from utils.report_store import REPORTS_DIR, report_store
+from utils.storage import FileLock
+
+ROOT = Path(__file__).resolve().parents[2]
+FINDINGS_PATH = ROOT / "state" / "findings.jsonl"
+
+SEVERITIES = ("low", "medium", "high", "critical")
+
+
+def _now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+
+@dataclass
+class Finding:
+    """One detector result. Serialized as one JSON line in the findings log."""
+    type: str               # event type the core counts, e.g. "S3_PUBLIC", "IAM_NO_MFA"
+    resource: str           # bucket name, user name, ...
+    severity: str           # one of SEVERITIES
+    detector: str           # which detector produced it, e.g. "s3_public_access"
+    message: str = ""       # one human-readable line
+    detail: dict = field(default_factory=dict)
+    id: str = ""            # stable identity across runs (defaults to type:resource)
+    ts: str = field(default_factory=_now_iso)
+    account: str = ""       # set by multi-account sweeps
+    region: str = ""
+
+    def __post_init__(self):
+        if not self.id:
+            self.id = f"{self.type}:{self.resource}"
+
+    def to_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, d):
+        """Build from a decoded JSON line, ignoring keys we don't know about."""
+        names = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in d.items() if k in names})
+
+    def to_event(self):
+        """The normalized event shape rollup_events_into_state consumes."""
+        return {"type": self.type, "id": self.id, "resource": self.resource,
+                "severity": self.severity, "detector": self.detector, "ts": self.ts}
+
+
+class FindingsLog:
+    """Append-only JSONL log of findings, read incrementally by byte offset."""
+
+    def __init__(self, path=FINDINGS_PATH):
+        self.path = Path(path)
+
+    def append(self, findings):
+        """
+        Append findings as one write under the log's lock, so concurrent
+        detector processes never interleave lines.
+        """
+        if not findings:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = "".join(json.dumps(f.to_dict(), separators=(",", ":")) + "\n" for f in findings)
+        with FileLock(self.path.with_suffix(self.path.suffix + ".lock")):
+            with open(self.path, "ab") as f:
+                f.write(data.encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+        for (detector, finding_type), n in Counter((f.detector, f.type) for f in findings).items():
+            METRICS.inc("sentinel_findings_total", n, detector=detector, type=finding_type)
+
+    def read_from(self, offset=0):
+        """
+        Read findings appended after byte `offset`.
+        Returns (findings, new_offset). A trailing line without a newline is a
+        write still in progress, so we leave it for next time. If the file is
+        shorter than `offset` it was rotated/truncated and we start over.
+        """
+        if not self.path.exists():
+            return [], 0
+        if self.path.stat().st_size < offset:
+            print(f"[i] {self.path.name} shrank below the saved cursor; reading from the start.")
+            offset = 0
+
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            tail = f.read()
+
+        end = tail.rfind(b"\n") + 1     # only complete lines
+        findings = []
+        for line in tail[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                findings.append(Finding.from_dict(json.loads(line)))
+            except (ValueError, TypeError) as e:
+                print(f"[x] Skipping malformed finding line: {e}")
+        return findings, offset + end
+
+
+def render_markdown(findings, title, prefix, reports_dir=REPORTS_DIR):
+    """Write findings as a markdown report in reports/sample_output/ (via the report store). Returns the path."""
+    timestamp = datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
+    lines = [f"# {title}\n\n", f"Generated: {timestamp}\n\n"]
+    if not findings:
+        lines.append("✓ No findings.\n")
+    for finding in findings:
+        lines.append(f"- [{finding.severity}] {finding.message or finding.id}\n")
+    path = report_store(reports_dir).write(prefix, "".join(lines))
+
+    print(f"[✓] Markdown report saved to: {path}")
+    return path
@@ -0,0 +1,177 @@
+"""
+Per-resource fingerprints and sweep checkpoints for incremental scanning.
+
+Lives next to the core state in state/sentinel_fingerprints.json:
+
+    {
+      "resources": {"s3": {"<bucket>": {"fp": ..., "facts": ..., "findings": [...], "checked_at": ...}},
+                    "iam": {"<user>": {...}}},
+      "sweeps":    {"s3": {"started_at": ..., "done": [...], "pending": [...]}}
+    }
+
+A detector asks the store whether a resource is new, changed (fingerprint
+differs) or still fresh (checked within the revalidation window), and only
+spends API calls / evaluation on the first two. A sweep records which
+resources are done so an interrupted run can pick up where it stopped.
+
+The S3 and IAM detectors share the file and may run at the same time, so
+save() re-reads it under a lock and merges: the newer record of a resource
+wins, and a sweep checkpoint is only replaced for the kinds this store swept.
+"""
+import hashlib
+import json
+import zlib
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+from utils.findings import Finding
+from utils.storage import FileLock, atomic_write_json
+
+ROOT = Path(__file__).resolve().parents[2]
+FINGERPRINTS_PATH = ROOT / "state" / "sentinel_fingerprints.json"
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def digest(obj):
+    """Short stable hash of any JSON-able object (key order doesn't matter)."""
+    raw = json.dumps(obj, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class FingerprintStore:
+    """Load/save fingerprints and sweep checkpoints for all detectors."""
+
+    def __init__(self, path=FINGERPRINTS_PATH, checkpoint_every=200):
+        self.path = Path(path)
+        self.checkpoint_every = checkpoint_every
+        self._since_flush = 0
+        self._pruned = {}       # kind -> resources prune() dropped, so save() doesn't bring them back
+        self._swept = set()     # kinds whose sweep checkpoint this store owns
+        self.data = self._read()
+
+    def _read(self):
+        data = {"resources": {}, "sweeps": {}}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            data.setdefault("resources", {})
+            data.setdefault("sweeps", {})
+        return data
+
+    def save(self):
+        """
+        Merge with what other detectors saved since we loaded, then write to a
+        temp file and rename over the old one so a crash never leaves half a file.
+        """
+        with FileLock(self.path.with_name(self.path.name + ".lock")):
+            disk = self._read()
+            for kind, records in disk["resources"].items():
+                ours = self.data["resources"].setdefault(kind, {})
+                pruned = self._pruned.get(kind, ())
+                for name, record in records.items():
+                    if name in pruned:
+                        continue
+                    mine = ours.get(name)
+                    if mine is None or record.get("checked_at", "") > mine.get("checked_at", ""):
+                        ours[name] = record
+            for kind, sweep in disk["sweeps"].items():
+                if kind not in self._swept:
+                    self.data["sweeps"][kind] = sweep
+            atomic_write_json(self.path, self.data, separators=(",", ":"))
+        self._since_flush = 0
+
+    # ---- resource records ---------------------------------------------------
+
+    def get(self, kind, resource):
+        return self.data["resources"].get(kind, {}).get(resource)
+
+    def is_fresh(self, kind, resource, revalidate_hours, changed_at=None):
+        """
+        True if we checked `resource` recently enough to trust its stored record.
+
+        Each resource gets a stable offset in the second half of the window
+        (from a hash of its name), so after one big sweep the revalidations
+        spread out over later runs instead of all expiring at once.
+        `changed_at` (epoch seconds) is when we last heard the resource changed,
+        e.g. from a change event; a change after the last check is never fresh.
+        """
+        record = self.get(kind, resource)
+        if not record or not revalidate_hours:
+            return False
+        spread = (zlib.crc32(resource.encode("utf-8")) % 1000) / 1000.0
+        window = timedelta(hours=revalidate_hours * (0.5 + 0.5 * spread))
+        try:
+            checked_at = datetime.fromisoformat(record["checked_at"])
+        except (KeyError, ValueError):
+            return False
+        if changed_at is not None and changed_at > checked_at.timestamp():
+            return False
+        return _now() - checked_at < window
+
+    def update(self, kind, resource, fp, facts, findings):
+        """
+        Store the new record and return the findings that weren't there last
+        time (compared by finding id), i.e. what this run actually learned.
+        """
+        old = self.get(kind, resource)
+        old_ids = {f["id"] for f in old["findings"]} if old else set()
+        self.data["resources"].setdefault(kind, {})[resource] = {
+            "fp": fp,
+            "facts": facts,
+            "findings": [f.to_dict() for f in findings],
+            "checked_at": _now().isoformat(),
+        }
+        return [f for f in findings if f.id not in old_ids]
+
+    def touch(self, kind, resource):
+        """Fingerprint unchanged: just bump checked_at."""
+        self.data["resources"][kind][resource]["checked_at"] = _now().isoformat()
+
+    def prune(self, kind, live_resources):
+        """Forget resources that no longer exist (deleted buckets/users)."""
+        records = self.data["resources"].get(kind, {})
+        gone = set(records) - set(live_resources)
+        for name in gone:
+            del records[name]
+        self._pruned.setdefault(kind, set()).update(gone)
+
+    # ---- sweep checkpoints --------------------------------------------------
+
+    def begin_sweep(self, kind, resume=True):
+        """
+        Start (or resume) a sweep. Returns the set of resources an interrupted
+        sweep already finished; empty for a fresh sweep.
+        """
+        self._swept.add(kind)
+        sweep = self.data["sweeps"].get(kind)
+        if sweep and resume:
+            print(f"[i] Resuming {kind} sweep from {sweep['started_at']} "
+                  f"({len(sweep['done'])} resources already done)")
+        else:
+            sweep = {"started_at": _now().isoformat(), "done": [], "pending": []}
+            self.data["sweeps"][kind] = sweep
+        return set(sweep["done"])
+
+    def mark_done(self, kind, resource, new_findings=()):
+        """Record progress; flushes to disk every `checkpoint_every` resources."""
+        sweep = self.data["sweeps"][kind]
+        sweep["done"].append(resource)
+        sweep["pending"].extend(f.to_dict() for f in new_findings)
+        self._since_flush += 1
+        if self._since_flush >= self.checkpoint_every:
+            self.save()
+
+    def end_sweep(self, kind, live_resources=None):
+        """
+        Finish the sweep, prune deleted resources and save.
+        Returns every new finding from the sweep, including ones found before a crash.
+        """
+        self._swept.add(kind)
+        sweep = self.data["sweeps"].pop(kind, None) or {"pending": []}
+        if live_resources is not None:
+            self.prune(kind, live_resources)
+        self.save()
+        return [Finding.from_dict(d) for d in sweep["pending"]]
@@ -0,0 +1,307 @@
+"""
+Local cache of the resource inventory: users, buckets, MFA status, access
+keys and bucket configurations.
+
+Detectors, responders and the change listener all need the same lists and
+per-resource facts. Reading them through one cache means a detector sweep
+and the responders that act on its findings in the same cycle share a
+single enumeration (one list_users, one list_access_keys per user) instead
+of each repeating it:
+
+    names = cache.listing("buckets", lambda: [b["Name"] for b in s3.list_buckets()["Buckets"]])
+    cfg = cache.get("bucket_config", name, lambda: fetch_bucket_config(s3, name))
+
+- Every resource class has its own TTL (`inventory.ttl_seconds`); a value
+  older than that is fetched again. TTLs are kept below the sweep
+  intervals, so each scheduled sweep still sees fresh data.
+- Concurrent get()s of one missing key share one fetch.
+- Each entry keeps the time its value last *changed* (by digest), and
+  resources that drop out of a listing leave a tombstone, so
+  changed_since("bucket_config", t) answers "what changed since t".
+- Entries not seen for `evict_after_hours`, and the least recently fetched
+  beyond `max_entries` per class, are evicted.
+- On disk it is one gzipped, column-per-field JSON file
+  (state/inventory.json.gz). save() merges with whatever another process
+  wrote in the meantime, newest entry wins.
+
+    python src/utils/inventory_cache.py --changed-since-hours 2
+"""
+import argparse
+import gzip
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+# Make src/ importable when this file is run directly (python src/utils/...)
+if str(ROOT / "src") not in sys.path:
+    sys.path.insert(0, str(ROOT / "src"))
+
+from utils.fingerprints import digest
+from utils.storage import FileLock, atomic_write_bytes, read_json
+
+CONFIG_PATH = ROOT / "configs" / "sentinel_config.json"
+
+# Used for anything the `inventory` config block leaves out
+DEFAULT_SETTINGS = {
+    "path": "state/inventory.json.gz",      # "" keeps the cache in memory only
+    "ttl_seconds": {"users": 300, "buckets": 300, "mfa": 300, "access_keys": 300, "bucket_config": 300},
+    "max_entries": 100000,                  # per class
+    "evict_after_hours": 168,               # also how far back changed_since() can see
+}
+DEFAULT_TTL = 300
+
+# Listing class -> classes keyed by its members (dropped when the member goes)
+LISTINGS = {"users": ("mfa", "access_keys"), "buckets": ("bucket_config",)}
+
+# An entry is [value, fetched_at, changed_at, digest]; value None is a tombstone
+VALUE, FETCHED, CHANGED, DIGEST = range(4)
+
+
+class InventoryCache:
+    """Thread-safe TTL cache of resource facts, optionally persisted to `path`."""
+
+    def __init__(self, path=None, settings=None):
+        settings = settings or {}
+        self.settings = dict(DEFAULT_SETTINGS, **settings)
+        self.ttls = dict(DEFAULT_SETTINGS["ttl_seconds"], **settings.get("ttl_seconds", {}))
+        self.path = Path(path) if path else None
+        self.hits = 0
+        self.misses = 0
+        self._data = {}         # class -> {key: entry}
+        self._inflight = {}     # (class, key) -> Event, while one thread fetches it
+        self._lock = threading.Lock()
+        if self.path is not None and self.path.exists():
+            self._data = self._read(self.path)
+
+    def ttl(self, cls):
+        return self.ttls.get(cls, DEFAULT_TTL)
+
+    # ---- reads ----------------------------------------------------------------
+
+    def get(self, cls, key, fetch, max_age=None, keep=None):
+        """
+        Cached value of `key`, or fetch() it if missing or older than the
+        class TTL (or `max_age` seconds). `keep(value)` returning False
+        means "don't cache this one" (e.g. a partial fetch).
+        """
+        max_age = self.ttl(cls) if max_age is None else max_age
+        while True:
+            with self._lock:
+                entry = self._data.get(cls, {}).get(key)
+                if entry is not None and entry[VALUE] is not None and time.time() - entry[FETCHED] <= max_age:
+                    self.hits += 1
+                    return entry[VALUE]
+                waiter = self._inflight.get((cls, key))
+                if waiter is None:
+                    waiter = self._inflight[(cls, key)] = threading.Event()
+                    self.misses += 1
+                    break
+            waiter.wait()       # another thread is fetching it; take theirs (or retry if it failed)
+        try:
+            value = fetch()
+            if keep is None or keep(value):
+                self.put(cls, key, value)
+            return value
+        finally:
+            with self._lock:
+                del self._inflight[(cls, key)]
+            waiter.set()
+
+    def listing(self, cls, fetch, max_age=None):
+        """Names of all resources of a listing class ("users", "buckets"); fetch() returns them."""
+        # put_listing stores the list itself, so get() mustn't store it again
+        return self.get(cls, "*", lambda: self.put_listing(cls, fetch()), max_age, keep=lambda _: False)
+
+    def changed_at(self, cls, key):
+        """When `key`'s value last changed (or was invalidated), as epoch seconds; None if unknown."""
+        with self._lock:
+            entry = self._data.get(cls, {}).get(key)
+            return None if entry is None else entry[CHANGED]
+
+    def changed_since(self, cls, since):
+        """{key: value} of entries that appeared or changed at or after `since` (value None = removed)."""
+        with self._lock:
+            return {k: e[VALUE] for k, e in self._data.get(cls, {}).items() if k != "*" and e[CHANGED] >= since}
+
+    def stats(self):
+        with self._lock:
+            return {cls: sum(1 for k, e in table.items() if k != "*" and e[VALUE] is not None)
+                    for cls, table in self._data.items()}
+
+    # ---- writes ---------------------------------------------------------------
+
+    def put(self, cls, key, value, now=None):
+        """Record a freshly fetched value. Returns True if it differs from the cached one."""
+        now = time.time() if now is None else now
+        fp = digest(value)
+        with self._lock:
+            table = self._data.setdefault(cls, {})
+            old = table.get(key)
+            changed = old is None or old[DIGEST] != fp
+            table[key] = [value, now, now if changed else old[CHANGED], fp]
+            if len(table) > self.settings["max_entries"]:
+                # Evict down to 90% so a full class doesn't sort itself on every put
+                self._evict(table, now, int(self.settings["max_entries"] * 0.9))
+        return changed
+
+    def put_listing(self, cls, names, now=None):
+        """Record a full listing: new members appear, missing ones become tombstones. Returns the names."""
+        now = time.time() if now is None else now
+        names = sorted(set(names))
+        live = set(names)
+        with self._lock:
+            table = self._data.setdefault(cls, {})
+            for name in names:
+                entry = table.get(name)
+                if entry is None or entry[VALUE] is None:
+                    table[name] = [1, now, now, ""]
+                else:
+                    entry[FETCHED] = now
+            for name, entry in list(table.items()):
+                if name != "*" and entry[VALUE] is not None and name not in live:
+                    self._tombstone(cls, name, now)
+                    for dependent in LISTINGS.get(cls, ()):
+                        self._tombstone(dependent, name, now)
+            table["*"] = [names, now, now, ""]
+        return names
+
+    def invalidate(self, cls, key):
+        """Forget that `key` is fresh because we know it just changed (our own write, a change event)."""
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(cls, {}).get(key)
+            if entry is not None:
+                entry[FETCHED] = 0.0
+                entry[CHANGED] = now
+
+    def _tombstone(self, cls, key, now):
+        entry = self._data.get(cls, {}).get(key)
+        if entry is not None and entry[VALUE] is not None:
+            self._data[cls][key] = [None, now, now, ""]
+
+    def _evict(self, table, now, limit):
+        """Drop expired entries, then the least recently fetched down to `limit`. Lock held."""
+        cutoff = now - self.settings["evict_after_hours"] * 3600
+        for key in [k for k, e in table.items() if max(e[FETCHED], e[CHANGED]) < cutoff]:
+            del table[key]
+        excess = len(table) - limit
+        if excess > 0:
+            for key in sorted(table, key=lambda k: table[k][FETCHED])[:excess]:
+                del table[key]
+
+    # ---- disk -----------------------------------------------------------------
+
+    @staticmethod
+    def _read(path):
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                raw = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[x] Ignoring unreadable inventory cache {path}: {e}")
+            return {}
+        return {cls: {k: [v, f, c, d] for k, v, f, c, d in zip(cols["keys"], cols["values"], cols["fetched"],
+                                                                cols["changed"], cols["digests"])}
+                for cls, cols in raw.get("classes", {}).items()}
+
+    @staticmethod
+    def _encode(data):
+        classes = {}
+        for cls, table in data.items():
+            keys = list(table)
+            classes[cls] = {"keys": keys,
+                            "values": [table[k][VALUE] for k in keys],
+                            "fetched": [int(table[k][FETCHED]) for k in keys],
+                            "changed": [int(table[k][CHANGED]) for k in keys],
+                            "digests": [table[k][DIGEST] for k in keys]}
+        return json.dumps({"version": 1, "classes": classes}, separators=(",", ":")).encode("utf-8")
+
+    def save(self):
+        """Merge with the file (newest entry wins), evict, and write it back. No-op without a path."""
+        if self.path is None:
+            return
+        now = time.time()
+        with FileLock(self.path.with_name(self.path.name + ".lock")):
+            disk = self._read(self.path) if self.path.exists() else {}
+            with self._lock:
+                for cls, table in disk.items():
+                    ours = self._data.setdefault(cls, {})
+                    for key, entry in table.items():
+                        mine = ours.get(key)
+                        if mine is None or max(entry[FETCHED], entry[CHANGED]) > max(mine[FETCHED], mine[CHANGED]):
+                            ours[key] = entry
+                for table in self._data.values():
+                    self._evict(table, now, self.settings["max_entries"])
+                payload = self._encode(self._data)
+            atomic_write_bytes(self.path, gzip.compress(payload, compresslevel=6))
+
+
+def load_settings(path=CONFIG_PATH):
+    """The `inventory` block of sentinel_config.json (empty dict if absent)."""
+    return read_json(path, {}).get("inventory") or {}
+
+
+_CACHE = None
+
+
+def inventory_cache():
+    """The process-wide InventoryCache configured by the `inventory` section of the config."""
+    global _CACHE
+    if _CACHE is None:
+        settings = load_settings()
+        path = settings.get("path", DEFAULT_SETTINGS["path"])
+        _CACHE = InventoryCache(ROOT / path if path else None, settings)
+    return _CACHE
+
+
+# ---- IAM accessors shared by the IAM detector and responder ------------------
+
+def _count(stats):
+    if stats is not None:
+        stats["api_calls"] = stats.get("api_calls", 0) + 1
+
+
+def list_user_names(iam, cache=None, stats=None):
+    """Every IAM user name (list_users pages), at most once per TTL."""
+    def fetch():
+        names = []
+        for page in iam.get_paginator("list_users").paginate():
+            _count(stats)
+            names += [u["UserName"] for u in page["Users"]]
+        return names
+    return (cache or inventory_cache()).listing("users", fetch)
+
+
+def has_mfa(iam, username, cache=None, stats=None):
+    """Whether the user has any MFA device (list_mfa_devices)."""
+    def fetch():
+        _count(stats)
+        return bool(iam.list_mfa_devices(UserName=username)["MFADevices"])
+    return (cache or inventory_cache()).get("mfa", username, fetch)
+
+
+def access_keys(iam, username, cache=None, stats=None):
+    """The user's access keys as [{"AccessKeyId", "Status", "CreateDate" (ISO)}] (list_access_keys)."""
+    def fetch():
+        _count(stats)
+        keys = iam.list_access_keys(UserName=username)["AccessKeyMetadata"]
+        return [{"AccessKeyId": k["AccessKeyId"], "Status": k.get("Status", "Active"),
+                 "CreateDate": k["CreateDate"].isoformat()} for k in keys]
+    return (cache or inventory_cache()).get("access_keys", username, fetch)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SynAccel inventory cache")
+    parser.add_argument("--changed-since-hours", type=float, help="list resources changed in the last N hours")
+    args = parser.parse_args()
+
+    cache = inventory_cache()
+    for cls, count in sorted(cache.stats().items()):
+        print(f"{cls}: {count} cached (ttl {cache.ttl(cls)}s)")
+    if args.changed_since_hours is not None:
+        since = time.time() - args.changed_since_hours * 3600
+        for cls in sorted(cache.stats()):
+            for key, value in sorted(cache.changed_since(cls, since).items()):
+                print(f"  {cls} {key}: {'removed' if value is None else 'changed'}")
@@ -0,0 +1,251 @@
+"""
+Process-wide metrics: stage timers, API call counters, throttles/retries and
+queue depths, exported in the Prometheus text format.
+
+Everything records into the METRICS singleton:
+
+    with METRICS.timer("core.rollup"):
+        ...
+    METRICS.inc("sentinel_api_calls_total", service="s3", operation="GetBucketPolicy")
+    METRICS.set("sentinel_queue_depth", len(pending), queue="remediation")
+
+and comes out as text in two ways:
+
+- write_textfile(job): state/metrics/<job>.prom, atomically, for the node
+  exporter's textfile collector. One file per job, so one-shot detector,
+  core and responder runs don't overwrite each other.
+- serve(port): a tiny /metrics HTTP endpoint (the resident engine).
+
+Stage timers answer "where did the time go" next to the API latency
+histogram: a slow sweep with a high sentinel_api_call_seconds is AWS, one
+with high throttle counts is rate limiting, and one where the evaluate /
+parse stages dominate is us.
+
+profile_run(name) wraps one run in cProfile when SENTINEL_CPROFILE is set
+to a folder (or a folder is passed), and prints the top functions.
+"""
+import contextlib
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from utils.storage import atomic_write_text, read_json
+
+ROOT = Path(__file__).resolve().parents[2]
+CONFIG_PATH = ROOT / "configs" / "sentinel_config.json"
+METRICS_DIR = ROOT / "state" / "metrics"
+
+# Used when sentinel_config.json has no "metrics" section
+DEFAULT_SETTINGS = {
+    "textfile_dir": str(METRICS_DIR),     # "" disables the .prom files
+    "port": None,                         # engine only: serve /metrics on this port
+}
+
+# Upper bounds (seconds) of the API latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+HELP = {
+    "sentinel_stage_seconds": ("summary", "Time spent per pipeline stage"),
+    "sentinel_api_calls_total": ("counter", "AWS API calls by service and operation"),
+    "sentinel_api_errors_total": ("counter", "AWS API errors by service and error code"),
+    "sentinel_api_retries_total": ("counter", "Retries botocore made, by service"),
+    "sentinel_api_call_seconds": ("histogram", "AWS API call latency by service"),
+    "sentinel_throttles_total": ("counter", "Throttling errors seen by our backoff, by service"),
+    "sentinel_backoff_retries_total": ("counter", "Calls our backoff retried, by service"),
+    "sentinel_findings_total": ("counter", "Findings appended to the findings log"),
+    "sentinel_events_total": ("counter", "Events the core counted (after dedup)"),
+    "sentinel_queue_depth": ("gauge", "Items waiting in a queue"),
+    "sentinel_remediation_actions_total": ("counter", "Remediation actions run, by action and result"),
+    "sentinel_remediation_skipped_total": ("counter", "Findings not remediated, by reason"),
+    "sentinel_counter": ("gauge", "Core 24h counters"),
+    "sentinel_risk_score": ("gauge", "Decayed risk score per policy domain"),
+    "sentinel_records_total": ("counter", "Log records parsed"),
+    "sentinel_change_events_total": ("counter", "Configuration-change events handled, by kind and event"),
+    "sentinel_change_latency_seconds": ("summary", "Time from a change (eventTime) to its findings"),
+    "sentinel_guardduty_findings_total": ("counter", "GuardDuty findings listed, by region and outcome (new, duplicate)"),
+}
+
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    esc = lambda v: v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(v):
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Metrics:
+    """Thread-safe registry of counters, gauges, summaries and histograms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}     # (name, labels) -> value
+        self._gauges = {}
+        self._summaries = {}    # (name, labels) -> [count, sum]
+        self._histograms = {}   # (name, labels) -> [count, sum, bucket counts]
+
+    def inc(self, metric, value=1, **labels):
+        key = (metric, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, metric, value, **labels):
+        with self._lock:
+            self._gauges[(metric, _labels(labels))] = value
+
+    def observe(self, metric, value, **labels):
+        key = (metric, _labels(labels))
+        with self._lock:
+            entry = self._summaries.get(key)
+            if entry is None:
+                entry = self._summaries[key] = [0, 0.0]
+            entry[0] += 1
+            entry[1] += value
+
+    def observe_latency(self, metric, seconds, **labels):
+        key = (metric, _labels(labels))
+        with self._lock:
+            entry = self._histograms.get(key)
+            if entry is None:
+                entry = self._histograms[key] = [0, 0.0, [0] * len(LATENCY_BUCKETS)]
+            entry[0] += 1
+            entry[1] += seconds
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    entry[2][i] += 1
+                    break
+
+    @contextlib.contextmanager
+    def timer(self, stage):
+        """Time a block into sentinel_stage_seconds{stage=...}."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("sentinel_stage_seconds", time.perf_counter() - started, stage=stage)
+
+    def stage_seconds(self):
+        """{stage: total seconds} so far."""
+        with self._lock:
+            return {dict(labels)["stage"]: entry[1] for (name, labels), entry in self._summaries.items()
+                    if name == "sentinel_stage_seconds"}
+
+    def reset(self):
+        with self._lock:
+            for table in (self._counters, self._gauges, self._summaries, self._histograms):
+                table.clear()
+
+    # ---- export --------------------------------------------------------------
+
+    def render(self):
+        """Everything recorded so far in the Prometheus text exposition format."""
+        with self._lock:
+            series = {}
+            for (name, labels), v in sorted({**self._counters, **self._gauges}.items()):
+                series.setdefault(name, []).append(f"{name}{_format_labels(labels)} {_format_value(v)}")
+            for (name, labels), (count, total) in sorted(self._summaries.items()):
+                series.setdefault(name, []).extend([
+                    f"{name}_sum{_format_labels(labels)} {_format_value(total)}",
+                    f"{name}_count{_format_labels(labels)} {count}"])
+            for (name, labels), (count, total, buckets) in sorted(self._histograms.items()):
+                lines = series.setdefault(name, [])
+                cumulative = 0
+                for bound, n in zip(LATENCY_BUCKETS, buckets):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', _format_value(bound))])} "
+                                 f"{cumulative}")
+                lines += [f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {count}",
+                          f"{name}_sum{_format_labels(labels)} {_format_value(total)}",
+                          f"{name}_count{_format_labels(labels)} {count}"]
+        out = []
+        for name in sorted(series):
+            kind, text = HELP.get(name, ("untyped", name))
+            out += [f"# HELP {name} {text}", f"# TYPE {name} {kind}"] + series[name]
+        return "\n".join(out) + "\n"
+
+    def write_textfile(self, job, settings=None):
+        """
+        Write state/metrics/<job>.prom (or the configured folder). `settings`
+        defaults to the config's "metrics" section. Returns the path, or None
+        if disabled.
+        """
+        if settings is None:
+            settings = read_json(CONFIG_PATH, {}).get("metrics")
+        settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+        if not settings["textfile_dir"]:
+            return None
+        folder = Path(settings["textfile_dir"])
+        if not folder.is_absolute():
+            folder = ROOT / folder
+        folder.mkdir(parents=True, exist_ok=True)
+        path = folder / f"{job}.prom"
+        atomic_write_text(path, self.render())
+        return path
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serve /metrics from a daemon thread. Returns the server (call .shutdown() to stop)."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *_):
+                pass    # scrapes every few seconds would drown the console
+
+        server = ThreadingHTTPServer((host, int(port)), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+        return server
+
+
+METRICS = Metrics()
+
+
+@contextlib.contextmanager
+def profile_run(name, out_dir=None, top=25):
+    """
+    Profile the block with cProfile if `out_dir` or $SENTINEL_CPROFILE is set:
+    saves <dir>/<name>-<timestamp>.pstats (open with `python -m pstats` or
+    snakeviz) and prints the top functions by cumulative time. Off by default.
+    """
+    out_dir = out_dir or os.environ.get("SENTINEL_CPROFILE")
+    if not out_dir:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        folder = Path(out_dir)
+        folder.mkdir(parents=True, exist_ok=True)
+        path = folder / f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.pstats"
+        profiler.dump_stats(str(path))
+        buf = io.StringIO()
+        pstats.Stats(profiler, stream=buf).sort_stats("cumulative").print_stats(top)
+        print(buf.getvalue())
+        print(f"[i] Profile saved to {path}")
@@ -0,0 +1,243 @@
+"""
+Bucket-policy exposure analyzer.
+
+A policy document is parsed once and compiled into a compact form (a tuple of
+`Statement`s with principals, actions and conditions normalized to lowercase
+tuples), then each Allow statement is classified:
+
+- public      - anyone can use it: Principal "*" (bare, {"AWS": "*"}, in a list,
+                or an account wildcard), or Allow + NotPrincipal
+- ip_limited  - public, but only from the source IPs in an aws:SourceIp condition
+- narrowed    - public on paper but pinned to a VPC / endpoint / org / account by
+                a condition (aws:SourceVpc, aws:PrincipalOrgID, ...), or cut back
+                by a Deny-everyone-outside-X statement; not reported
+
+Severity follows what the statement lets strangers do: write/delete/permission
+changes are critical, reads are high, anything else medium, and ip_limited is
+capped at medium.
+
+Results are cached by a hash of the document with the bucket name swapped for a
+placeholder, so the hundreds of buckets stamped from one template cost a single
+evaluation. `PolicyAnalyzer.analyze` is thread-safe.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict, namedtuple
+
+Statement = namedtuple("Statement", "index sid effect principals not_principal actions not_action conditions")
+Exposure = namedtuple("Exposure", "index sid level severity actions reason")
+
+# Condition keys that pin a public statement to our own network or organization
+NARROWING_KEYS = frozenset({
+    "aws:sourcevpc", "aws:sourcevpce", "aws:principalorgid", "aws:principalorgpaths",
+    "aws:principalaccount", "aws:sourceaccount", "aws:sourcearn", "aws:sourceorgid",
+    "aws:principalarn", "aws:userid",
+})
+IP_KEYS = frozenset({"aws:sourceip"})
+
+# Operators that only let matching requests through. Negated ones (StringNotEquals,
+# NotIpAddress) and ...IfExists variants let requests without the key through.
+POSITIVE_OPERATORS = frozenset({
+    "stringequals", "stringequalsignorecase", "stringlike", "arnequals", "arnlike", "ipaddress",
+})
+NEGATED_OPERATORS = frozenset({"stringnotequals", "stringnotlike", "arnnotequals", "arnnotlike", "notipaddress"})
+
+# Action prefixes (lowercase) that let an outsider change data or permissions
+WRITE_PREFIXES = ("s3:put", "s3:delete", "s3:abortmultipartupload", "s3:restoreobject",
+                  "s3:replicate", "s3:bypassgovernanceretention")
+READ_PREFIXES = ("s3:get", "s3:list")
+
+SEVERITY_RANK = {"low": 0, "medium": 1, "high": 2, "critical": 3}
+
+
+def _as_tuple(value):
+    if value is None:
+        return ()
+    if isinstance(value, (list, tuple)):
+        return tuple(value)
+    return (value,)
+
+
+def _principals(value):
+    """Flatten "*" / {"AWS": [...], "Service": ...} into a tuple of lowercase strings."""
+    if isinstance(value, dict):
+        out = []
+        for v in value.values():
+            out.extend(_as_tuple(v))
+        return tuple(str(p).lower() for p in out)
+    return tuple(str(p).lower() for p in _as_tuple(value))
+
+
+def _conditions(block):
+    """{"StringEquals": {"aws:SourceVpc": "vpc-1"}} -> (("stringequals", "aws:sourcevpc", ("vpc-1",)),)"""
+    out = []
+    for operator, pairs in (block or {}).items():
+        if not isinstance(pairs, dict):
+            continue
+        for key, values in pairs.items():
+            out.append((operator.lower(), key.lower(), tuple(str(v) for v in _as_tuple(values))))
+    return tuple(out)
+
+
+def compile_policy(doc):
+    """Normalize a parsed policy document into a tuple of Statements."""
+    statements = doc.get("Statement", [])
+    if isinstance(statements, dict):        # a single statement needn't be in a list
+        statements = [statements]
+    compiled = []
+    for i, s in enumerate(statements):
+        not_principal = "NotPrincipal" in s
+        not_action = "NotAction" in s
+        compiled.append(Statement(
+            index=i,
+            sid=s.get("Sid", ""),
+            effect=s.get("Effect", ""),
+            principals=_principals(s.get("NotPrincipal") if not_principal else s.get("Principal")),
+            not_principal=not_principal,
+            actions=tuple(a.lower() for a in _as_tuple(s.get("NotAction") if not_action else s.get("Action"))),
+            not_action=not_action,
+            conditions=_conditions(s.get("Condition")),
+        ))
+    return tuple(compiled)
+
+
+def _is_wildcard_principal(p):
+    # "*", or an ARN with a wildcard account such as arn:aws:iam::*:root
+    return p == "*" or p.startswith("arn:aws:iam::*:")
+
+
+def _is_public(stmt):
+    if stmt.not_principal:
+        return True     # Allow everyone except a few named principals
+    return any(_is_wildcard_principal(p) for p in stmt.principals)
+
+
+def _split_operator(operator):
+    """ "ForAnyValue:StringEquals" -> ("stringequals", if_exists=False)"""
+    operator = operator.split(":", 1)[-1]
+    if operator.endswith("ifexists"):
+        return operator[:-8], True
+    return operator, False
+
+
+def _narrowing(conditions, operators):
+    """Which narrowing kinds ("scope" / "ip") the conditions enforce with the given operators."""
+    kinds = set()
+    for operator, key, values in conditions:
+        op, if_exists = _split_operator(operator)
+        if if_exists or op not in operators or not values or "*" in values:
+            continue
+        if key in NARROWING_KEYS:
+            kinds.add("scope")
+        elif key in IP_KEYS and "0.0.0.0/0" not in values and "::/0" not in values:
+            kinds.add("ip")
+    return kinds
+
+
+def _covers_all(stmt):
+    return not stmt.not_action and any(a in ("*", "s3:*") for a in stmt.actions)
+
+
+def _deny_guard(statements):
+    """
+    Narrowing enforced by "Deny everyone unless <condition>" statements, e.g.
+    Deny * s3:* when StringNotEquals aws:SourceVpc. Applies to every Allow.
+    """
+    kinds = set()
+    for s in statements:
+        if s.effect == "Deny" and _is_public(s) and not s.not_principal and _covers_all(s):
+            kinds |= _narrowing(s.conditions, NEGATED_OPERATORS)
+    return kinds
+
+
+def _action_severity(stmt):
+    if stmt.not_action:
+        return "critical", ("NotAction",) + stmt.actions
+    severity = "medium"
+    for a in stmt.actions:
+        if a == "*" or a.startswith("s3:*") or a.startswith(WRITE_PREFIXES):
+            return "critical", stmt.actions
+        if a.startswith(READ_PREFIXES):
+            severity = "high"
+    return severity, stmt.actions
+
+
+def classify(statements):
+    """Exposures for the public Allow statements of a compiled policy."""
+    guard = _deny_guard(statements)
+    exposures = []
+    for s in statements:
+        if s.effect != "Allow" or not _is_public(s):
+            continue
+        severity, actions = _action_severity(s)
+        narrowed = _narrowing(s.conditions, POSITIVE_OPERATORS) | guard
+        who = "anyone except the NotPrincipal list" if s.not_principal else "any principal"
+        if "scope" in narrowed:
+            exposures.append(Exposure(s.index, s.sid, "narrowed", "low", actions,
+                                      f"{who}, limited to a VPC/org/account by condition"))
+        elif "ip" in narrowed:
+            if SEVERITY_RANK[severity] > SEVERITY_RANK["medium"]:
+                severity = "medium"
+            exposures.append(Exposure(s.index, s.sid, "ip_limited", severity, actions,
+                                      f"{who}, limited to source IP ranges"))
+        else:
+            exposures.append(Exposure(s.index, s.sid, "public", severity, actions, who))
+    return tuple(exposures)
+
+
+class PolicyAnalyzer:
+    """
+    Parses, compiles and classifies bucket policies, caching up to `max_entries`
+    results (least recently used evicted) keyed by a hash of the template.
+    """
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._cache = OrderedDict()     # digest -> tuple of Exposures
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(policy_text, bucket_name):
+        if bucket_name:
+            # Same template on many buckets: only the bucket ARN differs
+            policy_text = policy_text.replace(bucket_name, "${bucket}")
+        return hashlib.blake2b(policy_text.encode("utf-8"), digest_size=16).digest()
+
+    def analyze(self, policy_text, bucket_name=None):
+        """All classified exposures (including "narrowed") for a policy JSON string."""
+        key = self._key(policy_text, bucket_name)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        try:
+            doc = json.loads(policy_text)
+        except ValueError:
+            doc = {}
+        result = classify(compile_policy(doc if isinstance(doc, dict) else {}))
+
+        with self._lock:
+            self._cache[key] = result
+            if len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return result
+
+    def public_exposures(self, policy_text, bucket_name=None):
+        """Only the exposures worth a finding (public and ip_limited)."""
+        return [e for e in self.analyze(policy_text, bucket_name) if e.level != "narrowed"]
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.hits = self.misses = 0
+
+
+# Shared by every detector run in the process
+ANALYZER = PolicyAnalyzer()
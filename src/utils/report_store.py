@@ -0,0 +1,377 @@
+"""
+Markdown reports in reports/sample_output, with an index, retention and archives.
+
+Every detector, responder and core run writes a timestamped report. Instead
+of finding them again by globbing (and stat-ing) the whole folder, writers
+go through a ReportStore, which also appends one line per report to a
+manifest, `reports/sample_output/.index.jsonl`:
+
+    {"type": "s3_detector_report", "ts": 1760659200.0, "name": "s3_detector_report_2025-10-17-00-00-00.md"}
+
+Loaded once, the manifest is kept per type as a time-sorted list, so "the
+s3 reports of the last 24h" is a bisect, and later lookups only read the
+lines appended since.
+
+Old reports don't pile up forever (`reports` section of the config):
+- retain_days: loose .md files older than this are compacted into
+  archive/<type>-<YYYY-MM>.zip (the manifest remembers where each went,
+  so read() still finds them)
+- max_per_type / rollover_batch: a type with more than max_per_type
+  loose files + rollover_batch rolls its oldest into the archive
+- archive_retain_days: whole archives older than this are deleted
+Compaction runs from write() when a type crosses either limit, or by hand:
+
+    python src/utils/report_store.py --compact
+    python src/utils/report_store.py --reindex    # rebuild the manifest from the folder
+"""
+import argparse
+import bisect
+import json
+import os
+import re
+import sys
+import threading
+import time
+import zipfile
+from datetime import datetime, timezone
+from fnmatch import fnmatchcase
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+# Make src/ importable when this file is run directly (python src/utils/...)
+if str(ROOT / "src") not in sys.path:
+    sys.path.insert(0, str(ROOT / "src"))
+
+from utils.storage import FileLock, atomic_write_text, read_json
+
+CONFIG_PATH = ROOT / "configs" / "sentinel_config.json"
+REPORTS_DIR = ROOT / "reports" / "sample_output"
+INDEX_NAME = ".index.jsonl"
+ARCHIVE_DIR = "archive"
+
+# Used for anything the `reports` config block leaves out
+DEFAULT_SETTINGS = {
+    "retain_days": 7,               # loose .md files older than this get archived
+    "max_per_type": 1000,           # loose files kept per report type...
+    "rollover_batch": 100,          # ...plus this many before the oldest roll over
+    "archive_retain_days": 365,     # archives whose newest report is older are deleted
+}
+
+# "<type>_<timestamp>[-n].md", or the older "<type>_<n>.md"
+_NAME = re.compile(r"^(.*?)_[\d_-]+\.md$")
+
+
+def report_type_of(name):
+    """Report type from a file name: 's3_detector_report_2025-10-17-00-00-00.md' -> 's3_detector_report'."""
+    match = _NAME.match(name)
+    return match.group(1) if match else name.rsplit(".", 1)[0]
+
+
+class ReportStore:
+    """Writes reports into one folder and answers lookups from its manifest."""
+
+    def __init__(self, folder=REPORTS_DIR, settings=None):
+        self.folder = Path(folder)
+        self.index_path = self.folder / INDEX_NAME
+        self.lock_path = self.folder / ".index.lock"
+        self._settings = settings
+        self._entries = {}      # name -> entry, in manifest order
+        self._live = {}         # type -> sorted [(ts, name)] of loose files
+        self._offset = 0
+        self._inode = None
+        self._seq = {}          # type -> (timestamp, n) of our last report
+        self._synced = None     # folder mtime when the manifest last matched the folder
+        self._mutex = threading.RLock()     # the FileLock is per process, this is per thread
+
+    @property
+    def settings(self):
+        if self._settings is None:
+            self._settings = dict(DEFAULT_SETTINGS, **(read_json(CONFIG_PATH, {}).get("reports") or {}))
+        return self._settings
+
+    # ---- manifest -------------------------------------------------------------
+
+    def _apply(self, entry):
+        name = entry["name"]
+        old = self._entries.pop(name, None)
+        if old is not None and "archive" not in old:
+            live = self._live.get(old["type"], [])
+            i = bisect.bisect_left(live, (old["ts"], name))
+            if i < len(live) and live[i] == (old["ts"], name):
+                del live[i]
+        if entry.get("deleted"):
+            return
+        self._entries[name] = entry
+        if "archive" not in entry:
+            bisect.insort(self._live.setdefault(entry["type"], []), (entry["ts"], name))
+
+    def _refresh(self, locked=False):
+        """Catch up with the manifest: the new tail, or all of it if it was rewritten."""
+        try:
+            st = os.stat(self.index_path)
+        except FileNotFoundError:
+            if not locked and self._inode is None and self.folder.is_dir() and any(self.folder.glob("*.md")):
+                self.reindex()      # a folder of reports from before the manifest
+            return
+        if st.st_ino != self._inode or st.st_size < self._offset:
+            self._entries, self._live, self._offset = {}, {}, 0
+            self._inode = st.st_ino
+        if st.st_size == self._offset:
+            return
+        with open(self.index_path, "rb") as f:
+            f.seek(self._offset)
+            tail = f.read()
+        end = tail.rfind(b"\n") + 1        # ignore a line that's still being written
+        for line in tail[:end].splitlines():
+            if line.strip():
+                try:
+                    self._apply(json.loads(line))
+                except (ValueError, KeyError) as e:
+                    print(f"[x] Skipping malformed report index line: {e}")
+        self._offset += end
+
+    def _append(self, entries):
+        self.folder.mkdir(parents=True, exist_ok=True)
+        with open(self.index_path, "ab") as f:
+            for entry in entries:
+                f.write((json.dumps(entry, separators=(",", ":")) + "\n").encode("utf-8"))
+
+    def _rewrite(self):
+        """Replace the manifest with the current entries (drops superseded lines)."""
+        lines = "".join(json.dumps(e, separators=(",", ":")) + "\n" for e in self._entries.values())
+        atomic_write_text(self.index_path, lines)
+        st = os.stat(self.index_path)
+        self._inode, self._offset = st.st_ino, st.st_size
+
+    def _folder_mtime(self):
+        try:
+            return os.stat(self.folder).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _sync_folder(self):
+        """
+        Reports added or deleted by hand since the manifest last matched the
+        folder: new .md files are indexed, vanished ones dropped. Only scans
+        when the folder's mtime moved, so our own writes don't cost a scan.
+        """
+        mtime = self._folder_mtime()
+        if mtime is None or mtime == self._synced:
+            return
+        with FileLock(self.lock_path):
+            self._refresh(locked=True)
+            on_disk = {}
+            with os.scandir(self.folder) as it:
+                for d in it:
+                    if d.is_file() and d.name.endswith(".md"):
+                        on_disk[d.name] = d.stat().st_mtime
+            loose = {name for name, e in self._entries.items() if "archive" not in e}
+            changes = [{"name": name, "deleted": True} for name in sorted(loose - on_disk.keys())]
+            changes += sorted(({"type": report_type_of(name), "ts": on_disk[name], "name": name}
+                               for name in on_disk.keys() - loose), key=lambda e: e["ts"])
+            if changes:
+                self._append(changes)
+                for entry in changes:
+                    self._apply(entry)
+                st = os.stat(self.index_path)
+                self._inode, self._offset = st.st_ino, st.st_size
+        self._synced = mtime
+
+    def _own_change(self, before):
+        """We just changed the folder; if it matched the manifest before, it still does."""
+        if before is not None and before == self._synced:
+            self._synced = self._folder_mtime()
+
+    def reindex(self):
+        """Rebuild the manifest from the .md files in the folder (keeps archive entries). Returns the count."""
+        with self._mutex, FileLock(self.lock_path):
+            archived = [e for e in self._entries.values() if "archive" in e]
+            if self.index_path.exists():
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        entry = json.loads(line) if line.strip() else {}
+                        if "archive" in entry:
+                            archived.append(entry)
+            self._entries, self._live = {}, {}
+            for entry in archived:
+                self._apply(entry)
+            found = []
+            with os.scandir(self.folder) as it:
+                for d in it:
+                    if d.is_file() and d.name.endswith(".md"):
+                        found.append({"type": report_type_of(d.name), "ts": d.stat().st_mtime, "name": d.name})
+            for entry in sorted(found, key=lambda e: e["ts"]):
+                self._apply(entry)
+            self._rewrite()
+            self._synced = self._folder_mtime()
+            return len(found)
+
+    # ---- writing --------------------------------------------------------------
+
+    def write(self, report_type, text, now=None):
+        """Save `text` as <type>_<timestamp>.md, index it, and compact if a limit was crossed. Returns the path."""
+        with self._mutex:
+            now = time.time() if now is None else now
+            self.folder.mkdir(parents=True, exist_ok=True)
+            stamp = datetime.fromtimestamp(now).strftime("%Y-%m-%d-%H-%M-%S")
+            self._refresh()
+            before = self._folder_mtime()
+            with FileLock(self.lock_path):
+                self._refresh(locked=True)
+                # Several reports of one type in the same second get -2, -3, ...
+                last, n = self._seq.get(report_type, (None, 0))
+                n = n + 1 if last == stamp else 1
+                path = self.folder / (f"{report_type}_{stamp}.md" if n == 1 else f"{report_type}_{stamp}-{n}.md")
+                while path.exists():
+                    n += 1
+                    path = self.folder / f"{report_type}_{stamp}-{n}.md"
+                self._seq[report_type] = (stamp, n)
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(text)
+                entry = {"type": report_type, "ts": now, "name": path.name}
+                self._append([entry])
+                self._apply(entry)
+                st = os.stat(self.index_path)
+                self._inode, self._offset = st.st_ino, st.st_size
+            self._own_change(before)
+            if self._over_limits(report_type, now):
+                self.compact(now)
+            return path
+
+    def _over_limits(self, report_type, now):
+        live = self._live.get(report_type, [])
+        s = self.settings
+        if s["max_per_type"] and len(live) > s["max_per_type"] + s["rollover_batch"]:
+            return True
+        # Age check with a day of slack, so age-based compaction runs about once a day
+        return bool(live) and s["retain_days"] is not None and live[0][0] < now - (s["retain_days"] + 1) * 86400
+
+    # ---- lookups --------------------------------------------------------------
+
+    def types(self):
+        with self._mutex:
+            self._refresh()
+            self._sync_folder()
+            return sorted(t for t, live in self._live.items() if live)
+
+    def recent(self, patterns, within_hours=24, now=None):
+        """
+        Paths of loose reports whose type matches any glob in `patterns`,
+        written within `within_hours`, oldest -> newest. Reports copied into
+        or deleted from the folder by hand are picked up first.
+        """
+        with self._mutex:
+            self._refresh()
+            self._sync_folder()
+            cutoff = (time.time() if now is None else now) - within_hours * 3600
+            hits = []
+            for report_type, live in self._live.items():
+                if any(fnmatchcase(report_type, p) for p in patterns):
+                    hits += live[bisect.bisect_left(live, (cutoff, "")):]
+            return [self.folder / name for _, name in sorted(hits)]
+
+    def entries(self, report_type, since=0.0, until=None):
+        """Manifest entries (loose and archived) of one type in [since, until], oldest -> newest."""
+        with self._mutex:
+            self._refresh()
+            self._sync_folder()
+            until = float("inf") if until is None else until
+            return sorted((e for e in self._entries.values()
+                           if e["type"] == report_type and since <= e["ts"] <= until), key=lambda e: e["ts"])
+
+    def read(self, entry):
+        """Text of a report from its manifest entry, wherever it lives now."""
+        if "archive" in entry:
+            with zipfile.ZipFile(self.folder / entry["archive"]) as z:
+                return z.read(entry["name"]).decode("utf-8")
+        return (self.folder / entry["name"]).read_text(encoding="utf-8")
+
+    # ---- retention ------------------------------------------------------------
+
+    def compact(self, now=None):
+        """
+        Apply the retention policy: archive old / overflowing loose reports
+        into monthly zip files and delete expired archives. Returns
+        {"archived": n, "deleted": n}.
+        """
+        with self._mutex:
+            now = time.time() if now is None else now
+            s = self.settings
+            self._refresh()
+            self._sync_folder()
+            before = self._folder_mtime()
+            with FileLock(self.lock_path):
+                self._refresh(locked=True)
+                cutoff = now - s["retain_days"] * 86400 if s["retain_days"] is not None else float("-inf")
+                by_archive = {}
+                for report_type, live in self._live.items():
+                    overflow = len(live) - s["max_per_type"] if s["max_per_type"] else 0
+                    for i, (ts, name) in enumerate(live):
+                        if ts >= cutoff and i >= overflow:
+                            break
+                        month = datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m")
+                        by_archive.setdefault(f"{ARCHIVE_DIR}/{report_type}-{month}.zip", []).append(name)
+
+                archived = 0
+                for archive, names in by_archive.items():
+                    path = self.folder / archive
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    with zipfile.ZipFile(path, "a", compression=zipfile.ZIP_DEFLATED) as z:
+                        members = set(z.namelist())
+                        for name in names:
+                            source = self.folder / name
+                            if source.exists() and name not in members:
+                                z.write(source, name)
+                    for name in names:
+                        self._apply(dict(self._entries[name], archive=archive))
+                        (self.folder / name).unlink(missing_ok=True)
+                        archived += 1
+
+                # An archive goes once the newest report in it is past archive_retain_days
+                deleted = 0
+                if s["archive_retain_days"] is not None:
+                    newest = {}
+                    for e in self._entries.values():
+                        if "archive" in e:
+                            newest[e["archive"]] = max(newest.get(e["archive"], 0.0), e["ts"])
+                    expired = {a for a, ts in newest.items() if ts < now - s["archive_retain_days"] * 86400}
+                    for e in [e for e in self._entries.values() if e.get("archive") in expired]:
+                        self._apply({"name": e["name"], "deleted": True})
+                        deleted += 1
+                    for archive in expired:
+                        (self.folder / archive).unlink(missing_ok=True)
+
+                if archived or deleted:
+                    self._rewrite()
+            self._own_change(before)
+            if archived or deleted:
+                print(f"[i] Reports: archived {archived}, dropped {deleted} with expired archives")
+            return {"archived": archived, "deleted": deleted}
+
+
+_STORES = {}
+
+
+def report_store(folder=REPORTS_DIR):
+    """The process-wide ReportStore for `folder`."""
+    folder = Path(folder).resolve()
+    store = _STORES.get(folder)
+    if store is None:
+        store = _STORES[folder] = ReportStore(folder)
+    return store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SynAccel report store maintenance")
+    parser.add_argument("--folder", default=str(REPORTS_DIR), help="reports folder")
+    parser.add_argument("--reindex", action="store_true", help="rebuild the manifest from the folder")
+    parser.add_argument("--compact", action="store_true", help="apply the retention policy now")
+    args = parser.parse_args()
+
+    store = ReportStore(args.folder)
+    if args.reindex:
+        print(f"[✓] Indexed {store.reindex()} reports")
+    if args.compact:
+        print(f"[✓] {store.compact()}")
+    for t in store.types():
+        print(f"{t}: {len(store._live[t])} loose reports")
@@ -0,0 +1,274 @@
+"""
+Declarative escalation rules for the core's policy (configs/sentinel_rules.json).
+
+A rule says when to flip which policy knobs:
+
+    {"name": "iam_disable_keys", "after": "iam_require_mfa",
+     "when": "IAM_NO_MFA_24h >= policy.iam.escalation_threshold_24h + 2",
+     "set": {"iam.disable_keys_on_nomfa": true},
+     "revert_when": "IAM_NO_MFA_24h == 0", "cooldown_minutes": 360}
+
+Conditions are small Python expressions over:
+    S3_PUBLIC_24h, ...      core counters (0 if the type hasn't been seen)
+    score.s3, max_score.iam risk score per domain: total / riskiest entity
+    policy.<section>.<key>  current config values (missing -> never matches)
+with and/or/not, comparisons and + - * /. They are validated against that
+whitelist and compiled to code objects once, when the rule file is loaded.
+
+- `after` makes multi-step escalation: a rule only escalates while the rule
+  it follows is active, and reverts with it.
+- `revert_when` de-escalates: the values a rule replaced are put back.
+- `cooldown_minutes` is the minimum time between two flips of one rule.
+
+Each cycle the engine reads only the inputs its rules reference, and only
+re-evaluates rules whose inputs changed since the last cycle (plus rules
+waiting on a cooldown, and followers of a rule that just flipped), so
+hundreds of rules cost about as much as the handful that can actually fire.
+When the rules themselves change (added, edited, reordered), every rule is
+evaluated once, since unchanged inputs say nothing about a new condition.
+"""
+import ast
+import hashlib
+import heapq
+import json
+import math
+from pathlib import Path
+
+_NAN = float("nan")     # compares False with everything, so a missing threshold never matches
+
+_ALLOWED = (ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub,
+            ast.Compare, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+            ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Constant, ast.Load)
+
+
+def _dotted(node):
+    """'policy.iam.require_mfa' for a Name/Attribute chain, else None."""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if isinstance(node, ast.Name):
+        parts.append(node.id)
+        return ".".join(reversed(parts))
+    return None
+
+
+class _Inputs(ast.NodeTransformer):
+    """Rewrites every input reference to a lookup `v["name"]` and collects the names."""
+
+    def __init__(self):
+        self.names = set()
+
+    def _lookup(self, node):
+        name = _dotted(node)
+        if name is None:
+            raise ValueError(f"unsupported expression: {ast.unparse(node)}")
+        if name in ("true", "false"):      # JSON spelling
+            return ast.copy_location(ast.Constant(name == "true"), node)
+        self.names.add(name)
+        return ast.copy_location(ast.Subscript(value=ast.Name("v", ast.Load()),
+                                               slice=ast.Constant(name), ctx=ast.Load()), node)
+
+    visit_Name = _lookup
+    visit_Attribute = _lookup
+
+    def generic_visit(self, node):
+        if not isinstance(node, _ALLOWED):
+            raise ValueError(f"not allowed in a rule condition: {type(node).__name__}")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float, bool)):
+            raise ValueError(f"only numbers and true/false allowed, got {node.value!r}")
+        return super().generic_visit(node)
+
+
+def compile_condition(text):
+    """Compile a condition string. Returns (code object, set of input names)."""
+    tree = ast.parse(text, mode="eval")
+    inputs = _Inputs()
+    tree = ast.fix_missing_locations(inputs.visit(tree))
+    return compile(tree, f"<rule: {text}>", "eval"), inputs.names
+
+
+def _format(value):
+    return repr(value) if isinstance(value, bool) else json.dumps(value)
+
+
+class Rule:
+    """One compiled rule. `index` is its position in the file (evaluation order)."""
+
+    def __init__(self, spec, index):
+        try:
+            self.name = spec["name"]
+            self.set = dict(spec["set"])
+            self.when, names = compile_condition(spec["when"])
+        except KeyError as e:
+            raise ValueError(f"rule #{index} is missing {e}") from None
+        self.index = index
+        self.after = spec.get("after")
+        self.revert_when = None
+        if spec.get("revert_when"):
+            self.revert_when, revert_names = compile_condition(spec["revert_when"])
+            names |= revert_names
+        self.inputs = names
+        self.cooldown_seconds = float(spec.get("cooldown_minutes", 0)) * 60
+        self.message = spec.get("message")
+        for path in self.set:
+            if path.count(".") != 1:
+                raise ValueError(f"rule {self.name}: set keys are 'section.key', got {path!r}")
+
+    def describe(self, values, reverted=False):
+        if self.message and not reverted:
+            return self.message
+        by_section = {}
+        for path, value in values.items():
+            section, key = path.split(".")
+            by_section.setdefault(section, []).append(f"{key}={_format(value)}")
+        suffix = " (de-escalated)" if reverted else ""
+        return "; ".join(f"{section.upper()}: set {', '.join(kv)}{suffix}" for section, kv in by_section.items())
+
+
+class RuleSet:
+    """Rules compiled from a rule file, with an index from input name to the rules that read it."""
+
+    def __init__(self, specs):
+        # Identifies this version of the rules in state["rules"]
+        self.signature = hashlib.sha256(json.dumps(specs, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        self.rules = [Rule(spec, i) for i, spec in enumerate(specs)]
+        self.by_name = {r.name: r for r in self.rules}
+        if len(self.by_name) != len(self.rules):
+            raise ValueError("rule names must be unique")
+        self.followers = {}
+        for r in self.rules:
+            if r.after is not None:
+                if r.after not in self.by_name:
+                    raise ValueError(f"rule {r.name} follows unknown rule {r.after!r}")
+                self.followers.setdefault(r.after, []).append(r)
+        self.readers = {}       # input name -> rules that read it
+        for r in self.rules:
+            for name in r.inputs:
+                self.readers.setdefault(name, []).append(r)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f)["rules"])
+
+    def _values(self, config, state):
+        """Current value of every input any rule references."""
+        counters = state.get("counters", {})
+        scores = state.get("scores", {})
+        policy = config.get("policy", {})
+        values = {}
+        for name in self.readers:
+            head, _, rest = name.partition(".")
+            if head == "score":
+                value = scores.get("total", {}).get(rest, 0.0)
+            elif head == "max_score":
+                value = scores.get("max", {}).get(rest, 0.0)
+            elif head == "policy":
+                section, _, key = rest.partition(".")
+                value = policy.get(section, {}).get(key)
+                value = _NAN if value is None else value
+            else:
+                value = counters.get(name, 0)
+            values[name] = value
+        return values
+
+    def evaluate(self, config, state, now):
+        """
+        Apply the rules to config["policy"]. Rule bookkeeping (which rules are
+        active, the values they replaced, the inputs last seen) is kept in
+        state["rules"]. Returns a list of human-readable changes.
+        """
+        memory = state.setdefault("rules", {})
+        active = memory.setdefault("active", {})
+        last = memory.get("inputs")
+        values = self._values(config, state)
+
+        if last is None or memory.get("signature") != self.signature:
+            due = list(self.rules)
+        else:
+            due = [r for name, value in values.items()
+                   if not _same(value, last.get(name)) for r in self.readers[name]]
+        due += [self.by_name[n] for n in memory.get("pending", []) if n in self.by_name]
+
+        # Rules run in file order; a rule that flips queues its followers
+        queue = [(r.index, r) for r in {r.index: r for r in due}.values()]
+        heapq.heapify(queue)
+        queued = {r.index for _, r in queue}
+        policy = config.setdefault("policy", {})
+        changes, pending = [], []
+        while queue:
+            _, rule = heapq.heappop(queue)
+            entry = active.get(rule.name)
+            cooling = entry is not None and now - entry["since"] < rule.cooldown_seconds
+            if entry is None or not entry.get("on"):
+                if rule.after is not None and not active.get(rule.after, {}).get("on"):
+                    continue
+                if not eval(rule.when, {"__builtins__": {}}, {"v": values}):
+                    continue
+                if cooling:
+                    pending.append(rule.name)
+                    continue
+                changes += self._escalate(rule, policy, active, now)
+                for follower in self.followers.get(rule.name, []):
+                    if follower.index not in queued:
+                        queued.add(follower.index)
+                        heapq.heappush(queue, (follower.index, follower))
+            elif rule.revert_when is not None and eval(rule.revert_when, {"__builtins__": {}}, {"v": values}):
+                if cooling:
+                    pending.append(rule.name)
+                    continue
+                changes += self._revert(rule, policy, active, now)
+
+        memory["inputs"] = {k: None if _same(v, _NAN) else v for k, v in values.items()}
+        memory["pending"] = pending
+        memory["signature"] = self.signature
+        return changes
+
+    def _escalate(self, rule, policy, active, now):
+        previous, applied = {}, {}
+        for path, value in rule.set.items():
+            section, key = path.split(".")
+            current = policy.setdefault(section, {}).get(key)
+            previous[path] = current
+            if current != value:
+                policy[section][key] = value
+                applied[path] = value
+        active[rule.name] = {"on": True, "since": now, "previous": previous}
+        return [rule.describe(applied)] if applied else []
+
+    def _revert(self, rule, policy, active, now):
+        changes = []
+        for follower in self.followers.get(rule.name, []):
+            if active.get(follower.name, {}).get("on"):
+                changes += self._revert(follower, policy, active, now)
+        entry = active[rule.name]
+        restored = {}
+        for path, value in rule.set.items():
+            section, key = path.split(".")
+            # Only undo what this rule did; leave it if someone changed it since
+            if policy.get(section, {}).get(key) == value and entry["previous"].get(path) != value:
+                policy[section][key] = entry["previous"][path]
+                restored[path] = entry["previous"][path]
+        active[rule.name] = {"on": False, "since": now}
+        return [rule.describe(restored, reverted=True)] if restored else []
+
+
+def _same(a, b):
+    """Equality where NaN (and a stored None) matches NaN."""
+    a = _NAN if a is None else a
+    b = _NAN if b is None else b
+    return a == b or (isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b))
+
+
+_CACHE = {}
+
+
+def load_rules(path):
+    """RuleSet for `path`, compiled once and reused until the file changes."""
+    path = Path(path)
+    stamp = path.stat().st_mtime_ns
+    cached = _CACHE.get(path)
+    if cached is None or cached[0] != stamp:
+        cached = _CACHE[path] = (stamp, RuleSet.load(path))
+    return cached[1]
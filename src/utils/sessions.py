@@ -0,0 +1,110 @@
+"""
+Shared AWS session factory.
+
+`create_aws_session` is the one place the sentinel-automation profile is
+opened. `SessionFactory` builds on it to assume a role into each account of
+the inventory (configs/accounts.json) and caches the temporary credentials
+until shortly before they expire, so sweeping many accounts/regions only
+calls STS once per account per hour.
+"""
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import boto3
+
+ROOT = Path(__file__).resolve().parents[2]
+ACCOUNTS_PATH = ROOT / "configs" / "accounts.json"
+
+DEFAULT_PROFILE = "sentinel-automation"
+REFRESH_MARGIN = timedelta(minutes=5)
+
+
+def create_aws_session(profile_name=DEFAULT_PROFILE, region_name=None):
+    """Creates an authenticated AWS session using the specified IAM profile."""
+    return boto3.Session(profile_name=profile_name, region_name=region_name)
+
+
+def load_inventory(path=ACCOUNTS_PATH):
+    """
+    Read the account inventory. Each account gets `regions` and `role_arn`
+    filled in from the defaults so callers don't have to.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        inventory = json.load(f)
+    default_regions = inventory.get("default_regions", ["us-east-1"])
+    role_name = inventory.get("role_name", "SynAccelSentinelAudit")
+    for account in inventory.get("accounts", []):
+        account["id"] = str(account["id"])
+        account.setdefault("name", account["id"])
+        account.setdefault("regions", default_regions)
+        account.setdefault("role_arn", f"arn:aws:iam::{account['id']}:role/{role_name}")
+    return inventory
+
+
+class SessionFactory:
+    """
+    Hands out boto3 Sessions for (account, region), assuming each account's
+    role through the base session. Credentials are cached per role ARN until
+    REFRESH_MARGIN before they expire. Thread-safe.
+
+    An account with `"role_arn": null` in the inventory (e.g. the account the
+    base profile already lives in) just uses the base session's credentials.
+    """
+
+    def __init__(self, profile_name=DEFAULT_PROFILE, session_name="synaccel-sentinel",
+                 external_id=None, duration_seconds=3600, base_session=None):
+        self.profile_name = profile_name
+        self.base_session = base_session    # opened on first assume_role
+        self.session_name = session_name
+        self.external_id = external_id
+        self.duration_seconds = duration_seconds
+        self._sts = None
+        self._creds = {}            # role_arn -> (credentials dict, expiration)
+        self._lock = threading.Lock()
+        self.assume_role_calls = 0
+
+    @classmethod
+    def from_inventory(cls, inventory, profile_name=DEFAULT_PROFILE, base_session=None):
+        return cls(profile_name, session_name=inventory.get("session_name", "synaccel-sentinel"),
+                   external_id=inventory.get("external_id"),
+                   duration_seconds=inventory.get("duration_seconds", 3600),
+                   base_session=base_session)
+
+    def _credentials(self, role_arn):
+        with self._lock:
+            cached = self._creds.get(role_arn)
+            if cached and cached[1] - datetime.now(timezone.utc) > REFRESH_MARGIN:
+                return cached[0]
+            if self._sts is None:
+                self.base_session = self.base_session or create_aws_session(self.profile_name)
+                self._sts = self.base_session.client("sts")
+            kwargs = {"RoleArn": role_arn, "RoleSessionName": self.session_name,
+                      "DurationSeconds": self.duration_seconds}
+            if self.external_id:
+                kwargs["ExternalId"] = self.external_id
+            creds = self._sts.assume_role(**kwargs)["Credentials"]
+            self.assume_role_calls += 1
+            self._creds[role_arn] = (creds, creds["Expiration"])
+            return creds
+
+    def expiration(self, account):
+        """When the cached credentials for `account` expire (None for the base profile)."""
+        role_arn = account.get("role_arn")
+        if not role_arn:
+            return None
+        return self._creds.get(role_arn, (None, None))[1]
+
+    def session_for(self, account, region=None):
+        """A boto3 Session for an inventory account dict in `region`."""
+        role_arn = account.get("role_arn")
+        if not role_arn:
+            return create_aws_session(self.profile_name, region)
+        creds = self._credentials(role_arn)
+        return boto3.Session(
+            aws_access_key_id=creds["AccessKeyId"],
+            aws_secret_access_key=creds["SecretAccessKey"],
+            aws_session_token=creds["SessionToken"],
+            region_name=region,
+        )
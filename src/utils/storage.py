@@ -0,0 +1,131 @@
+"""
+Crash-safe file helpers shared by the core, detectors and responders.
+
+- atomic_write_json / atomic_write_text / atomic_write_bytes: write to a
+  temp file in the same folder, fsync, then rename over the target, so
+  readers only ever see the old or the new file
+- FileLock: an exclusive lock on a side file (<name>.lock) so overlapping
+  runs (cron + engine, two detectors) take turns instead of losing writes
+
+Locks are advisory and not re-entrant: take one around a whole
+load -> modify -> save sequence, not inside the helpers that sequence calls.
+"""
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:         # Windows
+    fcntl = None
+    import msvcrt
+
+
+def _fsync_dir(folder):
+    """Make the rename itself durable (POSIX only; Windows can't open directories)."""
+    if os.name == "nt":
+        return
+    fd = os.open(folder, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _atomic_write(path, write, binary=False):
+    """Call write(f) on a temp file next to `path`, fsync, and rename it over `path`."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with (os.fdopen(fd, "wb") if binary else os.fdopen(fd, "w", encoding="utf-8")) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+    _fsync_dir(path.parent)
+
+
+def atomic_write_json(path, data, **dump_kwargs):
+    """Replace `path` with `data` as JSON in one step. `dump_kwargs` go to json.dump."""
+    _atomic_write(path, lambda f: json.dump(data, f, **dump_kwargs))
+
+
+def atomic_write_text(path, text):
+    """Replace `path` with `text` in one step."""
+    _atomic_write(path, lambda f: f.write(text))
+
+
+def atomic_write_bytes(path, data):
+    """Replace `path` with `data` (bytes) in one step."""
+    _atomic_write(path, lambda f: f.write(data), binary=True)
+
+
+def read_json(path, default):
+    """Read JSON from `path`, or return `default` if it doesn't exist yet."""
+    path = Path(path)
+    if not path.exists():
+        return default
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class FileLock:
+    """
+    Exclusive inter-process lock on `path` (created if missing), as a context
+    manager. Waits up to `timeout` seconds, then raises TimeoutError.
+    """
+
+    def __init__(self, path, timeout=60.0, poll_interval=0.05):
+        self.path = Path(path)
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._f = None
+
+    def _try_lock(self):
+        try:
+            if fcntl:
+                fcntl.flock(self._f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                self._f.seek(0)
+                msvcrt.locking(self._f.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def acquire(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = open(self.path, "a+")
+        deadline = time.monotonic() + self.timeout
+        while not self._try_lock():
+            if time.monotonic() >= deadline:
+                self._f.close()
+                self._f = None
+                raise TimeoutError(f"Could not lock {self.path} within {self.timeout}s")
+            time.sleep(self.poll_interval)
+
+    def release(self):
+        if self._f is None:
+            return
+        if fcntl:
+            fcntl.flock(self._f.fileno(), fcntl.LOCK_UN)
+        else:
+            self._f.seek(0)
+            msvcrt.locking(self._f.fileno(), msvcrt.LK_UNLCK, 1)
+        self._f.close()
+        self._f = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
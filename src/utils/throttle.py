@@ -0,0 +1,99 @@
+import random
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+from utils.metrics import METRICS
+
+# Error codes AWS uses when it wants us to slow down.
+# S3 says "SlowDown", most other services say some flavour of "Throttling".
+THROTTLE_CODES = {
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestLimitExceeded",
+    "RequestThrottled",
+    "RequestThrottledException",
+    "TooManyRequestsException",
+    "SlowDown",
+    "ProvisionedThroughputExceededException",
+}
+
+
+def is_throttle_error(err):
+    """Return True if `err` is a ClientError that means 'you are calling too fast'."""
+    if not isinstance(err, ClientError):
+        return False
+    code = err.response.get("Error", {}).get("Code", "")
+    return code in THROTTLE_CODES
+
+
+class AdaptiveBackoff:
+    """
+    Shared backoff state for a pool of workers hitting the same AWS API.
+
+    Every throttle doubles a shared delay (up to `max_delay`) that *all* workers
+    wait before their next call, so the whole pool slows down together instead
+    of each thread hammering the API on its own schedule. Every success shrinks
+    the delay again, so we drift back to full speed once AWS stops complaining.
+
+    `name` (usually the service) labels the throttle/retry metrics.
+    """
+
+    def __init__(self, base_delay=0.05, max_delay=20.0, max_attempts=8, decay=0.9, name="aws"):
+        self.name = name
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.decay = decay
+        self._delay = 0.0
+        self._lock = threading.Lock()
+        self.throttle_count = 0
+        self.retry_count = 0
+
+    @property
+    def delay(self):
+        return self._delay
+
+    def _on_throttle(self):
+        METRICS.inc("sentinel_throttles_total", service=self.name)
+        with self._lock:
+            self.throttle_count += 1
+            self._delay = min(self.max_delay, max(self.base_delay, self._delay * 2))
+            return self._delay
+
+    def _on_success(self):
+        # Cheap unlocked check first; most calls never see throttling at all.
+        if self._delay:
+            with self._lock:
+                self._delay *= self.decay
+                if self._delay < self.base_delay:
+                    self._delay = 0.0
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Call `fn(*args, **kwargs)`, retrying throttling errors with jittered
+        backoff. Any other ClientError is raised straight away to the caller.
+        """
+        attempt = 0
+        while True:
+            pause = self._delay
+            if pause:
+                # "Full jitter": spread retries out so workers don't wake in lockstep.
+                time.sleep(random.uniform(0, pause))
+            try:
+                result = fn(*args, **kwargs)
+            except ClientError as e:
+                if not is_throttle_error(e):
+                    raise
+                attempt += 1
+                if attempt >= self.max_attempts:
+                    raise
+                with self._lock:
+                    self.retry_count += 1
+                METRICS.inc("sentinel_backoff_retries_total", service=self.name)
+                time.sleep(random.uniform(0, self._on_throttle()))
+                continue
+            self._on_success()
+            return result